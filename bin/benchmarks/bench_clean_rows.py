@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# File: bench_clean_rows.py
+#
+# Compare the throughput of the per-row clean_row with the batched clean_rows.
+#
+# Usage: python3 bin/benchmarks/bench_clean_rows.py [rows]
+#
+import os
+import sys
+import time
+import contextlib
+
+# Add the bin directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import export_csv_from_excel
+from benchmarks.synthetic import synthetic_rows
+
+HEADERS = [export_csv_from_excel.HEADER_FIRSTNAME, export_csv_from_excel.HEADER_LASTNAME,
+           export_csv_from_excel.HEADER_TEAM, export_csv_from_excel.HEADER_SWEATER]
+
+
+def bench_clean_row(rows):
+    return [export_csv_from_excel.clean_row(row, HEADERS) for row in rows]
+
+
+def bench_clean_rows(rows):
+    plan = export_csv_from_excel.get_cleaning_plan(HEADERS)
+    cleaned = []
+    for batch in export_csv_from_excel.iter_batches(rows):
+        cleaned.extend(export_csv_from_excel.clean_rows(batch, plan))
+    return cleaned
+
+
+def main(count):
+    rows = synthetic_rows(count)
+    results = {}
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        for name, bench in [('clean_row', bench_clean_row), ('clean_rows', bench_clean_rows)]:
+            start = time.perf_counter()
+            cleaned = bench(rows)
+            results[name] = (time.perf_counter() - start, [list(row) for row in cleaned])
+
+    assert results['clean_row'][1] == results['clean_rows'][1], 'batched cleaning gave different rows'
+    for name, (elapsed, _) in results.items():
+        print(f'{name:10s} {count / elapsed:12,.0f} rows/s')
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200000)
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# File: bench_latex_modes.py
+#
+# Compare the wall time of compiling one document per team with typesetting all
+# teams in one combined document and splitting the PDF.
+#
+# Usage: python3 bin/benchmarks/bench_latex_modes.py [--teams N] [--players N] [--jobs N] [--pdflatex PATH]
+#
+import os
+import sys
+import time
+import shutil
+import logging
+import argparse
+import tempfile
+
+# Add the bin directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import create_latex_rosters
+from benchmarks.synthetic import synthetic_rows
+
+TEMPLATE_FILE = os.path.join(create_latex_rosters.get_project_root(), 'templates', 'RosterTemplate.tex')
+
+
+def write_team_csv_files(csv_dir, teams, players):
+    """Write a CSV file per team with clean synthetic players."""
+    os.makedirs(csv_dir)
+    rows = synthetic_rows(teams * players, teams=teams, dirty=False)
+    for team in sorted({row[2] for row in rows}):
+        with open(os.path.join(csv_dir, team.replace(' ', '_') + '.csv'), 'w') as f:
+            f.write('Firstname,Lastname,Team,Sweater\n')
+            f.writelines(f'{first},{last},{team},{sweater}\n' for first, last, row_team, sweater in rows if row_team == team)
+
+
+def bench_per_file(csv_dir, latex_dir, pdflatex_path, jobs, render):
+    stale = create_latex_rosters.process_csv_files(csv_dir, TEMPLATE_FILE, latex_dir, render=render)
+    return create_latex_rosters.compile_latex_files(latex_dir, pdflatex_path, jobs, list(stale))
+
+
+def bench_combined(csv_dir, latex_dir, pdflatex_path, jobs, render):
+    return create_latex_rosters.build_combined_rosters(csv_dir, TEMPLATE_FILE, latex_dir, pdflatex_path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark per-team and combined pdflatex runs.')
+    parser.add_argument('--teams', type=int, default=40)
+    parser.add_argument('--players', type=int, default=15)
+    parser.add_argument('--jobs', type=int, default=1)
+    parser.add_argument('--pdflatex', default=shutil.which('pdflatex'),
+                        help='pdflatex to run, bin/benchmarks/fake_pdflatex.py measures the orchestration only.')
+    args = parser.parse_args()
+    if not args.pdflatex:
+        parser.error('pdflatex not found, pass --pdflatex')
+
+    logging.getLogger().setLevel(logging.WARNING)
+    runs = [('per-file datatool', bench_per_file, create_latex_rosters.RENDER_DATATOOL),
+            ('per-file inline', bench_per_file, create_latex_rosters.RENDER_INLINE),
+            ('combined', bench_combined, create_latex_rosters.RENDER_INLINE)]
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        csv_dir = os.path.join(work_dir, 'csv')
+        write_team_csv_files(csv_dir, args.teams, args.players)
+
+        print(f'{args.teams} teams, {args.players} players per team, {args.jobs} jobs')
+        for name, bench, render in runs:
+            latex_dir = os.path.join(work_dir, name.replace(' ', '_'), 'latex')
+            os.makedirs(latex_dir)
+            start = time.perf_counter()
+            failed = bench(csv_dir, latex_dir, args.pdflatex, args.jobs, render)
+            elapsed = time.perf_counter() - start
+            print(f'{name:20s} {elapsed:8.2f} s  {elapsed / args.teams * 1000:8.1f} ms/team  failed: {len(failed)}')
+
+
+if __name__ == '__main__':
+    main()
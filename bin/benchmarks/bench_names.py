@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# File: bench_names.py
+#
+# Throughput of the name rules on a league sized corpus: the rule table without
+# a cache, with the LRU cache, and the if chain clean_name used before names.py.
+#
+# Usage: python3 bin/benchmarks/bench_names.py [names]
+#
+import os
+import sys
+import time
+import random
+import contextlib
+
+# Add the bin directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import names
+from benchmarks.synthetic import FIRST_NAMES, LAST_NAMES
+
+
+def name_corpus(count, seed=0, distinct=20000):
+    """Return count (first name, last name) pairs, surnames repeat the way they do across a league."""
+    rng = random.Random(seed)
+    letters = 'abcdefghijklmnopqrstuvwxyz'
+    invented = [''.join(rng.choice(letters) for _ in range(rng.randint(3, 9))) for _ in range(distinct)]
+    last_names = LAST_NAMES + invented + [name.upper() for name in invented[:distinct // 4]]
+    first_names = FIRST_NAMES + [name.capitalize() for name in invented[:distinct // 10]]
+    return [(rng.choice(first_names), rng.choice(last_names)) for _ in range(count)]
+
+
+def legacy_clean_name(name, is_last_name=False):
+    if name is None:
+        return None
+    name = name.strip()
+    if len(name) == 2 and is_last_name:
+        return name[0].upper() + name[1].lower()
+    if len(name) == 2 and name.lower() != 'ty':
+        return name[0].upper() + name[1].upper()
+    if '-' in name:
+        return '-'.join(word.capitalize() for word in name.split('-'))
+    if 'mcc' in name.lower() or 'macc' in name.lower():
+        print(f"Alert: Found 'cc' in name '{name}'")
+        name = name.replace('cc', 'cC')
+    if len(name.split()) == 2:
+        return ' '.join(word.capitalize() if word.lower() not in ['iii', 'iv'] else word.upper() for word in name.split())
+    return name.capitalize()
+
+
+def legacy_clean_last_name(name):
+    if name is not None and name.isupper():
+        return legacy_clean_name(name, is_last_name=True)
+    elif name is not None and name.islower():
+        return legacy_clean_name(name)
+    return name
+
+
+def bench_legacy(corpus):
+    return [(legacy_clean_name(first), legacy_clean_last_name(last)) for first, last in corpus]
+
+
+def bench_normalizer(normalizer):
+    def bench(corpus):
+        first_name, last_name = normalizer.normalize, normalizer.last_name
+        return [(first_name(first), last_name(last)) for first, last in corpus]
+    return bench
+
+
+def main(count):
+    corpus = name_corpus(count)
+    cached = names.NameNormalizer()
+    benches = [('legacy', bench_legacy),
+               ('uncached', bench_normalizer(names.NameNormalizer(cache_size=0))),
+               ('cached', bench_normalizer(cached))]
+    results = {}
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        for label, bench in benches:
+            start = time.perf_counter()
+            cleaned = bench(corpus)
+            results[label] = (time.perf_counter() - start, cleaned)
+
+    assert results['uncached'][1] == results['cached'][1], 'the cache changed the names'
+    for label, (elapsed, _) in results.items():
+        print(f'{label:10s} {2 * count / elapsed:12,.0f} names/s')
+    print(f'cache: {cached.cache_info()}')
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 500000)
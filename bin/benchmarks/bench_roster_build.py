@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# File: bench_roster_build.py
+#
+# Compare building the rosters of a workbook stage after stage (export by team,
+# copy the team files, compile them all) with the streaming roster_build.py,
+# which compiles the teams of every sheet while the next sheet is read.
+#
+# The fake pdflatex takes --tex-seconds per run, so the stages are comparable
+# without a TeX installation; pass --pdflatex to time a real one.
+#
+# Usage: python3 bin/benchmarks/bench_roster_build.py [--rows N] [--sheets N] [--teams N] [--jobs N]
+#                                                     [--tex-seconds S] [--pdflatex PATH]
+#
+import os
+import sys
+import time
+import shutil
+import asyncio
+import logging
+import argparse
+import tempfile
+import contextlib
+
+# Add the bin directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import create_latex_rosters
+import export_csv_from_excel
+import roster_build
+from benchmarks.synthetic import write_synthetic_workbook
+
+FAKE_PDFLATEX = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fake_pdflatex.py')
+TEMPLATE_FILE = roster_build.DEFAULT_TEMPLATE
+
+
+def write_fake_pdflatex(work_dir):
+    """Executable wrapper around the fake pdflatex script."""
+    wrapper = os.path.join(work_dir, 'pdflatex')
+    with open(wrapper, 'w') as f:
+        f.write(f'#!/bin/sh\nexec "{sys.executable}" "{FAKE_PDFLATEX}" "$@"\n')
+    os.chmod(wrapper, 0o755)
+    return wrapper
+
+
+def bench_stages(workbook, work_dir, pdflatex_path, jobs):
+    """Export, copy and compile one after the other, return the time of every stage."""
+    csv_dir, data_dir, latex_dir = (os.path.join(work_dir, 'stages', name) for name in ('csv', 'data', 'latex'))
+    os.makedirs(latex_dir)
+    times = {}
+
+    start = time.perf_counter()
+    export_csv_from_excel.Exporter(csv_dir, index=False).export_by_team(workbook)
+    times['export'] = time.perf_counter() - start
+    shutil.copytree(csv_dir, data_dir)
+    times['copy'] = time.perf_counter() - start - times['export']
+    stale = create_latex_rosters.process_csv_files(data_dir, TEMPLATE_FILE, latex_dir)
+    create_latex_rosters.compile_latex_files(latex_dir, pdflatex_path, jobs, list(stale))
+    times['compile'] = time.perf_counter() - start - times['export'] - times['copy']
+    times['total'] = time.perf_counter() - start
+    return times
+
+
+def bench_streaming(workbook, work_dir, pdflatex_path, jobs):
+    """Build with roster_build, return the total time and the time to the first PDF."""
+    csv_dir, data_dir, latex_dir = (os.path.join(work_dir, 'streaming', name) for name in ('csv', 'data', 'latex'))
+    for directory in (data_dir, latex_dir):
+        os.makedirs(directory)
+    build = roster_build.RosterBuild(TEMPLATE_FILE, data_dir, latex_dir, pdflatex_path, jobs)
+
+    start = time.perf_counter()
+    asyncio.run(build.run(workbook, export_csv_from_excel.Exporter(csv_dir, index=False)))
+    return {'total': time.perf_counter() - start, 'first_pdf': build.first_pdf_seconds,
+            'failed': build.count(roster_build.FAILED)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the staged and the streaming roster build.')
+    parser.add_argument('--rows', type=int, default=8000)
+    parser.add_argument('--sheets', type=int, default=8)
+    parser.add_argument('--teams', type=int, default=64)
+    parser.add_argument('--jobs', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--tex-seconds', type=float, default=0.1, help='Time every fake pdflatex run takes.')
+    parser.add_argument('--pdflatex', help='Real pdflatex to run instead of the fake one.')
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.WARNING)
+    os.environ['FAKE_PDFLATEX_SECONDS'] = str(args.tex_seconds)
+    with tempfile.TemporaryDirectory() as work_dir:
+        pdflatex_path = args.pdflatex or write_fake_pdflatex(work_dir)
+        workbook = os.path.join(work_dir, 'registrations.xlsx')
+        write_synthetic_workbook(workbook, args.sheets, args.teams, args.rows)
+
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            stages = bench_stages(workbook, work_dir, pdflatex_path, args.jobs)
+            streaming = bench_streaming(workbook, work_dir, pdflatex_path, args.jobs)
+
+    print(f'{args.rows:,} rows on {args.sheets} sheets, {args.teams} teams, {args.jobs} jobs')
+    print(f"stages      {stages['total']:8.2f} s  (export {stages['export']:.2f} s, copy {stages['copy']:.2f} s, "
+          f"compile {stages['compile']:.2f} s)")
+    print(f"streaming   {streaming['total']:8.2f} s  (first PDF after {streaming['first_pdf']:.2f} s, "
+          f"failed: {streaming['failed']})")
+
+
+if __name__ == '__main__':
+    main()
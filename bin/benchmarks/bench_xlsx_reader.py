@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# File: bench_xlsx_reader.py
+#
+# Time and peak memory of reading the mapped columns of a wide registration
+# workbook with openpyxl's load_workbook and with xlsx_reader. The workbook is
+# written and every reader runs in its own process, so the peak resident size
+# is the reader's own (Linux keeps the parent's peak across fork and exec, this
+# process only starts the others).
+#
+# Usage: python3 bin/benchmarks/bench_xlsx_reader.py [rows] [extra columns]
+#
+import os
+import sys
+import json
+import time
+import resource
+import tempfile
+import subprocess
+
+# Add the bin directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# export_csv_from_excel.READER_OPENPYXL and READER_XLSX
+READERS = ['openpyxl', 'xlsx']
+
+
+def peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2**20 if sys.platform == 'darwin' else peak / 2**10
+
+
+def write_workbook(path, rows, extra_columns):
+    from benchmarks.synthetic import HEADERS, write_synthetic_workbook
+
+    write_synthetic_workbook(path, 1, 40, rows, True, True, extra_columns)
+    print(json.dumps({'columns': len(HEADERS) + extra_columns, 'size_mb': os.path.getsize(path) / 2**20}))
+
+
+def read_workbook(path, reader):
+    """Read the mapped columns of every sheet, print the rows, seconds and peak RSS.
+
+    The RSS growth is the peak over the peak after the imports, what reading the workbook took.
+    """
+    import export_csv_from_excel
+
+    exporter = export_csv_from_excel.Exporter(os.devnull, reader=reader)
+    imported = peak_rss_mb()
+    start = time.perf_counter()
+    rows = sum(1 for _, _, sheet_rows in exporter.parse_sheets(path) for _ in sheet_rows)
+    seconds = time.perf_counter() - start
+    peak = peak_rss_mb()
+    print(json.dumps({'rows': rows, 'seconds': seconds, 'peak_rss_mb': peak, 'rss_growth_mb': peak - imported}))
+
+
+def run(*args):
+    result = subprocess.run([sys.executable, __file__, *map(str, args)], capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.splitlines()[-1])
+
+
+def main(rows, extra_columns):
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, 'wide.xlsx')
+        workbook = run('--write', path, rows, extra_columns)
+        print(f"{rows:,} rows, {workbook['columns']} columns, {workbook['size_mb']:.1f} MB")
+
+        results = {reader: run('--read', path, reader) for reader in READERS}
+
+    assert len({result['rows'] for result in results.values()}) == 1, 'the readers read different rows'
+    for reader, result in results.items():
+        print(f"{reader:10s} {result['seconds']:8.2f} s {result['peak_rss_mb']:8.1f} MB peak RSS "
+              f"{result['rss_growth_mb']:+8.1f} MB while reading")
+    print(f"speedup: {results['openpyxl']['seconds'] / results['xlsx']['seconds']:.1f}x")
+
+
+if __name__ == '__main__':
+    if sys.argv[1:2] == ['--write']:
+        write_workbook(sys.argv[2], int(sys.argv[3]), int(sys.argv[4]))
+    elif sys.argv[1:2] == ['--read']:
+        read_workbook(sys.argv[2], sys.argv[3])
+    else:
+        main(int(sys.argv[1]) if len(sys.argv) > 1 else 50000, int(sys.argv[2]) if len(sys.argv) > 2 else 56)
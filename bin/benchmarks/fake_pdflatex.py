@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# File: fake_pdflatex.py
+#
+# Stand-in for pdflatex used by the tests and benchmarks, so the orchestration
+# can be measured without a TeX install. It understands just enough of the
+# command line to write <jobname>.pdf, .log and .aux into the output directory.
+# The PDF file gets a page for every five player frames, and the \rosterstart
+# marks of a combined document are written to <jobname>.pages. A card document
+# gets a page for every \rostercard, and the card positions in <jobname>.cards.
+# A .tex file containing FAKE_FAIL, or FAKE\_FAIL as a player value, exits with an error like a broken roster,
+# FAKE_HANG never finishes, and FAKE_RERUN asks for a second pass in the log
+# of the first one, like a document with changed labels.
+# FAKE_PDFLATEX_SECONDS in the environment makes every run take that long, like
+# a real TeX installation.
+# With -ini it writes <jobname>.fmt, unless the preamble contains FAKE_NO_FORMAT.
+#
+import os
+import re
+import sys
+import time
+
+# The roster template fits five player frames on a page
+FRAMES_PER_PAGE = 5
+
+ROSTER_START_PATTERN = re.compile(r'\\rosterstart\{(\d+)\}')
+FAIL_PATTERN = re.compile(r'FAKE\\?_FAIL')
+CARD_PATTERN = re.compile(r'\\rostercard\{(\d+)\}')
+
+# Card positions of the roster template on US letter, in sp: the top of the text
+# area, the height of a frame and the text height
+SP_PER_PDF_POINT = 65536 * 72.27 / 72
+CARD_TOP = round(756 * SP_PER_PDF_POINT)
+CARD_HEIGHT = round(141.108 * SP_PER_PDF_POINT)
+TEXT_HEIGHT = round(720 * SP_PER_PDF_POINT)
+
+
+def make_pdf(labels):
+    """A PDF file with one page per label, the label is the page's only text."""
+    objects = [b'<< /Type /Catalog /Pages 2 0 R >>',
+               b'<< /Type /Pages /Kids [%s] /Count %d >>' % (
+                   b' '.join(b'%d 0 R' % (4 + 2 * index) for index in range(len(labels))), len(labels)),
+               b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>']
+    for index, label in enumerate(labels):
+        content = b'BT /F1 12 Tf 72 720 Td (%s) Tj ET' % label.encode('latin-1')
+        objects.append(b'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents %d 0 R '
+                       b'/Resources << /Font << /F1 3 0 R >> >> >>' % (5 + 2 * index))
+        objects.append(b'<< /Length %d >>\nstream\n%s\nendstream' % (len(content), content))
+
+    output = bytearray(b'%PDF-1.4\n')
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(output))
+        output += b'%d 0 obj\n%s\nendobj\n' % (number, body)
+    xref = len(output)
+    output += b'xref\n0 %d\n0000000000 65535 f \n' % (len(objects) + 1)
+    output += b''.join(b'%010d 00000 n \n' % offset for offset in offsets)
+    output += b'trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (len(objects) + 1, xref)
+    return bytes(output)
+
+
+def layout_pages(content):
+    """Lay out the player frames, returns the page labels and the (team, first page) marks."""
+    body = content.split('\\begin{document}', 1)[-1]
+    cards = CARD_PATTERN.findall(body)
+    if cards:
+        return [f'card {index}' for index in cards], []
+    starts = list(ROSTER_START_PATTERN.finditer(body))
+    if not starts:
+        frames = body.count('\\begin{playerframe}')
+        return [f'page {page}' for page in range(1, max(1, -(-frames // FRAMES_PER_PAGE)) + 1)], []
+
+    labels, marks = [], []
+    for position, start in enumerate(starts):
+        end = starts[position + 1].start() if position + 1 < len(starts) else len(body)
+        frames = body[start.end():end].count('\\begin{playerframe}')
+        marks.append((start.group(1), len(labels) + 1))
+        labels.extend(f'team {start.group(1)} page {page}' for page in range(1, -(-frames // FRAMES_PER_PAGE) + 1))
+    return labels, marks
+
+
+def main(args):
+    output_dir = '.'
+    jobname = None
+    tex_file_path = None
+    ini = False
+
+    args = list(args)
+    if args == ['--version']:
+        print('fake pdfTeX 3.141592653')
+        return 0
+
+    while args:
+        arg = args.pop(0)
+        if arg == '-ini':
+            ini = True
+        elif arg in ('-output-directory', '--output-directory'):
+            output_dir = args.pop(0)
+        elif arg.startswith('-output-directory='):
+            output_dir = arg.split('=', 1)[1]
+        elif arg.startswith('-jobname='):
+            jobname = arg.split('=', 1)[1]
+        elif arg.startswith('-') or arg.startswith('&') or arg.endswith('.ltx'):
+            continue
+        else:
+            tex_file_path = arg
+
+    if tex_file_path is None:
+        print('fake pdflatex: no input file')
+        return 1
+
+    jobname = jobname or os.path.splitext(os.path.basename(tex_file_path))[0]
+    with open(tex_file_path) as f:
+        content = f.read()
+
+    print(f'This is fake pdfTeX, compiling {tex_file_path}')
+    if ini:
+        if 'FAKE_NO_FORMAT' in content:
+            print('! LaTeX Error: File `mylatexformat.ltx\' not found.')
+            return 1
+        with open(os.path.join(output_dir, jobname + '.fmt'), 'w') as f:
+            f.write(content)
+        return 0
+
+    if 'FAKE_HANG' in content:
+        time.sleep(3600)
+    time.sleep(float(os.environ.get('FAKE_PDFLATEX_SECONDS', 0)))
+
+    aux_file_path = os.path.join(output_dir, jobname + '.aux')
+    first_pass = not os.path.exists(aux_file_path)
+    with open(os.path.join(output_dir, jobname + '.log'), 'w') as f:
+        f.write(f'fake pdflatex log for {tex_file_path}\n')
+        if FAIL_PATTERN.search(content):
+            f.write('! Undefined control sequence.\n')
+        elif 'FAKE_RERUN' in content and first_pass:
+            f.write('LaTeX Warning: Label(s) may have changed. Rerun to get cross-references right.\n')
+    with open(aux_file_path, 'w') as f:
+        f.write('\\relax\n')
+
+    if FAIL_PATTERN.search(content):
+        print('! Undefined control sequence.')
+        return 1
+
+    labels, marks = layout_pages(content)
+    if marks:
+        with open(os.path.join(output_dir, jobname + '.pages'), 'w') as f:
+            f.writelines(f'{team} {page}\n' for team, page in marks)
+    cards = CARD_PATTERN.findall(content.split('\\begin{document}', 1)[-1])
+    if cards:
+        with open(os.path.join(output_dir, jobname + '.cards'), 'w') as f:
+            for index in cards:
+                f.write(f'card {index} {CARD_TOP} {TEXT_HEIGHT}\nend {index} {CARD_TOP - CARD_HEIGHT}\n')
+    with open(os.path.join(output_dir, jobname + '.pdf'), 'wb') as f:
+        f.write(make_pdf(labels))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
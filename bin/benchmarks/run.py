@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# File: run.py
+#
+# Benchmark suite for the bin/ tools. A synthetic registration workbook is
+# checked, exported by workbook and by team, counted, and turned into rosters, and every
+# stage is timed. LaTeX stages run with the fake pdflatex, which measures the
+# orchestration only, and with a real pdflatex when one is given.
+#
+# Results are written as JSON, pass an earlier results file with --compare to
+# see the change per stage.
+#
+# Usage: python3 bin/benchmarks/run.py --out results.json [--rows N] [--sheets N] [--teams N]
+#                                      [--sorted] [--clean] [--extra-columns N] [--jobs N]
+#                                      [--pdflatex PATH] [--compare old.json]
+#
+import os
+import sys
+import json
+import time
+import shutil
+import logging
+import argparse
+import platform
+import tempfile
+import contextlib
+import subprocess
+
+# Add the bin directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import openpyxl
+
+import count_players
+import create_latex_rosters
+import export_csv_from_excel
+from benchmarks.synthetic import synthetic_rows, write_synthetic_workbook
+
+FAKE_PDFLATEX = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fake_pdflatex.py')
+TEMPLATE_FILE = os.path.join(create_latex_rosters.get_project_root(), 'templates', 'RosterTemplate.tex')
+
+
+def parse_args(args):
+    parser = argparse.ArgumentParser(description='Benchmark the roster tools on a synthetic workbook.')
+    parser.add_argument('--out', default='bench_results.json', help='JSON results file.')
+    parser.add_argument('--rows', type=int, default=20000, help='Players in the workbook.')
+    parser.add_argument('--sheets', type=int, default=4, help='Sheets in the workbook.')
+    parser.add_argument('--teams', type=int, default=80, help='Teams in the workbook.')
+    parser.add_argument('--sorted', action='store_true', help='Keep the rows of a team together.')
+    parser.add_argument('--clean', action='store_true', help='Use clean names and sweater numbers.')
+    parser.add_argument('--extra-columns', type=int, default=0, help='Extra registration columns per sheet.')
+    parser.add_argument('--jobs', type=int, default=os.cpu_count() or 1, help='Compile jobs for the LaTeX stages.')
+    parser.add_argument('--pdflatex', help='Also time the LaTeX stages with this real pdflatex.')
+    parser.add_argument('--compare', help='Earlier results file to compare with.')
+    return parser.parse_args(args)
+
+
+def timed(results, name, items, function, *args, **kwargs):
+    """Run a stage and record its wall time and throughput."""
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        start = time.perf_counter()
+        value = function(*args, **kwargs)
+        seconds = time.perf_counter() - start
+
+    results[name] = {'seconds': round(seconds, 4), 'items': items,
+                     'per_second': round(items / seconds, 1) if seconds else None}
+    print(f'{name:28s} {seconds:9.3f} s  {items:8d} items  {results[name]["per_second"] or 0:12,.1f} /s')
+    return value
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def bench_latex(results, suffix, csv_dir, work_dir, pdflatex_path, jobs):
+    """Time the roster stages with the given pdflatex."""
+    teams = len([csv_file for csv_file in os.listdir(csv_dir) if csv_file.endswith('.csv')])
+
+    def latex_dir(name):
+        path = os.path.join(work_dir, f'{name}_{suffix}', 'latex')
+        os.makedirs(path)
+        return path
+
+    directory = latex_dir('per_file')
+    stale = timed(results, f'latex_generate_{suffix}', teams, create_latex_rosters.process_csv_files,
+                  csv_dir, TEMPLATE_FILE, directory)
+    timed(results, f'latex_compile_{suffix}', teams, create_latex_rosters.compile_latex_files,
+          directory, pdflatex_path, jobs, list(stale))
+
+    directory = latex_dir('pipeline')
+    timed(results, f'latex_pipeline_{suffix}', teams, create_latex_rosters.compile_latex_pipeline,
+          create_latex_rosters.generate_latex_files(csv_dir, TEMPLATE_FILE, directory,
+                                                    render=create_latex_rosters.RENDER_INLINE),
+          directory, pdflatex_path, jobs)
+
+    timed(results, f'latex_combined_{suffix}', teams, create_latex_rosters.build_combined_rosters,
+          csv_dir, TEMPLATE_FILE, latex_dir('combined'), pdflatex_path)
+
+
+def run(options):
+    results = {}
+    logging.getLogger().setLevel(logging.WARNING)
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        workbook = os.path.join(work_dir, 'registrations.xlsx')
+        timed(results, 'synthetic_workbook', options.rows, write_synthetic_workbook, workbook, options.sheets,
+              options.teams, options.rows, not options.sorted, not options.clean, options.extra_columns)
+
+        headers = ['Players First Name', 'Players Last Name', 'Players Team', 'Jersey Number']
+        rows = synthetic_rows(options.rows, options.teams, dirty=not options.clean)
+        plan = export_csv_from_excel.get_cleaning_plan(headers)
+        timed(results, 'clean_row', options.rows, lambda: [export_csv_from_excel.clean_row(row, headers) for row in rows])
+        timed(results, 'clean_rows', options.rows,
+              lambda: [export_csv_from_excel.clean_rows(batch, plan) for batch in export_csv_from_excel.iter_batches(rows)])
+
+        timed(results, 'check', options.rows,
+              lambda: export_csv_from_excel.Exporter(work_dir).check(workbook, export_csv_from_excel.RosterCheck()))
+
+        cwd = os.getcwd()
+        try:
+            for name, export in [('export_by_workbook', export_csv_from_excel.export_by_workbook),
+                                 ('export_by_team', export_csv_from_excel.export_by_team)]:
+                export_dir = os.path.join(work_dir, name)
+                os.makedirs(os.path.join(export_dir, 'csv'))
+                os.chdir(export_dir)
+                timed(results, name, options.rows, export, workbook)
+
+            csv_dir = os.path.join(work_dir, 'export_by_team', 'csv')
+            os.chdir(os.path.join(work_dir, 'export_by_team'))
+            teams = len([csv_file for csv_file in os.listdir(csv_dir) if csv_file.endswith('.csv')])
+            timed(results, 'count_players', teams, count_players.main, csv_dir)
+        finally:
+            os.chdir(cwd)
+
+        preview_dir = os.path.join(work_dir, 'preview')
+        os.makedirs(preview_dir)
+        timed(results, 'preview', teams, create_latex_rosters.build_previews, csv_dir, preview_dir)
+        bench_latex(results, 'fake', csv_dir, work_dir, FAKE_PDFLATEX, options.jobs)
+        if options.pdflatex:
+            bench_latex(results, 'pdflatex', csv_dir, work_dir, options.pdflatex, options.jobs)
+
+    return results
+
+
+def compare(results, baseline_file):
+    """Print the change of every stage against an earlier results file."""
+    with open(baseline_file, 'r') as f:
+        baseline = json.load(f)['results']
+
+    print(f'\nCompared with {baseline_file}:')
+    for name, result in results.items():
+        if name in baseline and baseline[name]['seconds']:
+            ratio = result['seconds'] / baseline[name]['seconds']
+            print(f'{name:28s} {baseline[name]["seconds"]:9.3f} s -> {result["seconds"]:9.3f} s  x{ratio:5.2f}')
+
+
+def main(args):
+    options = parse_args(args)
+    pdflatex_path = options.pdflatex and shutil.which(options.pdflatex)
+    if options.pdflatex and not pdflatex_path:
+        print(f'Error: pdflatex {options.pdflatex} not found')
+        sys.exit(1)
+    options.pdflatex = pdflatex_path
+
+    results = run(options)
+    report = {
+        'revision': git_revision(),
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'openpyxl': openpyxl.__version__,
+        'parameters': {key: value for key, value in vars(options).items() if key not in ('out', 'compare')},
+        'results': results,
+    }
+    with open(options.out, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f'\nResults written to {options.out}')
+
+    if options.compare:
+        compare(results, options.compare)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
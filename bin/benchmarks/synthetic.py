@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# File: synthetic.py
+#
+# Synthetic registration data for the benchmarks, names are dirtied the way
+# they come out of the registration system (case, blanks, Mc/Mac, suffixes).
+#
+import random
+
+import openpyxl
+
+FIRST_NAMES = ['ian', 'Scott', 'DYLAN', 'evan', 'Aidan', 'avery', 'Kieran', 'mason', 'Ty', 'jo', 'Mary-kate',
+               'anne marie', 'Carter', 'riley', 'NATHAN', 'Ethan', 'kaden', 'Cameron']
+LAST_NAMES = ['stonefield', 'SMITH', 'Doe', 'mccarthy', 'MACCORMACK', 'o', 'LI', 'smith-jones', 'van buren',
+              'johnson iii', 'WILLIAMS', 'brown', 'Thompson', 'anderson', 'lee']
+SWEATERS = ['1', '10', '#22', ' 7 ', 'N/A', None, 99, '00', '8a']
+
+
+HEADERS = ['Players First Name', 'Players Last Name', 'Players Team', 'Jersey Number']
+
+
+def team_name(index):
+    return f'{10 + 2 * (index % 5)}U Team {index}'
+
+
+def synthetic_rows(count, teams=20, seed=0, dirty=True, unsorted=None, first_team=0):
+    """Return count rows of (first name, last name, team, sweater), teams interleaved if unsorted.
+
+    Rows are unsorted when they are dirty, unless unsorted says otherwise.
+    """
+    rng = random.Random(seed)
+    team_names = [team_name(first_team + index) for index in range(teams)]
+
+    rows = []
+    for index in range(count):
+        first = rng.choice(FIRST_NAMES)
+        last = rng.choice(LAST_NAMES)
+        sweater = rng.choice(SWEATERS) if dirty else str(rng.randint(1, 99))
+        if dirty and rng.random() < 0.2:
+            first = f'  {first} '
+        if not dirty:
+            first, last = first.strip().capitalize(), last.capitalize()
+        rows.append([first, last, team_names[index * teams // count], sweater])
+
+    if dirty if unsorted is None else unsorted:
+        rng.shuffle(rows)
+    return rows
+
+
+def write_synthetic_workbook(path, sheets=1, teams=20, rows=1000, unsorted=True, dirty=True, extra_columns=0, seed=0):
+    """Write a registration workbook, the teams and rows are spread over the sheets.
+
+    Every sheet gets its own teams. Extra columns are filled like the other registration fields.
+    """
+    wb = openpyxl.Workbook(write_only=True)
+    extra_headers = [f'Registration Field {index}' for index in range(1, extra_columns + 1)]
+    extra_values = [f'value {index}' for index in range(1, extra_columns + 1)]
+
+    for sheet_index in range(sheets):
+        sheet_teams = max(1, teams // sheets)
+        sheet_rows = rows // sheets + (1 if sheet_index < rows % sheets else 0)
+        sheet = wb.create_sheet(f'Division {sheet_index + 1}')
+        sheet.append(HEADERS + extra_headers)
+        for row in synthetic_rows(sheet_rows, sheet_teams, seed + sheet_index, dirty, unsorted,
+                                  first_team=sheet_index * sheet_teams):
+            sheet.append(row + extra_values)
+
+    wb.save(path)
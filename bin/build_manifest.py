@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# File: build_manifest.py
+#
+# Build manifest for incremental roster builds. For every roster it records a
+# key made from the hashes of everything that affects the output (CSV file,
+# template file and compiler command line), so unchanged rosters can be skipped.
+#
+import os
+import json
+import hashlib
+
+MANIFEST_NAME = 'build_manifest.json'
+MANIFEST_VERSION = 1
+
+
+def hash_file(file_path):
+    """Return the SHA-256 hex digest of a file's contents."""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 16), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def hash_text(*parts):
+    """Return the SHA-256 hex digest of the given strings."""
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part.encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+def get_manifest_path(latex_dir):
+    """The manifest is stored next to the LaTeX output directory."""
+    latex_dir = os.path.abspath(latex_dir)
+    return os.path.join(os.path.dirname(latex_dir), MANIFEST_NAME)
+
+
+def load_manifest(manifest_path):
+    """Load the manifest, an unreadable or outdated manifest is treated as empty."""
+    try:
+        with open(manifest_path, 'r') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        manifest = None
+
+    if not isinstance(manifest, dict) or manifest.get('version') != MANIFEST_VERSION:
+        manifest = {'version': MANIFEST_VERSION, 'rosters': {}}
+    return manifest
+
+
+def save_manifest(manifest_path, manifest):
+    """Write the manifest atomically so an interrupted run never leaves it half written."""
+    temp_path = manifest_path + '.tmp'
+    with open(temp_path, 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(temp_path, manifest_path)
+
+
+def roster_build_key(csv_hash, template_hash, command, *options):
+    """Key for a roster built from the given CSV and template with the given compiler command and options."""
+    return hash_text(csv_hash, template_hash, ' '.join(command), *options)
+
+
+def is_up_to_date(manifest, name, key, *output_paths):
+    """Check if a roster was built with the same key and its outputs still exist."""
+    entry = manifest['rosters'].get(name)
+    if entry is None or entry.get('key') != key:
+        return False
+    return all(os.path.exists(path) for path in output_paths)
+
+
+def record_build(manifest, name, key, **details):
+    """Record a successful roster build, with any details the next build needs."""
+    manifest['rosters'][name] = dict(details, key=key)
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# File: card_cache.py
+#
+# Cache of typeset player cards, for building rosters card by card (--render
+# cards). A card is one player frame of the template, typeset once by pdflatex
+# and kept as a one-page PDF file keyed by the player's values, the template and
+# the pdflatex command. A roster PDF is put together from the cached cards, so
+# after a roster edit only the new or changed cards are typeset again.
+#
+# The cards are typeset on pages of their own, see
+# latex_render.render_card_document, and every cached card keeps its top and
+# bottom and the bottom of the text area in a /RosterCard page entry. A roster
+# stacks its cards from the top of the text area, as many on a page as fit,
+# like pdflatex lays out the frames of the template.
+#
+# The cache has a size cap, see file_cache.py, the least recently used cards are
+# removed when it is exceeded.
+#
+import os
+import zlib
+
+import build_manifest
+import latex_render
+from file_cache import FileCache
+from pdf_pages import Name, PdfDocument, PdfError, PdfWriter, Stream, serialize
+
+CARD_CACHE_DIR_NAME = 'card_cache'
+DEFAULT_MAX_BYTES = 256 * 2**20
+CARD_SUFFIX = '.pdf'
+
+# Page entry of a cached card, positions in points from the bottom of the page
+CARD_ENTRY = 'RosterCard'
+
+# Room for rounding when stacking cards, in points
+FIT_TOLERANCE = 0.01
+
+
+def get_card_cache_dir(latex_dir):
+    """The card cache is stored next to the LaTeX output directory."""
+    latex_dir = os.path.abspath(latex_dir)
+    return os.path.join(os.path.dirname(latex_dir), CARD_CACHE_DIR_NAME)
+
+
+class CardCache(FileCache):
+    """Typeset player cards, one-page PDF files in a directory limited to max_bytes."""
+
+    suffix = CARD_SUFFIX
+
+    def __init__(self, cache_dir, max_bytes=DEFAULT_MAX_BYTES):
+        super().__init__(cache_dir, max_bytes)
+
+    @staticmethod
+    def key(template_hash, command, fields, row):
+        """Key of a player's card, from the values of the template's fields, the template and the pdflatex command."""
+        values = [f'{macro}={row.get(column) or ""}' for macro, column in sorted(fields.items())]
+        return build_manifest.hash_text(template_hash, ' '.join(command), *values)
+
+    def card_path(self, key):
+        return os.path.join(self.cache_dir, key + CARD_SUFFIX)
+
+    def has(self, key):
+        return os.path.exists(self.card_path(key))
+
+    def store_cards(self, pdf_file_path, cards_file_path, keys):
+        """Cache the cards of a typeset card document, keys are the keys of its cards in page order."""
+        document = PdfDocument.open(pdf_file_path)
+        if len(document.pages) != len(keys):
+            raise PdfError(f'{pdf_file_path} has {len(document.pages)} pages for {len(keys)} cards')
+        cards = latex_render.read_card_marks(cards_file_path, len(keys))
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        for index, (key, (top, bottom, text_height)) in enumerate(zip(keys, cards)):
+            writer = PdfWriter()
+            writer.add_page(document, index, {Name(CARD_ENTRY): {Name('Top'): top, Name('Bottom'): bottom,
+                                                                  Name('TextBottom'): top - text_height}})
+            # write under a temporary name, so a roster never reads half a card
+            temp_path = self.card_path(key) + '.tmp'
+            writer.write(temp_path)
+            os.replace(temp_path, self.card_path(key))
+
+    def assemble(self, keys, pdf_file_path):
+        """Write a roster PDF made of the cached cards of the given keys, return the number of pages."""
+        writer = PdfWriter()
+        placed = []  # (form, offset) of the cards on the current page
+        media_box = y = None
+        for key in keys:
+            card_path = self.card_path(key)
+            document = PdfDocument.open(card_path)
+            # using a card makes it the most recently used one
+            os.utime(card_path)
+            _, page = document.pages[0]
+            card = document.resolve(page.get(CARD_ENTRY))
+            if not isinstance(card, dict):
+                raise PdfError(f'{card_path} is not a cached card')
+            top, bottom, text_bottom = (float(document.resolve(card[name])) for name in ('Top', 'Bottom', 'TextBottom'))
+
+            if placed and y - (top - bottom) < text_bottom - FIT_TOLERANCE:
+                self.add_card_page(writer, media_box, placed)
+                placed = []
+            if not placed:
+                media_box = [float(value) for value in document.resolve(page['MediaBox'])]
+                y = top
+            bbox = [media_box[0], bottom, media_box[2], top]
+            placed.append((writer.add_form(document, 0, bbox), y - top))
+            y -= top - bottom
+
+        if placed:
+            self.add_card_page(writer, media_box, placed)
+        writer.write(pdf_file_path)
+        return len(writer.page_refs)
+
+    @staticmethod
+    def add_card_page(writer, media_box, placed):
+        """Add a page drawing the given (form, vertical offset) cards."""
+        content = b''.join(b'q 1 0 0 1 0 %s cm /Card%d Do Q\n' % (serialize(float(offset)), number)
+                           for number, (_, offset) in enumerate(placed))
+        stream = writer.add_object(Stream({Name('Filter'): Name('FlateDecode')}, zlib.compress(content)))
+        forms = {Name(f'Card{number}'): form for number, (form, _) in enumerate(placed)}
+        writer.add_new_page({Name('Type'): Name('Page'), Name('MediaBox'): media_box,
+                             Name('Resources'): {Name('XObject'): forms}, Name('Contents'): stream})
@@ -1,26 +1,132 @@
 #!/usr/bin/env python3
+#
+# File: condition_data.py
+#
+# Condition roster CSV files in place with the exporter's name rules: first
+# names, last names and sweater numbers are cleaned like export_csv_from_excel
+# cleans them, other columns are only stripped.
+#
+# Rows are streamed into a temporary file next to the roster, which then
+# replaces the roster in one rename, so an interrupted run never leaves a half
+# written roster behind.
+#
+# Usage: python3 condition_data.py <file.csv | csv_dir | "glob*.csv"> [-j N]
+#
 import csv
+import os
+import sys
+import glob
+import argparse
+import tempfile
+import shutil
+from concurrent.futures import ProcessPoolExecutor
 
-def capitalize_field(field):
-    return field.capitalize()
+import export_csv_from_excel
+import names
+
+# Name rules shared by all files conditioned in this process
+name_normalizer = names.NameNormalizer()
+
+# Cleaning rule for each column of the exported CSV files, by the exporter's header names
+COLUMN_RULES = {
+    export_csv_from_excel.header_mapping[export_csv_from_excel.HEADER_FIRSTNAME]: name_normalizer.first_name,
+    export_csv_from_excel.header_mapping[export_csv_from_excel.HEADER_LASTNAME]: name_normalizer.last_name,
+    export_csv_from_excel.header_mapping[export_csv_from_excel.HEADER_SWEATER]: export_csv_from_excel.clean_sweater_number,
+}
+
+def strip_field(field):
+    return field.strip()
+
+def get_column_rules(headers):
+    """Return the cleaning rule of every column, columns without a rule are stripped."""
+    return [COLUMN_RULES.get(header.strip(), strip_field) for header in headers]
+
+def condition_rows(reader):
+    """Yield the header row and every conditioned row of a CSV reader."""
+    headers = next(reader, None)
+    if headers is None:
+        return
+    yield headers
+
+    rules = get_column_rules(headers)
+    for row in reader:
+        # cells beyond the header row are kept as they are
+        yield [rule(cell) for rule, cell in zip(rules, row)] + row[len(rules):]
 
 def process_csv(input_filename, output_filename):
-    # Read the CSV data
-    with open(input_filename, mode='r', newline='') as infile:
-        reader = csv.reader(infile)
-        data = list(reader)
-
-    # Process each cell in the CSV data
-    capitalized_data = []
-    for row in data:
-        capitalized_row = [capitalize_field(cell) for cell in row]
-        capitalized_data.append(capitalized_row)
-
-    # Write the modified data back to CSV
-    with open(output_filename, mode='w', newline='') as outfile:
-        writer = csv.writer(outfile)
-        writer.writerows(capitalized_data)
+    """Condition a CSV file in one pass, the output replaces output_filename atomically.
+
+    Returns the number of rows written, including the header.
+    """
+    output_dir = os.path.dirname(os.path.abspath(output_filename))
+    fd, temp_path = tempfile.mkstemp(prefix='.' + os.path.basename(output_filename) + '.', suffix='.tmp', dir=output_dir)
+    try:
+        rows = 0
+        with open(input_filename, mode='r', newline='') as infile, os.fdopen(fd, mode='w', newline='') as outfile:
+            writer = csv.writer(outfile)
+            for row in condition_rows(csv.reader(infile)):
+                writer.writerow(row)
+                rows += 1
+            outfile.flush()
+            os.fsync(outfile.fileno())
+        shutil.copymode(input_filename, temp_path)
+        os.replace(temp_path, output_filename)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+    return rows
+
+def condition_file(filename):
+    """Condition a CSV file in place in a worker, return (file, rows, error, alerts).
+
+    alerts are the name alerts found so far by the worker's name rules.
+    """
+    try:
+        rows, error = process_csv(filename, filename), None
+    except Exception as e:
+        rows, error = 0, f'{type(e).__name__}: {e}'
+    return filename, rows, error, list(name_normalizer.alerts.values())
+
+def find_csv_files(path):
+    """Return the CSV files to condition: the file itself, the CSV files in a directory or the files matching a glob."""
+    if os.path.isdir(path):
+        paths = [os.path.join(path, name) for name in os.listdir(path)]
+    else:
+        paths = glob.glob(path)
+    return sorted(path for path in paths if os.path.isfile(path) and path.lower().endswith('.csv'))
+
+def condition_files(filenames, jobs=None):
+    """Condition the CSV files in place, in a process pool when there are several."""
+    if len(filenames) < 2:
+        return [condition_file(filename) for filename in filenames]
+    with ProcessPoolExecutor(max_workers=min(jobs or os.cpu_count() or 1, len(filenames))) as executor:
+        return list(executor.map(condition_file, filenames))
+
+def main(args):
+    parser = argparse.ArgumentParser(description='Condition roster CSV files in place.')
+    parser.add_argument('path', help='CSV file, directory of CSV files, or glob of CSV files.')
+    parser.add_argument('-j', '--jobs', type=int, default=None,
+                        help='Number of files to condition in parallel (default: number of CPUs).')
+    options = parser.parse_args(args)
+
+    filenames = find_csv_files(options.path)
+    if not filenames:
+        print(f"Error: no CSV files found for '{options.path}'")
+        sys.exit(1)
+
+    results = condition_files(filenames, options.jobs)
+    failed = 0
+    alerts = {}
+    for filename, rows, error, file_alerts in results:
+        alerts.update(dict.fromkeys(file_alerts))
+        if error is not None:
+            print(f"Error: could not condition {filename}: {error}")
+            failed += 1
+    for alert in alerts:
+        print(alert)
+    print(f"Conditioned {len(results) - failed} of {len(results)} files.")
+    if failed:
+        sys.exit(1)
 
 if __name__ == "__main__":
-    # Sample usage: processing "sample.csv" and saving to the same file.
-    process_csv('Girls_Team_Red.csv', 'Girls_Team_Red.csv')
\ No newline at end of file
+    main(sys.argv[1:])
@@ -2,13 +2,25 @@
 import csv
 import os
 import sys
-    
+from concurrent.futures import ProcessPoolExecutor
+
+import roster_index
+
+# Changed files are counted in a process pool when there are at least this many
+PARALLEL_MIN_FILES = 8
+
 def count_lines_in_csv(file_path):
     # Count the numbers of lines in the CSV file minus the header and return the count
     with open(file_path, mode='r', newline='') as infile:
         reader = csv.reader(infile)
-        data = list(reader)
-        return len(data) - 1
+        return sum(1 for _ in reader) - 1
+
+def count_changed_files(file_paths):
+    """Count the lines of the CSV files, in parallel if there are many."""
+    if len(file_paths) < PARALLEL_MIN_FILES:
+        return [count_lines_in_csv(file_path) for file_path in file_paths]
+    with ProcessPoolExecutor() as executor:
+        return list(executor.map(count_lines_in_csv, file_paths, chunksize=4))
 
 # Take a string and remove the .csv extension and remove underscores replacing them with spaces
 def format_filename(filename):
@@ -16,13 +28,19 @@ def format_filename(filename):
     return filename.replace('.csv', '').replace('_', ' ')
 
 def main(directory):
-    """Read through a directory list of csv files and count the number of lines."""
+    """Read through a directory list of csv files and count the number of lines.
+
+    The counts come from the roster index written by the exporter, only the files that
+    changed since they were indexed are read, and the index is updated with their counts.
+    """
     # Check if the directory exists
     if not os.path.exists(directory):
         print(f"The directory {directory} does not exist.")
         return
-    
-    output_data = []
+
+    index = roster_index.load_index(directory)
+    counts = {}
+    changed = []
 
     # Iterate over each file in the directory
     for file_name in os.listdir(directory):
@@ -30,9 +48,20 @@ def main(directory):
 
         # Check if the file is a CSV file
         if file_name.endswith('.csv') and os.path.isfile(file_path):
-            num_lines = count_lines_in_csv(file_path)
-            cleaned_file_name = format_filename(file_name)
-            output_data.append((cleaned_file_name, num_lines))
+            counts[file_name] = roster_index.lookup(index, directory, file_name)
+            if counts[file_name] is None:
+                changed.append(file_name)
+
+    if changed:
+        file_paths = [os.path.join(directory, file_name) for file_name in changed]
+        counts.update(zip(changed, count_changed_files(file_paths)))
+        print(f"Counted {len(changed)} changed files, {len(counts) - len(changed)} from the index.")
+    try:
+        roster_index.update_index(directory, {file_name: counts[file_name] for file_name in changed}, index)
+    except OSError as e:
+        print(f"Could not update the roster index: {e}")
+
+    output_data = [(format_filename(file_name), num_lines) for file_name, num_lines in counts.items()]
 
     # Write the results to a new CSV file
     with open("per_team_count.csv", 'w', newline='') as outfile:
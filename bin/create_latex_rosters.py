@@ -2,14 +2,56 @@
 # -*- coding: utf-8 -*-
 import os
 import sys
-import subprocess
+import shutil
+import argparse
+import csv
 import logging
+import queue
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import build_manifest
+import card_cache
+import latex_format
+import latex_render
+import latex_runner
+import pdf_pages
+import pdf_preview
+import run_metrics
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
-# Constants for paths
-PDFLATEX_PATH = '/Library/TeX/texbin/pdflatex'
+# Each compile job gets its own output/aux directory under the LaTeX directory
+BUILD_DIR_NAME = '_build'
+LATEX_LOG_NAME = 'latex_logfile.log'
+
+# LaTeX files waiting to be compiled, per job, before the generation of more files waits
+QUEUED_FILES_PER_JOB = 2
+
+# All teams typeset in one document, the PDF is kept next to the LaTeX directory for the print shop
+COMBINED_NAME = 'all_rosters'
+
+# Render modes: datatool loads the CSV file at TeX time, inline writes the players into the .tex file,
+# cards puts the rosters together from cached player cards
+RENDER_DATATOOL = 'datatool'
+RENDER_INLINE = 'inline'
+RENDER_CARDS = 'cards'
+
+# Card documents, the cards that are not cached yet, are typeset in _build/cards_<n>
+CARDS_NAME = 'cards'
+
+# Backends: pdflatex typesets the template for print, preview writes proofreading PDFs without TeX
+BACKEND_PDFLATEX = 'pdflatex'
+BACKEND_PREVIEW = 'preview'
+PREVIEW_DIR = 'output/preview'
+
+# Run metrics, collected with --metrics or --profile
+metrics = run_metrics.Metrics('create_latex_rosters')
+
+# Seconds a pdflatex run may take, set with --latex-timeout
+latex_timeout = latex_runner.DEFAULT_TIMEOUT
 
 
 def get_project_root():
@@ -19,6 +61,45 @@ def get_project_root():
         current_dir = os.path.dirname(current_dir)
     return current_dir
 
+def parse_options(args):
+    """Split the command line options from the CSV directory and template arguments."""
+    parser = argparse.ArgumentParser(description='Create PDF rosters from CSV files.')
+    parser.add_argument('-j', '--jobs', type=int, default=1,
+                        help='Number of rosters to compile in parallel (default: 1).')
+    parser.add_argument('--force', action='store_true',
+                        help='Rebuild every roster, even if nothing changed since the last build.')
+    parser.add_argument('--render', choices=[RENDER_DATATOOL, RENDER_INLINE, RENDER_CARDS], default=RENDER_DATATOOL,
+                        help='Load the CSV file with datatool (default), write the players straight into the .tex file, '
+                             'or put the rosters together from cached player cards.')
+    parser.add_argument('--format-cache', action='store_true',
+                        help='Compile against a cached precompiled format of the template preamble (needs mylatexformat).')
+    parser.add_argument('--combined', action='store_true',
+                        help='Typeset all teams in a single pdflatex run and split the result into the team PDFs.')
+    parser.add_argument('--backend', choices=[BACKEND_PDFLATEX, BACKEND_PREVIEW], default=BACKEND_PDFLATEX,
+                        help=f'Typeset the rosters with pdflatex (default) or write quick proofreading PDFs '
+                             f'to {PREVIEW_DIR} without TeX.')
+    parser.add_argument('--pdflatex', metavar='PATH',
+                        help=f'pdflatex to run (default: ${latex_runner.PDFLATEX_ENV}, or pdflatex on the PATH).')
+    parser.add_argument('--latex-timeout', type=float, default=latex_runner.DEFAULT_TIMEOUT, metavar='SECONDS',
+                        help='Fail a roster when a pdflatex run takes longer than this (default: %(default)s).')
+    run_metrics.add_arguments(parser)
+
+    options, remaining = parser.parse_known_args(args[1:])
+    if options.jobs < 1:
+        parser.error('--jobs must be at least 1')
+    if options.latex_timeout <= 0:
+        parser.error('--latex-timeout must be positive')
+    if options.backend == BACKEND_PREVIEW and (options.combined or options.format_cache):
+        parser.error('--combined and --format-cache need the pdflatex backend')
+    if options.render == RENDER_CARDS and (options.combined or options.format_cache):
+        parser.error('--render cards can not be used with --combined or --format-cache')
+    # the combined document always writes the players inline and rebuilds every team in one run
+    if options.combined and (options.render != RENDER_DATATOOL or options.force or options.jobs > 1
+                             or options.format_cache):
+        parser.error('--combined can not be used with --render, --force, --jobs or --format-cache')
+
+    return options, args[:1] + remaining
+
 def get_csv_dir_and_template(args):
     """Parse command line arguments to get the CSV directory and optional template file."""
     project_root = get_project_root()
@@ -59,23 +140,52 @@ def create_latex_directory(latex_dir='output/latex'):
     return latex_dir
 
 
-def process_csv_files(csv_dir, template_file, latex_dir):
-    """Create LaTeX files for each CSV file by using the template."""
-    for csv_file in os.listdir(csv_dir):
+def process_csv_files(csv_dir, template_file, latex_dir, manifest=None, command=(), render=RENDER_DATATOOL):
+    """Create LaTeX files for each CSV file by using the template.
+
+    Returns a dict mapping every LaTeX file that needs compiling to its build key. If a
+    build manifest is given, rosters whose CSV file, template and compiler command are
+    unchanged since their last successful build are skipped.
+    """
+    return dict(generate_latex_files(csv_dir, template_file, latex_dir, manifest, command, render))
+
+
+def generate_latex_files(csv_dir, template_file, latex_dir, manifest=None, command=(), render=RENDER_DATATOOL):
+    """Create the LaTeX files one at a time, yielding (LaTeX file, build key) as soon as each is written."""
+    template_hash = build_manifest.hash_file(template_file)
+
+    for csv_file in sorted(os.listdir(csv_dir)):
         if csv_file.endswith('.csv'):
             csv_file_path = os.path.join(csv_dir, csv_file)
             output_file_path = os.path.join(latex_dir, csv_file.replace('.csv', '.tex'))
 
-            create_latex_file_from_template(template_file, csv_file_path, output_file_path)
+            name = os.path.splitext(csv_file)[0]
+            key = build_manifest.roster_build_key(build_manifest.hash_file(csv_file_path), template_hash, command, render)
+            pdf_file_path = os.path.join(latex_dir, name + '.pdf')
+            if manifest is not None and build_manifest.is_up_to_date(manifest, name, key, output_file_path, pdf_file_path):
+                logging.info(f'Up-to-date: {pdf_file_path}')
+                continue
 
+            start = time.perf_counter()
+            create_latex_file_from_template(template_file, csv_file_path, output_file_path, render)
+            metrics.record('rosters', name, generate_seconds=round(time.perf_counter() - start, 4))
+            yield output_file_path, key
 
-def create_latex_file_from_template(template_file, csv_file_path, output_file_path):
-    """Generate a LaTeX file by replacing CSV_FILE placeholder in the template."""
+
+def create_latex_file_from_template(template_file, csv_file_path, output_file_path, render=RENDER_DATATOOL):
+    """Generate a LaTeX file by replacing CSV_FILE placeholder in the template.
+
+    With the inline render mode the CSV file is read here and the template's DTLenvforeach
+    block is written out once per player, so pdflatex does not need datatool.
+    """
     with open(template_file, 'r') as f:
         template_content = f.read()
 
-    # Replace CSV_FILE in the template
-    output_content = template_content.replace('CSV_FILE', csv_file_path)
+    if render == RENDER_INLINE:
+        output_content = latex_render.render_inline_roster(template_content, csv_file_path)
+    else:
+        # Replace CSV_FILE in the template, the preamble above it can be precompiled into a format
+        output_content = latex_format.mark_end_of_dump(template_content.replace('CSV_FILE', csv_file_path))
 
     with open(output_file_path, 'w') as f:
         f.write(output_content)
@@ -83,24 +193,359 @@ def create_latex_file_from_template(template_file, csv_file_path, output_file_pa
     logging.info(f'Created LaTeX file: {output_file_path}')
 
 
-def compile_latex_files(latex_dir, pdflatex_path):
-    """Run pdflatex command to compile LaTeX files into PDFs."""
-    for tex_file in os.listdir(latex_dir):
-        if tex_file.endswith('.tex'):
-            tex_file_path = os.path.join(latex_dir, tex_file)
-            compile_latex_file(tex_file_path, latex_dir, pdflatex_path)
+def compile_latex_files(latex_dir, pdflatex_path, jobs=1, tex_files=None, format_file=None):
+    """Run pdflatex command to compile LaTeX files into PDFs, return the list of failed files.
+
+    Compiles the given LaTeX files, or every LaTeX file in the directory if none are given,
+    against the precompiled format file if one is given.
+    """
+    if tex_files is None:
+        tex_files = [os.path.join(latex_dir, tex_file) for tex_file in sorted(os.listdir(latex_dir))
+                     if tex_file.endswith('.tex')]
+
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        results = executor.map(lambda tex_file_path: compile_latex_job(tex_file_path, latex_dir, pdflatex_path, format_file),
+                               tex_files)
+        failed = [tex_file_path for tex_file_path, ok in zip(tex_files, results) if not ok]
+
+    if failed:
+        logging.error(f'{len(failed)} of {len(tex_files)} rosters failed to compile:')
+        for tex_file_path in failed:
+            logging.error(f'  {os.path.basename(tex_file_path)}')
+    return failed
+
+
+def compile_latex_pipeline(latex_files, latex_dir, pdflatex_path, jobs=1, format_cache_dir=None):
+    """Compile LaTeX files while they are being generated.
+
+    latex_files yields (LaTeX file, build key) as each file is written, and every file is
+    queued for the compile workers straight away. The queue is bounded, so generation waits
+    when it gets ahead of the compilers. With a format cache directory the first LaTeX file
+    is used to prepare the precompiled format before anything is compiled.
 
+    Returns the dict of LaTeX files compiled in this run with their build keys, and the
+    list of files that failed.
+    """
+    work = queue.Queue(maxsize=QUEUED_FILES_PER_JOB * jobs)
+    format_files = []
+    failed = []
 
-def compile_latex_file(tex_file_path, latex_dir, pdflatex_path):
-    """Compile a single LaTeX file using pdflatex."""
+    def worker():
+        while True:
+            tex_file_path = work.get()
+            if tex_file_path is None:
+                return
+            # a worker that died would leave the bounded queue full and the generation waiting for ever
+            try:
+                ok = compile_latex_job(tex_file_path, latex_dir, pdflatex_path, format_files[0])
+            except Exception as e:
+                logging.error(f'Error compiling {tex_file_path}: {e}')
+                ok = False
+            if not ok:
+                failed.append(tex_file_path)
+
+    workers = [threading.Thread(target=worker, daemon=True) for _ in range(jobs)]
+    for thread in workers:
+        thread.start()
+
+    compiled = {}
+    try:
+        for tex_file_path, key in latex_files:
+            if not format_files:
+                with metrics.stage('prepare_format'):
+                    format_files.append(format_cache_dir and latex_format.prepare_format(tex_file_path, pdflatex_path,
+                                                                                         format_cache_dir, latex_timeout))
+            compiled[tex_file_path] = key
+            work.put(tex_file_path)
+    finally:
+        for _ in workers:
+            work.put(None)
+        for thread in workers:
+            thread.join()
+
+    if failed:
+        failed.sort()
+        logging.error(f'{len(failed)} of {len(compiled)} rosters failed to compile:')
+        for tex_file_path in failed:
+            logging.error(f'  {os.path.basename(tex_file_path)}')
+    return compiled, failed
+
+
+def compile_latex_job(tex_file_path, latex_dir, pdflatex_path, format_file=None):
+    """Compile a LaTeX file in its own build directory and move the PDF into the LaTeX directory."""
+    name = os.path.splitext(os.path.basename(tex_file_path))[0]
+    build_dir = os.path.join(latex_dir, BUILD_DIR_NAME, name)
+
+    try:
+        os.makedirs(build_dir, exist_ok=True)
+        if not compile_latex_file(tex_file_path, build_dir, pdflatex_path, format_file):
+            return False
+        shutil.move(os.path.join(build_dir, name + '.pdf'), os.path.join(latex_dir, name + '.pdf'))
+        if metrics.enabled:
+            record_page_count(name, os.path.join(latex_dir, name + '.pdf'))
+    except OSError as e:
+        logging.error(f'Error compiling {tex_file_path}: {e}')
+        return False
+
+    # Keep the build directory of failed jobs around for inspection
+    shutil.rmtree(build_dir, ignore_errors=True)
+    return True
+
+
+def latex_command(pdflatex_path, format_file=None):
+    """The pdflatex command line, up to the output directory and the LaTeX file."""
+    command = [pdflatex_path] + latex_runner.BATCH_OPTIONS
+    if format_file is not None:
+        # pdflatex adds the .fmt extension itself
+        command.append(f'-fmt={os.path.splitext(format_file)[0]}')
+    return command + ['-output-directory']
+
+
+def compile_latex_file(tex_file_path, output_dir, pdflatex_path, format_file=None):
+    """Compile a single LaTeX file using pdflatex, its output is written to the output directory if it fails."""
     logging.info(f'Compiling LaTeX file: {tex_file_path}')
-    result = subprocess.run(
-        [pdflatex_path, '-output-directory', latex_dir, tex_file_path],
-        stdout=open('latex_logfile.log', 'a'),
-        stderr=subprocess.STDOUT
-    )
-    if result.returncode != 0:
-        logging.error(f'Error compiling {tex_file_path}, check latex_logfile.log for details.')
+    log_file_path = os.path.join(output_dir, LATEX_LOG_NAME)
+    run = latex_runner.run_pdflatex(latex_command(pdflatex_path, format_file), tex_file_path, output_dir,
+                                    latex_timeout, log_file_path)
+    metrics.record('rosters', os.path.splitext(os.path.basename(tex_file_path))[0],
+                   compile_seconds=round(run.seconds, 4), exit_code=run.returncode, passes=run.passes)
+    if not run.ok:
+        logging.error(f'Error compiling {tex_file_path}: {run.error}, check {log_file_path} for details.')
+        return False
+    return True
+
+
+def record_page_count(name, pdf_file_path):
+    """Record the pages of a roster PDF in the run metrics."""
+    try:
+        metrics.record('rosters', name, pages=pdf_pages.page_count(pdf_file_path))
+    except pdf_pages.PdfError as e:
+        logging.warning(f'Could not count the pages of {pdf_file_path}: {e}')
+
+
+def build_combined_rosters(csv_dir, template_file, latex_dir, pdflatex_path):
+    """Typeset all teams in one pdflatex run, then split the result into the per-team PDF files.
+
+    The combined PDF is kept next to the LaTeX directory. Returns the names of the teams
+    that did not get a PDF file.
+    """
+    csv_files = sorted(csv_file for csv_file in os.listdir(csv_dir) if csv_file.endswith('.csv'))
+    names = [os.path.splitext(csv_file)[0] for csv_file in csv_files]
+
+    build_dir = os.path.join(latex_dir, BUILD_DIR_NAME, COMBINED_NAME)
+    os.makedirs(build_dir, exist_ok=True)
+    tex_file_path = os.path.join(build_dir, COMBINED_NAME + '.tex')
+
+    with metrics.stage('generate'):
+        with open(template_file, 'r') as f:
+            template_content = f.read()
+        with open(tex_file_path, 'w') as f:
+            f.write(latex_render.render_combined_rosters(template_content,
+                                                         [os.path.join(csv_dir, csv_file) for csv_file in csv_files]))
+    logging.info(f'Created combined LaTeX file: {tex_file_path}')
+
+    with metrics.stage('compile'):
+        if not compile_latex_file(tex_file_path, build_dir, pdflatex_path):
+            return names
+
+    with metrics.stage('split'):
+        failed = split_combined_rosters(build_dir, latex_dir, names)
+
+    shutil.rmtree(build_dir, ignore_errors=True)
+    return failed
+
+
+def split_combined_rosters(build_dir, latex_dir, names):
+    """Split the combined PDF into the team PDF files and move it next to the LaTeX directory."""
+    combined_pdf_path = os.path.join(build_dir, COMBINED_NAME + '.pdf')
+    page_ranges = latex_render.read_page_marks(os.path.join(build_dir, COMBINED_NAME + '.pages'),
+                                               pdf_pages.page_count(combined_pdf_path), len(names))
+    team_pdfs = {}
+    failed = []
+    for name, page_range in zip(names, page_ranges):
+        if page_range is None:
+            logging.error(f'No pages for roster {name}')
+            failed.append(name)
+        else:
+            team_pdfs[os.path.join(latex_dir, name + '.pdf')] = page_range
+            metrics.record('rosters', name, pages=page_range[1] - page_range[0] + 1)
+    pdf_pages.split_pdf(combined_pdf_path, team_pdfs)
+
+    output_pdf_path = os.path.join(os.path.dirname(os.path.abspath(latex_dir)), COMBINED_NAME + '.pdf')
+    shutil.move(combined_pdf_path, output_pdf_path)
+    logging.info(f'Created combined PDF: {output_pdf_path}')
+    return failed
+
+
+def build_previews(csv_dir, preview_dir):
+    """Write a preview PDF of every roster in the CSV directory, return the CSV files that failed."""
+    failed = []
+    for csv_file in sorted(os.listdir(csv_dir)):
+        if csv_file.endswith('.csv'):
+            name = os.path.splitext(csv_file)[0]
+            csv_file_path = os.path.join(csv_dir, csv_file)
+            pdf_file_path = os.path.join(preview_dir, name + '.pdf')
+
+            start = time.perf_counter()
+            try:
+                pages = pdf_preview.write_roster_preview(csv_file_path, pdf_file_path)
+            except (OSError, csv.Error) as e:
+                logging.error(f'Error previewing {csv_file_path}: {e}')
+                failed.append(csv_file_path)
+                continue
+            metrics.record('rosters', name, generate_seconds=round(time.perf_counter() - start, 4), pages=pages)
+            logging.info(f'Created preview PDF: {pdf_file_path}')
+    return failed
+
+
+def record_successful_builds(manifest, stale, failed):
+    """Record the build keys of the rosters that compiled in the build manifest."""
+    for tex_file_path, key in stale.items():
+        if tex_file_path not in failed:
+            name = os.path.splitext(os.path.basename(tex_file_path))[0]
+            build_manifest.record_build(manifest, name, key)
+
+
+def build_rosters(csv_dir, template_file, latex_dir, pdflatex_path, options):
+    """Generate and compile the rosters that changed since the last build, return the failed LaTeX files."""
+    manifest_path = build_manifest.get_manifest_path(latex_dir)
+    manifest = build_manifest.load_manifest(manifest_path)
+    if options.force:
+        manifest['rosters'] = {}
+
+    format_cache_dir = latex_format.get_format_cache_dir(latex_dir) if options.format_cache else None
+
+    logging.info(f'Processing CSV directory: {csv_dir}, compiling in directory: {latex_dir} ({options.jobs} jobs)')
+    latex_files = generate_latex_files(csv_dir, template_file, latex_dir, manifest, latex_command(pdflatex_path),
+                                       options.render)
+    with metrics.stage('generate_and_compile'):
+        stale, failed = compile_latex_pipeline(latex_files, latex_dir, pdflatex_path, options.jobs, format_cache_dir)
+
+    record_successful_builds(manifest, stale, failed)
+    with metrics.stage('save_manifest'):
+        build_manifest.save_manifest(manifest_path, manifest)
+
+    up_to_date = len([entry for entry in os.listdir(csv_dir) if entry.endswith('.csv')]) - len(stale)
+    logging.info(f'Rosters rebuilt: {len(stale) - len(failed)}, up-to-date: {up_to_date}, failed: {len(failed)}')
+    return failed
+
+
+def typeset_cards(template_content, cards, latex_dir, pdflatex_path, cache, jobs=1):
+    """Typeset the cards, a dict of card key to CSV row, and add them to the card cache.
+
+    The cards are split into at most jobs documents compiled in parallel. A document that
+    fails is typeset again in halves, down to single cards, so a card pdflatex rejects only
+    fails the rosters it is on. Returns the set of the keys of the cards that failed.
+    """
+    keys = list(cards)
+    batch_size = max(1, -(-len(keys) // jobs))
+    batches = [keys[start:start + batch_size] for start in range(0, len(keys), batch_size)]
+
+    def typeset(name, batch):
+        build_dir = os.path.join(latex_dir, BUILD_DIR_NAME, name)
+        tex_file_path = os.path.join(build_dir, name + '.tex')
+        try:
+            os.makedirs(build_dir, exist_ok=True)
+            with open(tex_file_path, 'w') as f:
+                f.write(latex_render.render_card_document(template_content, [cards[key] for key in batch]))
+            ok = compile_latex_file(tex_file_path, build_dir, pdflatex_path)
+            if ok:
+                cache.store_cards(os.path.join(build_dir, name + '.pdf'), os.path.join(build_dir, name + '.cards'),
+                                  batch)
+        except (OSError, ValueError, pdf_pages.PdfError) as e:
+            logging.error(f'Error typesetting the cards of {tex_file_path}: {e}')
+            ok = False
+
+        if not ok and len(batch) == 1:
+            # Keep the build directory of a failed card around for inspection
+            return batch
+        shutil.rmtree(build_dir, ignore_errors=True)
+        if ok:
+            return []
+        logging.info(f'Typesetting the {len(batch)} cards of {name} in halves to find the failing ones')
+        half = len(batch) // 2
+        return typeset(f'{name}_1', batch[:half]) + typeset(f'{name}_2', batch[half:])
+
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        results = executor.map(typeset, [f'{CARDS_NAME}_{number}' for number in range(1, len(batches) + 1)], batches)
+        return {key for failed in results for key in failed}
+
+
+def build_card_rosters(csv_dir, template_file, latex_dir, pdflatex_path, options):
+    """Put the rosters that changed since the last build together from cached player cards.
+
+    Only the cards that are not in the card cache yet are typeset. Returns the names of the
+    rosters that failed.
+    """
+    manifest_path = build_manifest.get_manifest_path(latex_dir)
+    manifest = build_manifest.load_manifest(manifest_path)
+    if options.force:
+        manifest['rosters'] = {}
+
+    with open(template_file, 'r') as f:
+        template_content = f.read()
+    fields = latex_render.parse_player_block(template_content)[3]
+    template_hash = build_manifest.hash_file(template_file)
+    command = latex_command(pdflatex_path)
+    cache = card_cache.CardCache(card_cache.get_card_cache_dir(latex_dir))
+
+    logging.info(f'Processing CSV directory: {csv_dir}, building from cards in directory: {latex_dir}')
+    rosters = {}  # roster name -> (build key, card keys)
+    missing = {}  # card key -> CSV row, for the cards that are not cached
+    up_to_date = 0
+    for csv_file in sorted(os.listdir(csv_dir)):
+        if csv_file.endswith('.csv'):
+            csv_file_path = os.path.join(csv_dir, csv_file)
+            name = os.path.splitext(csv_file)[0]
+            key = build_manifest.roster_build_key(build_manifest.hash_file(csv_file_path), template_hash, command,
+                                                  RENDER_CARDS)
+            pdf_file_path = os.path.join(latex_dir, name + '.pdf')
+            if build_manifest.is_up_to_date(manifest, name, key, pdf_file_path):
+                logging.info(f'Up-to-date: {pdf_file_path}')
+                up_to_date += 1
+                continue
+
+            card_keys = []
+            for row in latex_render.read_roster(csv_file_path):
+                card_key = cache.key(template_hash, command, fields, row)
+                if card_key not in missing and not cache.has(card_key):
+                    missing[card_key] = row
+                card_keys.append(card_key)
+            rosters[name] = key, card_keys
+
+    cards = sum(len(card_keys) for _, card_keys in rosters.values())
+    logging.info(f'Cards to typeset: {len(missing)}, cached: {cards - len(missing)}')
+    with metrics.stage('typeset_cards'):
+        failed_cards = typeset_cards(template_content, missing, latex_dir, pdflatex_path, cache, options.jobs)
+
+    failed = []
+    with metrics.stage('assemble'):
+        for name, (key, card_keys) in rosters.items():
+            pdf_file_path = os.path.join(latex_dir, name + '.pdf')
+            if not card_keys:
+                logging.error(f'No players for roster {name}')
+                failed.append(name)
+                continue
+            if failed_cards.intersection(card_keys):
+                logging.error(f'Cards of roster {name} failed to typeset')
+                failed.append(name)
+                continue
+            try:
+                pages = cache.assemble(card_keys, pdf_file_path)
+            except (OSError, pdf_pages.PdfError) as e:
+                logging.error(f'Error putting roster {name} together: {e}')
+                failed.append(name)
+                continue
+            metrics.record('rosters', name, pages=pages, cards=len(card_keys))
+            build_manifest.record_build(manifest, name, key)
+            logging.info(f'Created PDF from cards: {pdf_file_path}')
+    cache.evict()
+
+    with metrics.stage('save_manifest'):
+        build_manifest.save_manifest(manifest_path, manifest)
+
+    logging.info(f'Rosters rebuilt: {len(rosters) - len(failed)}, up-to-date: {up_to_date}, failed: {len(failed)}')
+    return failed
 
 
 def cleanup_auxiliary_tex_files(latex_dir):
@@ -109,24 +554,54 @@ def cleanup_auxiliary_tex_files(latex_dir):
         if file.endswith('.log') or file.endswith('.aux'):
             os.remove(os.path.join(latex_dir, file))
 
+    # Only failed jobs leave a build directory behind
+    build_root = os.path.join(latex_dir, BUILD_DIR_NAME)
+    if os.path.isdir(build_root) and not os.listdir(build_root):
+        os.rmdir(build_root)
+
 def main(args):
+    global metrics, latex_timeout
+
     try:
+        options, args = parse_options(args)
+        metrics = run_metrics.Metrics('create_latex_rosters', options.metrics, run_metrics.profile_dir(options))
+        latex_timeout = options.latex_timeout
         csv_dir, template_file = get_csv_dir_and_template(args)
-        check_dependencies(PDFLATEX_PATH, template_file)
-
-        latex_dir = create_latex_directory()
 
-        logging.info(f'Processing CSV directory: {csv_dir}')
-        process_csv_files(csv_dir, template_file, latex_dir)
+        if options.backend == BACKEND_PREVIEW:
+            # the preview does not need TeX and never overwrites the typeset rosters
+            latex_dir = create_latex_directory(PREVIEW_DIR)
+            logging.info(f'Writing preview PDFs of the rosters in {csv_dir} to {latex_dir}')
+            with metrics.stage('preview'):
+                failed = build_previews(csv_dir, latex_dir)
+        else:
+            pdflatex_path = latex_runner.resolve_pdflatex(options.pdflatex)
+            check_dependencies(pdflatex_path, template_file)
+            latex_dir = create_latex_directory()
 
-        logging.info(f'Compiling LaTeX files in directory: {latex_dir}')
-        compile_latex_files(latex_dir, PDFLATEX_PATH)
+            if options.combined:
+                logging.info(f'Typesetting all rosters in {csv_dir} in one document, '
+                             f'the build manifest is not used or updated')
+                failed = build_combined_rosters(csv_dir, template_file, latex_dir, pdflatex_path)
+            elif options.render == RENDER_CARDS:
+                failed = build_card_rosters(csv_dir, template_file, latex_dir, pdflatex_path, options)
+            else:
+                failed = build_rosters(csv_dir, template_file, latex_dir, pdflatex_path, options)
 
     except Exception as e:
         logging.error(f"An error occurred: {e}")
+        metrics.save()
         sys.exit(1)
 
-    cleanup_auxiliary_tex_files(latex_dir)
+    with metrics.stage('cleanup'):
+        cleanup_auxiliary_tex_files(latex_dir)
+    metrics.save()
+    if failed and options.backend == BACKEND_PREVIEW:
+        logging.error(f'Finished with {len(failed)} failed previews.')
+        sys.exit(1)
+    if failed:
+        logging.error(f'Finished with {len(failed)} failed rosters, see the logs in {os.path.join(latex_dir, BUILD_DIR_NAME)}.')
+        sys.exit(1)
     logging.info('Finished creating PDF rosters.')
     
 
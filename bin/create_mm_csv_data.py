@@ -7,13 +7,27 @@
 # It also, as a parameter, takes the directory for the individual photos,
 # including a file called team_photo and the team name, and builds a new 
 # CSV file for Photoshop to automating building memory mates.
+#
+# With --batch it takes the exporter's CSV directory and a photos root with a
+# folder per team instead, and builds the memory mate CSV files of all teams
+# at once: create_mm_csv_data.py --batch [-j N] <csv_dir> <photos_root>
 
 import csv
 import sys
 import os
-import pprint
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+import photo_index
+
+# Columns of the memory mate CSV file, in order
+MM_FIELD_NAMES = ['Lastname', 'Firstname', 'Sweater', 'Teamname', 'Photo', 'Team']
 
-pp = pprint.PrettyPrinter(indent=4)
+# Photo used for players without a photo
+BLANK_PHOTO = "blank"
+
+# Cached listings of the team folders, kept in the photos root
+SCAN_CACHE_NAME = '.photo_scan_cache.json'
 
 # 
 def photos_full_path(directory):
@@ -26,6 +40,14 @@ def photos_full_path(directory):
 
     return fp_names
 
+def is_photo_name(name):
+    '''Skips hidden files and the CSV files written next to the photos'''
+    return not name.startswith('.') and not name.lower().endswith('.csv')
+
+def is_photo_file(file):
+    '''Skips hidden files, directories and the CSV files written next to the photos'''
+    return is_photo_name(os.path.basename(file)) and os.path.isfile(file)
+
 def find_team_photo(photo_list):
     '''Finds the team photo from the list'''
 
@@ -40,69 +62,180 @@ def create_mm_csv_path(directory, filename):
     newfile = os.path.splitext(os.path.basename(filename))[0] + "_mm.csv"
     return directory + '/' + newfile
 
+def match_player_photos(players, team_name, team_photo, index):
+    '''Adds the team name, photo and team photo to every player, returns the rows and the match report'''
+    rows = []
+    report = {photo_index.MATCH_FUZZY: [], photo_index.MATCH_AMBIGUOUS: [], photo_index.MATCH_MISSING: []}
+    matched = set()
+
+    for row in players:
+        row["Teamname"] = team_name
+
+        # Clean up any blank spaces in Lastname or Firstname
+        row["Lastname"] = (row.get("Lastname") or "").strip()
+        row["Firstname"] = (row.get("Firstname") or "").strip()
+
+        # look for player photos:
+        match = index.match(row["Firstname"], row["Lastname"], row.get("Sweater"))
+        if match.kind != photo_index.MATCH_EXACT:
+            report[match.kind].append((row, match))
+        if match.photo is None:
+            row["Photo"] = BLANK_PHOTO
+        else:
+            row["Photo"] = match.photo
+            matched.add(match.photo)
+
+        row["Team"] = team_photo
+        rows.append(row)
+
+    report['unused'] = sorted(photo for photo in index.photos if photo not in matched)
+    return rows, report
+
+def print_match_report(report):
+    '''Prints the players without a sure photo match, and the photos no player matched'''
+    for row, match in report[photo_index.MATCH_MISSING]:
+        print("Error: could not find player photo: {}".format(row["Lastname"]))
+    for row, match in report[photo_index.MATCH_AMBIGUOUS]:
+        print("Error: several photos match player {} {}: {}".format(row["Firstname"], row["Lastname"],
+                                                                    ", ".join(match.candidates)))
+    for row, match in report[photo_index.MATCH_FUZZY]:
+        print("Warning: no exact photo for {} {}, using closest match: {}".format(row["Firstname"], row["Lastname"],
+                                                                                  match.photo))
+    if report['unused']:
+        print("Photos not matched to any player: {}".format(len(report['unused'])))
+        for photo in report['unused']:
+            print("  {}".format(photo))
+
+def write_mm_csv(new_csv_file, rows):
+    '''Writes the memory mate CSV file'''
+    with open(new_csv_file, "w", newline="") as new_csv:
+        csv_writer = csv.DictWriter(new_csv, fieldnames=MM_FIELD_NAMES, extrasaction="ignore")
+        csv_writer.writeheader()
+        csv_writer.writerows(rows)
+
+def build_mm_csv(team_name, filename, path, file_names, team_photo):
+    '''Matches the players in the CSV file to their photos and writes the memory mate CSV file'''
+    # index the photos once, every player is then looked up by name
+    index = photo_index.PhotoIndex(file_names)
+    new_csv_file = create_mm_csv_path(path, filename)
+
+    with open(filename, newline="") as csv_file:
+        rows, report = match_player_photos(csv.DictReader(csv_file), team_name, team_photo, index)
+
+    write_mm_csv(new_csv_file, rows)
+    return new_csv_file, report
+
+def find_team_folders(csv_dir, photos_root):
+    '''Pairs every CSV file with its team's photo folder, None if the team has no folder
+
+    Folder names are compared by their name tokens, so "Bantam AAA" is the folder of Bantam_AAA.csv.
+    '''
+    folders = {}
+    with os.scandir(photos_root) as entries:
+        for entry in entries:
+            if entry.is_dir() and not entry.name.startswith('.'):
+                folders[tuple(photo_index.name_tokens(entry.name))] = photos_root + '/' + entry.name
+
+    teams = []
+    for csv_name in sorted(os.listdir(csv_dir)):
+        if csv_name.endswith('.csv') and not csv_name.endswith('_mm.csv'):
+            tokens = tuple(photo_index.name_tokens(os.path.splitext(csv_name)[0]))
+            teams.append((os.path.join(csv_dir, csv_name), folders.get(tokens)))
+    return teams
+
+def create_team_mm_csv(filename, folder, cache):
+    '''Builds the memory mate CSV file of one team in batch mode, returns a summary'''
+    team_name = os.path.basename(folder)
+    summary = {'team': team_name, 'filename': filename, 'mm_csv': None, 'report': None, 'error': None}
+
+    file_names = [folder + '/' + name for name in cache.listdir(folder) if is_photo_name(name)]
+    team_photo = find_team_photo(file_names)
+    if team_photo is None:
+        summary['error'] = "Could not find team photo in {}".format(folder)
+        return summary
+    file_names.remove(team_photo)
+
+    mtime_ns = os.stat(folder).st_mtime_ns
+    summary['mm_csv'], summary['report'] = build_mm_csv(team_name, filename, folder, file_names, team_photo)
+    cache.add_file(folder, os.path.basename(summary['mm_csv']), mtime_ns)
+    return summary
+
+def main_batch(csv_dir, photos_root, jobs=None):
+    '''Builds the memory mate CSV files of every team in the CSV directory concurrently'''
+    cache = photo_index.DirectoryScanCache(os.path.join(photos_root, SCAN_CACHE_NAME))
+    teams = find_team_folders(csv_dir, photos_root)
+
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        futures = [executor.submit(create_team_mm_csv, filename, folder, cache)
+                   for filename, folder in teams if folder is not None]
+        summaries = [future.result() for future in futures]
+    cache.save()
+
+    # the reports are printed in team order once every team is done
+    errors = 0
+    for filename, folder in teams:
+        if folder is None:
+            print("Error: no photo folder for {}".format(os.path.basename(filename)))
+            errors += 1
+    for summary in summaries:
+        print("\nTeam: {}".format(summary['team']))
+        if summary['error'] is not None:
+            print("ERROR: {}".format(summary['error']))
+            errors += 1
+            continue
+        print("Memory mate CSV: {}".format(summary['mm_csv']))
+        print_match_report(summary['report'])
+
+    print("\nTeams: {}, errors: {}, photo folders scanned: {}".format(len(teams), errors, cache.scanned))
+    return summaries, errors
+
+def parse_options(args):
+    '''Split the batch options from the positional arguments'''
+    parser = argparse.ArgumentParser(description='Create memory mate CSV files.')
+    parser.add_argument('--batch', action='store_true',
+                        help='Build the memory mate CSV files of every team: <csv_dir> <photos_root>.')
+    parser.add_argument('-j', '--jobs', type=int, default=None,
+                        help='Number of teams to process concurrently in batch mode.')
+    options, remaining = parser.parse_known_args(args[1:])
+    return options, args[:1] + remaining
+
 #--------------------------------------------------------------
 
-if len(sys.argv) != 4:
-    print("Inputs needed team name, csv file, and path to photos")
-    exit(1)
+def main(args):
+    options, args = parse_options(args)
+    if options.batch:
+        if len(args) != 3:
+            print("Inputs needed csv directory and photos root with a folder per team")
+            exit(1)
+        _, errors = main_batch(args[1], args[2], options.jobs)
+        if errors:
+            exit(1)
+        return None
 
-# csv fileused id Geeks.csv
-team_name = sys.argv[1]
-filename= sys.argv[2]
-path = sys.argv[3]
+    if len(args) != 4:
+        print("Inputs needed team name, csv file, and path to photos")
+        exit(1)
 
-print("Path = {}".format(path))
-print("Filename = {}".format(filename))
+    team_name = args[1]
+    filename = args[2]
+    path = args[3]
 
-file_names = photos_full_path(path)
+    print("Path = {}".format(path))
+    print("Filename = {}".format(filename))
 
-team_photo = find_team_photo(file_names)
-if team_photo is None:
-    print("ERROR: Could not find team photo, exiting...")
-    exit(1)
+    file_names = [file for file in photos_full_path(path) if is_photo_file(file)]
 
-file_names.remove(team_photo)
-print("Team photo: {}".format(team_photo))
+    team_photo = find_team_photo(file_names)
+    if team_photo is None:
+        print("ERROR: Could not find team photo, exiting...")
+        exit(1)
 
-#
-player_data = csv.DictReader(open(filename))
-field_names = player_data.fieldnames
-csv_file_path = os.path.dirname(filename)
-new_csv_file = create_mm_csv_path(path, filename)
-
-with open(new_csv_file, "w") as new_csv:
-
-    try:
-        field_names.remove("")
-    except:
-        pass
-        
-    field_names.append("Teamname")
-    field_names.append("Photo")
-    
-    # if the field name Team is not in the list, add it
-    if "Team" not in field_names:
-        field_names.append("Team")
-
-    neworder = ['Lastname', 'Firstname', 'Sweater', 'Teamname', 'Photo', 'Team']
-    csv_writer = csv.DictWriter(new_csv,fieldnames=neworder)
-    csv_writer.writeheader()
-
-    for row in player_data:
-        row["Teamname"] = team_name
+    file_names.remove(team_photo)
+    print("Team photo: {}".format(team_photo))
 
-        # Clean up any blank spaces in Lastname or Firstname
-        row["Lastname"] = row["Lastname"].strip()
-        row["Firstname"] = row["Firstname"].strip()
-        
-        # look for player photos:
-        for player in file_names:
-            if row["Lastname"] in player and row["Firstname"] in player:
-                row["Photo"] = player
-
-        if row["Photo"] is None:
-            print("Error: could not find player photo: {}".format(row["Lastname"]))
-            row["Photo"] = "blank"
-        
-        row["Team"] = team_photo
-        csv_writer.writerow(row)
+    _, report = build_mm_csv(team_name, filename, path, file_names, team_photo)
+    print_match_report(report)
+    return report
+
+if __name__ == "__main__":
+    main(sys.argv)
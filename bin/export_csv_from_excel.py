@@ -11,16 +11,69 @@ import openpyxl
 import os
 import argparse
 import sys
+import glob
+import io
+import json
+import shutil
+import tempfile
+import time
+import contextlib
+from concurrent.futures import ProcessPoolExecutor
+from collections import Counter, OrderedDict
+from itertools import islice
+
+import names
+import roster_index
+import run_metrics
+import sheet_cache
+import xlsx_reader
 
 # Initial player count
 player_count = 0
 
+# Name rules shared by the module level cleaning functions
+name_normalizer = names.NameNormalizer()
+
+# Run metrics, collected with --metrics or --profile
+metrics = run_metrics.Metrics('export_csv_from_excel')
+
 # Header constants needs to match the headers in the Excel file
 HEADER_FIRSTNAME = 'Players First Name'
 HEADER_LASTNAME = 'Players Last Name'
 HEADER_TEAM = 'Players Team'
 HEADER_SWEATER = 'Jersey Number'
 
+# Number of rows cleaned and written together
+BATCH_ROWS = 1000
+
+# Teams with fewer players than this are flagged after exporting by team
+MIN_TEAM_SIZE = 10
+
+# Limits for the team CSV files kept open, and the rows buffered for the other teams, when exporting by team
+MAX_OPEN_TEAM_FILES = 32
+TEAM_BUFFER_ROWS = 500
+
+# Workbook readers: openpyxl, or the faster xlsx_reader that only reads the mapped columns
+READER_OPENPYXL = 'openpyxl'
+READER_XLSX = 'xlsx'
+
+# Report written by --check unless --check-report names another file, a .csv report lists the problems as CSV rows
+CHECK_REPORT = 'check_report.json'
+CHECK_COLUMNS = ['problem', 'workbook', 'sheet', 'row', 'team', 'player', 'sweater', 'detail']
+
+# Problems found by --check
+PROBLEM_MISSING_HEADERS = 'missing_headers'
+PROBLEM_EMPTY_FIRST_NAME = 'empty_first_name'
+PROBLEM_EMPTY_LAST_NAME = 'empty_last_name'
+PROBLEM_EMPTY_TEAM = 'empty_team'
+PROBLEM_DEFAULT_SWEATER = 'default_sweater'
+PROBLEM_DUPLICATE_SWEATER = 'duplicate_sweater'
+PROBLEM_SEVERAL_TEAMS = 'player_on_several_teams'
+PROBLEM_SMALL_TEAM = 'small_team'
+
+# Workbook files picked up when a directory is exported, Excel lock files start with ~$
+WORKBOOK_EXTENSIONS = ('.xlsx', '.xlsm')
+
 # Create mapping for header names to original header names
 header_mapping = {
     HEADER_FIRSTNAME: 'Firstname',
@@ -29,30 +82,20 @@ header_mapping = {
     HEADER_SWEATER: 'Sweater'
 }
 
+def print_name_alerts(known_alerts):
+    """Print the alerts name_normalizer found after the first known_alerts ones."""
+    for alert in list(name_normalizer.alerts.values())[known_alerts:]:
+        print(alert)
+
 def clean_name(name, is_last_name=False):
-    """Clean a name by removing leading/trailing spaces and capitalizing the first letter."""
-    if name is None:
-        return None
-    name = name.strip()
-    if len(name) == 2 and is_last_name:  # if it's a last name and has only two letters
-        return name[0].upper() + name[1].lower()
-    
-    # if name is not a last_namd capitalize both letters unless it matches 'Ty'
-    if len(name) == 2 and name.lower() != 'ty':
-        return name[0].upper() + name[1].upper()
-    
-    # if the name has a hyphen, capitalize the first letter after the hyphen
-    if '-' in name:
-        return '-'.join(word.capitalize() for word in name.split('-'))
-
-    # if the last_name has two c next two each other in the name, capitalize the second c
-    if 'mcc' in name.lower() or 'macc' in name.lower():
-        print(f"Alert: Found 'cc' in name '{name}'")
-        name = name.replace('cc', 'cC')
-    # if the name has two words, capitalize each word
-    if len(name.split()) == 2:
-        return ' '.join(word.capitalize() if word.lower() not in ['iii', 'iv'] else word.upper() for word in name.split())
-    return name.capitalize()
+    """Clean a name by removing leading/trailing spaces and capitalizing the first letter.
+
+    The rules are in names.NAME_RULES, new alerts are printed.
+    """
+    known_alerts = len(name_normalizer.alerts)
+    name = name_normalizer.normalize(name, is_last_name)
+    print_name_alerts(known_alerts)
+    return name
 
 def clean_sweater_number(sweater_number):
     """Clean a sweater number by removing non-digit characters."""
@@ -61,6 +104,13 @@ def clean_sweater_number(sweater_number):
     cleaned_number = ''.join(filter(str.isdigit, str(sweater_number)))
     return cleaned_number if cleaned_number else '00'
 
+def clean_last_name(name):
+    """Clean a last name, mixed case last names are kept as entered, new alerts are printed."""
+    known_alerts = len(name_normalizer.alerts)
+    name = name_normalizer.last_name(name)
+    print_name_alerts(known_alerts)
+    return name
+
 def clean_row(row, headers):
     global player_count
 
@@ -74,13 +124,7 @@ def clean_row(row, headers):
     if row[firstname_index] is None:
         print(f"Error: {HEADER_FIRSTNAME} is empty in row '{row[lastname_index]}' -- team: {row[headers.index(HEADER_TEAM)]}")
 
-    # if the last name is all caps then call clean_name with is_last_name=True
-    if row[lastname_index] is not None and row[lastname_index].isupper():
-        row[lastname_index] = clean_name(row[lastname_index], is_last_name=True)
-    # if last name is all lower case, capitalize the first letter
-    elif row[lastname_index] is not None and row[lastname_index].islower():
-        row[lastname_index] = clean_name(row[lastname_index])
-        
+    row[lastname_index] = clean_last_name(row[lastname_index])
     if row[lastname_index] is None:
         print(f"Error: {HEADER_LASTNAME} is empty in row '{row[firstname_index]}' -- team: {row[headers.index(HEADER_TEAM)]}")
 
@@ -89,138 +133,817 @@ def clean_row(row, headers):
     player_count += 1
     return row
 
-def export_by_workbook(filename):
+def get_cleaning_plan(headers):
+    """Resolve the first name, last name, team and sweater column indexes once per sheet."""
+    return (headers.index(HEADER_FIRSTNAME), headers.index(HEADER_LASTNAME),
+            headers.index(HEADER_TEAM), headers.index(HEADER_SWEATER))
+
+def clean_rows(rows, plan):
+    """Clean a batch of rows column by column, gives the same rows as calling clean_row on each row."""
     global player_count
-    
-    # Open the Excel file
-    wb = openpyxl.load_workbook(filename)
-    
-    player_count = 0
-    # Iterate through each sheet in the workbook
-    for sheet in wb:
-        # Get the first row (which should contain the headers)
-        headers = [cell.value for cell in next(sheet.rows)]
-
-        # Check if the required headers are present
-        if not all(header in headers for header in header_mapping.keys()):
-            print(f"Error: Required headers not found in sheet '{sheet.title}'")
-            continue
-        
-        # If sheet.title has a space in the name, replace it with an underscore
-        sheet.title = sheet.title.replace(' ', '_')
-        
-        # replace any characters that are not allowed in a filename with an underscore
-        sheet.title = ''.join(c if c.isalnum() else '_' for c in sheet.title)
-        
-        # Create a CSV file for the sheet
-        with open(f'csv/{sheet.title}.csv', 'w', newline='') as csv_file:
-            # Create a CSV writer
-            writer = csv.writer(csv_file)
-            # Write the mapped headers to the CSV file
-            writer.writerow([header_mapping[header] for header in headers])
-            # Iterate through the rest of the rows in the sheet and write them to the CSV file
-            for row in sheet.iter_rows(min_row=2, values_only=True):  # start from the second row to skip the header
-                cleaned_row = clean_row(row, headers)
-                writer.writerow(cleaned_row)
+
+    known_alerts = len(name_normalizer.alerts)
+    rows, errors = clean_batch(rows, plan)
+    for error in errors:
+        print(error)
+    print_name_alerts(known_alerts)
+
+    player_count += len(rows)
+    return rows
+
+def clean_batch(rows, plan, normalizer=None):
+    """Clean a batch of rows column by column, return the cleaned rows and the errors found in them."""
+    if not rows:
+        return [], []
+    normalizer = normalizer or name_normalizer
+    firstname_index, lastname_index, team_index, sweater_index = plan
+
+    columns = [list(column) for column in zip(*rows)]
+    raw_lastnames = columns[lastname_index]
+    firstnames = columns[firstname_index] = list(map(normalizer.normalize, columns[firstname_index]))
+    lastnames = columns[lastname_index] = list(map(normalizer.last_name, raw_lastnames))
+    columns[sweater_index] = list(map(clean_sweater_number, columns[sweater_index]))
+
+    errors = []
+    if None in firstnames or None in lastnames:
+        for firstname, lastname, raw_lastname, team in zip(firstnames, lastnames, raw_lastnames, columns[team_index]):
+            if firstname is None:
+                errors.append(f"Error: {HEADER_FIRSTNAME} is empty in row '{raw_lastname}' -- team: {team}")
+            if lastname is None:
+                errors.append(f"Error: {HEADER_LASTNAME} is empty in row '{firstname}' -- team: {team}")
+
+    return list(zip(*columns)), errors
+
+def iter_batches(rows, size=BATCH_ROWS):
+    """Group rows into lists of at most size rows."""
+    rows = iter(rows)
+    while True:
+        batch = list(islice(rows, size))
+        if not batch:
+            return
+        yield batch
+
+def open_workbook(filename):
+    """Open the Excel file in read-only, data-only mode so rows are streamed from disk."""
+    return openpyxl.load_workbook(filename, read_only=True, data_only=True)
+
+def get_column_plan(headers, mapping=None):
+    """Return the indexes and headers of the mapped columns, in sheet order, ignoring any extra columns."""
+    mapping = header_mapping if mapping is None else mapping
+    indexes = [index for index, header in enumerate(headers) if header in mapping]
+    return indexes, [headers[index] for index in indexes]
+
+def project_row(row, indexes):
+    """Pick the mapped columns out of a row, read-only sheets may return short rows."""
+    return [row[index] if index < len(row) else None for index in indexes]
+
+def record_rows(rows, read_rows):
+    """Yield the rows, appending each one to read_rows."""
+    for row in rows:
+        read_rows.append(row)
+        yield row
+
+def sanitize_filename(name):
+    """Replace blank spaces and any characters that are not allowed in a filename with an underscore."""
+    name = str(name).replace(' ', '_') if name else ""
+    return ''.join(c if c.isalnum() else '_' for c in name)
 
 def get_headers(sheet):
     """Get the headers from the first row of the sheet."""
-    return [cell.value for cell in next(sheet.rows)]
+    for row in sheet.iter_rows(max_row=1, values_only=True):
+        return list(row)
+    return []
 
-def create_csv_writer(team_name, headers):
+def create_csv_writer(team_name, headers, output_dir='csv', mapping=None):
     """Create a new CSV writer for a team."""
-    # replace any blank spaces from the team name with an underscore
-    file_name = team_name.replace(' ', '_') if team_name else ""
-    # replace any characters that are not allowed in a filename with an underscore
-    file_name = ''.join(c if c.isalnum() else '_' for c in file_name)
-    
+    mapping = header_mapping if mapping is None else mapping
     # create a new CSV file and writer
-    csv_file = open(f'csv/{file_name}.csv', 'w', newline='')
+    csv_file = open(os.path.join(output_dir, f'{sanitize_filename(team_name)}.csv'), 'w', newline='')
     writer = csv.writer(csv_file)
-    writer.writerow([header_mapping[header] for header in headers])  # write the mapped headers to the CSV file
+    writer.writerow([mapping[header] for header in headers])  # write the mapped headers to the CSV file
 
     return csv_file, writer
 
-def export_by_team(filename):
+def append_csv_writer(team_name, output_dir='csv'):
+    """Reopen a team CSV file created earlier in the export for appending."""
+    csv_file = open(os.path.join(output_dir, f'{sanitize_filename(team_name)}.csv'), 'a', newline='')
+    return csv_file, csv.writer(csv_file)
+
+class TeamCsvRouter:
+    """Route rows to per-team CSV files, the rows of a team do not need to be contiguous.
+
+    At most max_open_files team files are kept open, the least recently used one is closed
+    when another team needs a file. Rows for teams without an open file are buffered in memory
+    and flushed in bulk once buffer_rows rows are waiting. A team file is only created (and
+    truncated) the first time the team is seen, later flushes append to it.
+    """
+
+    def __init__(self, headers, max_open_files=MAX_OPEN_TEAM_FILES, buffer_rows=TEAM_BUFFER_ROWS,
+                 output_dir='csv', mapping=None):
+        self.headers = headers
+        self.output_dir = output_dir
+        self.mapping = mapping
+        self.max_open_files = max(1, max_open_files)
+        self.buffer_rows = buffer_rows
+        self.open_files = OrderedDict()  # file name -> (csv file, writer), least recently used first
+        self.buffers = {}                # file name -> rows waiting to be written
+        self.created = set()             # file names already created in this export
+        self.team_names = {}             # file name -> team name
+        self.team_counts = OrderedDict()  # team name -> number of players
+
+    def write(self, team_name, row):
+        """Write a row to the team's CSV file, or buffer it if the file is not open."""
+        file_name = sanitize_filename(team_name)
+        if team_name not in self.team_counts:
+            print(f"Team:", team_name)
+            self.team_counts[team_name] = 0
+        self.team_counts[team_name] += 1
+        self.team_names.setdefault(file_name, team_name)
+
+        if file_name in self.open_files:
+            self.open_files.move_to_end(file_name)
+            self.open_files[file_name][1].writerow(row)
+        elif len(self.open_files) < self.max_open_files:
+            self._open(file_name)[1].writerow(row)
+        else:
+            buffer = self.buffers.setdefault(file_name, [])
+            buffer.append(row)
+            if len(buffer) >= self.buffer_rows:
+                self._flush(file_name)
+
+    def _open(self, file_name):
+        """Open a team file, closing the least recently used one if too many are open."""
+        while len(self.open_files) >= self.max_open_files:
+            _, (csv_file, _) = self.open_files.popitem(last=False)
+            csv_file.close()
+
+        team_name = self.team_names[file_name]
+        if file_name in self.created:
+            self.open_files[file_name] = append_csv_writer(team_name, self.output_dir)
+        else:
+            self.open_files[file_name] = create_csv_writer(team_name, self.headers, self.output_dir, self.mapping)
+            self.created.add(file_name)
+        return self.open_files[file_name]
+
+    def _flush(self, file_name):
+        """Write the buffered rows for a team in one go."""
+        rows = self.buffers.pop(file_name, [])
+        _, writer = self.open_files.get(file_name) or self._open(file_name)
+        writer.writerows(rows)
+
+    def finish_teams(self, team_names):
+        """Write the buffered rows of the teams and close their files, so the team files are complete.
+
+        Rows written for these teams later on are appended to their files.
+        """
+        for file_name in dict.fromkeys(map(sanitize_filename, team_names)):
+            if file_name in self.buffers:
+                self._flush(file_name)
+            open_file = self.open_files.pop(file_name, None)
+            if open_file is not None:
+                open_file[0].close()
+
+    def close(self):
+        """Flush every buffered team and close all files."""
+        for file_name in list(self.buffers):
+            self._flush(file_name)
+        for csv_file, _ in self.open_files.values():
+            csv_file.close()
+        self.open_files.clear()
+
+    def small_teams(self, min_size=MIN_TEAM_SIZE):
+        """Return the teams with fewer than min_size players."""
+        return [team_name for team_name, count in self.team_counts.items() if count < min_size]
+
+def describe_location(location):
+    """Describe where a row is, location is (workbook, sheet title, row number)."""
+    workbook, sheet, row = location
+    return f"{os.path.basename(workbook)} sheet '{sheet}' row {row}"
+
+class RosterCheck:
+    """Find the data problems of registration rows in a single pass, without writing any CSV file.
+
+    Rows are checked sheet by sheet, and the teams and players of every sheet and workbook
+    fed to the check are checked together. Duplicates are found with hash indexes, from
+    (team, sweater number) and from the player's name to where they were first seen, so a
+    check takes time linear in the number of rows. Every problem is kept in the problems
+    list, with the workbook, sheet and row it was found in.
+    """
+
+    def __init__(self, min_team_size=MIN_TEAM_SIZE):
+        self.min_team_size = min_team_size
+        self.names = names.NameNormalizer()
+        self.workbooks = []
+        self.rows = 0
+        self.problems = []
+        self.team_counts = OrderedDict()  # team name -> number of players
+        self.sweaters = {}                # (team name, sweater number) -> (location, player) first seen
+        self.players = {}                 # folded (first name, last name) -> {team name: location}
+
+    def report(self, problem, location=None, team=None, player=None, sweater=None, detail=''):
+        """Add a problem, location is (workbook, sheet title, row number), None for problems of a whole team."""
+        workbook, sheet, row = location or (None, None, None)
+        self.problems.append({'problem': problem, 'workbook': workbook, 'sheet': sheet, 'row': row, 'team': team,
+                              'player': player, 'sweater': sweater, 'detail': detail})
+
+    def check_rows(self, workbook, sheet, rows, plan, first_row=2):
+        """Check a batch of mapped rows of a sheet, first_row is the sheet row of the first one."""
+        firstname_index, lastname_index, team_index, sweater_index = plan
+        cleaned_rows, _ = clean_batch(rows, plan, self.names)
+        for number, (row, cleaned_row) in enumerate(zip(rows, cleaned_rows), first_row):
+            # read-only sheets pad the rows between the registrations
+            if all(value is None for value in row):
+                continue
+            self.rows += 1
+            firstname, lastname = cleaned_row[firstname_index], cleaned_row[lastname_index]
+            team, sweater = cleaned_row[team_index], cleaned_row[sweater_index]
+            location = (workbook, sheet, number)
+            player = ' '.join(str(name) for name in (firstname, lastname) if name is not None)
+
+            if firstname is None:
+                self.report(PROBLEM_EMPTY_FIRST_NAME, location, team, player, sweater, f'{HEADER_FIRSTNAME} is empty')
+            if lastname is None:
+                self.report(PROBLEM_EMPTY_LAST_NAME, location, team, player, sweater, f'{HEADER_LASTNAME} is empty')
+            if team is None:
+                self.report(PROBLEM_EMPTY_TEAM, location, team, player, sweater,
+                            f'{HEADER_TEAM} is empty, the player is left out when exporting by team')
+                continue
+            self.team_counts[team] = self.team_counts.get(team, 0) + 1
+
+            raw_sweater = row[sweater_index]
+            if not raw_sweater or not any(map(str.isdigit, str(raw_sweater))):
+                reason = 'is empty' if raw_sweater is None or not str(raw_sweater).strip() else f'{raw_sweater!r} has no digits'
+                self.report(PROBLEM_DEFAULT_SWEATER, location, team, player, sweater,
+                            f'{HEADER_SWEATER} {reason}, exported as 00')
+            else:
+                seen = (location, player)
+                first_seen = self.sweaters.setdefault((team, sweater), seen)
+                if first_seen is not seen:
+                    self.report(PROBLEM_DUPLICATE_SWEATER, location, team, player, sweater,
+                                f'Sweater {sweater} is also worn by {first_seen[1]} ({describe_location(first_seen[0])})')
+
+            if firstname is not None and lastname is not None:
+                teams = self.players.setdefault((str(firstname).casefold(), str(lastname).casefold()), {})
+                if team not in teams:
+                    for other_team, other_location in teams.items():
+                        self.report(PROBLEM_SEVERAL_TEAMS, location, team, player, sweater,
+                                    f'Also registered on {other_team} ({describe_location(other_location)})')
+                        break
+                    teams[team] = location
+
+    def finish(self):
+        """Report the small teams once every row is checked, return the check report."""
+        for team, count in self.team_counts.items():
+            if count < self.min_team_size:
+                self.report(PROBLEM_SMALL_TEAM, team=team, detail=f'{count} players, fewer than {self.min_team_size}')
+        return {
+            'workbooks': self.workbooks,
+            'rows': self.rows,
+            'teams': {str(team): count for team, count in self.team_counts.items()},
+            'problem_counts': dict(Counter(problem['problem'] for problem in self.problems)),
+            'name_alerts': list(self.names.alerts.values()),
+            'problems': self.problems,
+        }
+
+def write_check_report(report, path):
+    """Write the check report atomically, as CSV rows of the problems for a .csv file, as JSON otherwise."""
+    temp_path = path + '.tmp'
+    with open(temp_path, 'w', newline='') as f:
+        if path.lower().endswith('.csv'):
+            writer = csv.DictWriter(f, CHECK_COLUMNS)
+            writer.writeheader()
+            writer.writerows(report['problems'])
+        else:
+            json.dump(report, f, indent=2, default=str)
+    os.replace(temp_path, path)
+
+class Exporter:
+    """Export the sheets of Excel workbooks to CSV files.
+
+    An exporter owns its output directory, header mapping, player count and warnings, so
+    several workbooks can be exported in parallel threads without mixing up their totals.
+    Warnings are printed as they are found and kept in the warnings list.
+
+    The players written to every CSV file are recorded in the output directory's roster
+    index, unless index is False. With a sheet cache, the mapped columns of a workbook
+    exported before come from the cache instead of the workbook. Workbooks are read with
+    openpyxl, or with xlsx_reader if reader is READER_XLSX.
+    """
+
+    def __init__(self, output_dir='csv', mapping=None, metrics=None, index=True, cache=None, reader=READER_OPENPYXL):
+        self.output_dir = output_dir
+        self.header_mapping = dict(header_mapping if mapping is None else mapping)
+        self.metrics = metrics or run_metrics.Metrics('export_csv_from_excel')
+        self.index = index
+        self.cache = cache
+        self.reader = reader
+        self.player_count = 0
+        self.team_counts = OrderedDict()
+        self.file_rows = {}  # CSV file name -> number of players written to it
+        self.names = names.NameNormalizer()
+        self.warnings = []
+
+    def warn(self, message):
+        print(message)
+        self.warnings.append(message)
+
+    def clean_rows(self, rows, plan):
+        """Clean a batch of rows, counting the players and collecting the errors."""
+        rows, errors = clean_batch(rows, plan, self.names)
+        for error in errors:
+            self.warn(error)
+        self.player_count += len(rows)
+        return rows
+
+    def parse_sheets(self, filename):
+        """Yield (sheet title, mapped headers, rows of the mapped columns) for every sheet of the workbook.
+
+        The mapped headers are in sheet order, and None for sheets without the required headers.
+        """
+        if self.reader == READER_XLSX:
+            try:
+                with self.metrics.stage('open_workbook'):
+                    wb = xlsx_reader.XlsxWorkbook(filename)
+            except xlsx_reader.UnsupportedWorkbook as e:
+                print(f"Reading {filename} with openpyxl, the xlsx reader can not read it: {e}")
+            else:
+                yield from self.parse_xlsx_sheets(wb)
+                return
+
+        # Open the Excel file
+        with self.metrics.stage('open_workbook'):
+            wb = open_workbook(filename)
+        try:
+            for sheet in wb:
+                # Get the first row (which should contain the headers)
+                headers = get_headers(sheet)
+
+                # Check if the required headers are present
+                if not all(header in headers for header in self.header_mapping.keys()):
+                    yield sheet.title, None, iter(())
+                    continue
+                indexes, headers = get_column_plan(headers, self.header_mapping)
+                # start from the second row to skip the header
+                yield sheet.title, headers, (project_row(row, indexes) for row in sheet.iter_rows(min_row=2, values_only=True))
+        finally:
+            wb.close()
+
+    def parse_xlsx_sheets(self, wb):
+        """Yield the sheets of an xlsx_reader workbook like parse_sheets, only the mapped columns are read."""
+        with wb:
+            for title, part in wb.sheets:
+                headers = wb.headers(part)
+                if not all(header in headers for header in self.header_mapping.keys()):
+                    yield title, None, iter(())
+                    continue
+                indexes, headers = get_column_plan(headers, self.header_mapping)
+                yield title, headers, wb.iter_rows(part, indexes, min_row=2)
+
+    def read_sheets(self, filename):
+        """Yield the sheets of the workbook like parse_sheets, from the sheet cache if the workbook is cached.
+
+        A workbook that is not cached is cached once all of its rows have been read.
+        """
+        if self.cache is None:
+            yield from self.parse_sheets(filename)
+            return
+
+        with self.metrics.stage('load_cache'):
+            key = self.cache.key(filename, self.header_mapping, self.reader_version())
+            sheets = self.cache.load(key)
+        if sheets is not None:
+            self.metrics.count('sheet_cache', 'hits', 1)
+            yield from sheets
+            return
+
+        self.metrics.count('sheet_cache', 'misses', 1)
+        sheets = []
+        for title, headers, rows in self.parse_sheets(filename):
+            read_rows = []
+            sheets.append((title, headers, read_rows))
+            yield title, headers, record_rows(rows, read_rows)
+        with self.metrics.stage('store_cache'):
+            try:
+                self.cache.store(key, sheets)
+            except OSError as e:
+                print(f"Could not cache the sheets of {filename}: {e}")
+
+    def export_by_workbook(self, filename):
+        """Export every sheet of the workbook to its own CSV file, return the number of players."""
+        metrics = self.metrics
+        os.makedirs(self.output_dir, exist_ok=True)
+
+        self.player_count = 0
+        self.file_rows = {}
+        self.names = names.NameNormalizer()
+        # Iterate through each sheet in the workbook
+        for title, headers, rows in self.read_sheets(filename):
+            if headers is None:
+                self.warn(f"Error: Required headers not found in sheet '{title}'")
+                continue
+
+            # Create a CSV file for the sheet
+            csv_name = f'{sanitize_filename(title)}.csv'
+            with metrics.stage(f'sheet {title}'), \
+                    open(os.path.join(self.output_dir, csv_name), 'w', newline='') as csv_file:
+                sheet_start, sheet_players = time.perf_counter(), self.player_count
+                # Create a CSV writer
+                writer = csv.writer(csv_file)
+                # Write the mapped headers to the CSV file
+                writer.writerow([self.header_mapping[header] for header in headers])
+                # Iterate through the rest of the rows in the sheet and write them to the CSV file in batches
+                plan = get_cleaning_plan(headers)
+                for batch in metrics.timed_iter('read', iter_batches(rows, BATCH_ROWS)):
+                    with metrics.timer('clean'):
+                        batch = self.clean_rows(batch, plan)
+                    with metrics.timer('write'):
+                        writer.writerows(batch)
+                    if metrics.enabled:
+                        self.count_teams(batch, plan[2])
+
+            self.file_rows[csv_name] = self.player_count - sheet_players
+            self.record_sheet(title, self.player_count - sheet_players, time.perf_counter() - sheet_start)
+
+        self.report_name_alerts()
+        self.update_index()
+        return self.player_count
+
+    def export_by_team(self, filename, sheet_done=None):
+        """Export the rows of every sheet to one CSV file per team, return the number of players.
+
+        sheet_done is called with the sheet title and the {team name: CSV file} of the teams
+        on the sheet once their files are written, before the next sheet is read. A team that
+        is on a later sheet too gets more rows, and is passed to sheet_done again.
+        """
+        metrics = self.metrics
+        os.makedirs(self.output_dir, exist_ok=True)
+
+        self.player_count = 0
+        self.file_rows = {}
+        self.names = names.NameNormalizer()
+        router = None
+        # Iterate through each sheet in the workbook
+        for title, headers, rows in self.read_sheets(filename):
+            if headers is None:
+                self.warn(f"Error: Required headers not found in sheet '{title}'")
+                continue
+
+            if router is None:
+                router = TeamCsvRouter(headers, MAX_OPEN_TEAM_FILES, TEAM_BUFFER_ROWS, self.output_dir, self.header_mapping)
+            elif headers != router.headers:
+                # a team can appear on several sheets, keep the column order of its CSV file
+                indexes = [headers.index(header) for header in router.headers]
+                rows = (project_row(row, indexes) for row in rows)
+                headers = router.headers
+            plan = get_cleaning_plan(headers)
+            team_index = plan[2]
+
+            # Iterate through the rest of the rows in the sheet, skipping rows without a team
+            with metrics.stage(f'sheet {title}'):
+                sheet_start, sheet_players = time.perf_counter(), self.player_count
+                rows = (row for row in rows if row[team_index] is not None)
+                sheet_teams = {}
+                for batch in metrics.timed_iter('read', iter_batches(rows, BATCH_ROWS)):
+                    with metrics.timer('clean'):
+                        batch = self.clean_rows(batch, plan)
+                    with metrics.timer('write'):
+                        for cleaned_row in batch:
+                            router.write(cleaned_row[team_index], cleaned_row)
+                            sheet_teams[cleaned_row[team_index]] = None
+
+            self.record_sheet(title, self.player_count - sheet_players, time.perf_counter() - sheet_start)
+            if sheet_done is not None:
+                router.finish_teams(sheet_teams)
+                sheet_done(title, {team_name: os.path.join(self.output_dir, f'{sanitize_filename(team_name)}.csv')
+                                   for team_name in sheet_teams})
+
+        if router is not None:
+            with metrics.stage('close_team_files'):
+                router.close()
+            self.team_counts = router.team_counts
+            for team_name, count in router.team_counts.items():
+                metrics.count('teams', str(team_name), count)
+                # different team names can end up in the same file
+                csv_name = f'{sanitize_filename(team_name)}.csv'
+                self.file_rows[csv_name] = self.file_rows.get(csv_name, 0) + count
+            for team_name in router.small_teams():
+                self.warn(f"Alert: Team {team_name} has less than {MIN_TEAM_SIZE} players!")
+        self.report_name_alerts()
+        self.update_index()
+        return self.player_count
+
+    def check(self, filename, check):
+        """Check the rows of every sheet of the workbook with a RosterCheck, nothing is written.
+
+        Return the number of rows checked.
+        """
+        check.workbooks.append(filename)
+        checked_rows = check.rows
+        for title, headers, rows in self.read_sheets(filename):
+            if headers is None:
+                check.report(PROBLEM_MISSING_HEADERS, (filename, title, 1),
+                             detail=f"Required headers not found, expected {', '.join(self.header_mapping)}")
+                continue
+
+            plan = get_cleaning_plan(headers)
+            # start from the second row, the first one is the header
+            first_row = 2
+            with self.metrics.stage(f'sheet {title}'):
+                for batch in self.metrics.timed_iter('read', iter_batches(rows, BATCH_ROWS)):
+                    with self.metrics.timer('check'):
+                        check.check_rows(filename, title, batch, plan, first_row)
+                    first_row += len(batch)
+        return check.rows - checked_rows
+
+    def reader_version(self):
+        """The reader and its version, the values read depend on them."""
+        if self.reader == READER_XLSX:
+            return f'{READER_XLSX} {xlsx_reader.READER_VERSION} openpyxl {openpyxl.__version__}'
+        return f'{READER_OPENPYXL} {openpyxl.__version__}'
+
+    def report_name_alerts(self):
+        """Warn about the names found in this export that need checking."""
+        for alert in self.names.alerts.values():
+            self.warn(alert)
+
+    def update_index(self):
+        """Record the players written to every CSV file in the roster index."""
+        if self.index and self.file_rows:
+            with self.metrics.stage('update_index'):
+                roster_index.update_index(self.output_dir, self.file_rows)
+
+    def count_teams(self, rows, team_index):
+        """Add the players of a batch to the team counts of the run metrics."""
+        for team_name, count in Counter(row[team_index] for row in rows).items():
+            self.metrics.count('teams', str(team_name), count)
+
+    def record_sheet(self, title, rows, seconds):
+        """Record the rows read from a sheet in the run metrics."""
+        self.metrics.record('sheets', title, rows=rows, seconds=round(seconds, 4),
+                            rows_per_second=run_metrics.rate(rows, seconds))
+
+def export_by_workbook(filename):
+    """Export by workbook to the csv directory, setting the module's player count."""
     global player_count
-    
-    # Open the Excel file
-    wb = openpyxl.load_workbook(filename)
 
-    player_count = 0
-    # Iterate through each sheet in the workbook
-    for sheet in wb:
-        headers = get_headers(sheet)
+    player_count = Exporter('csv', metrics=metrics).export_by_workbook(filename)
 
-        # Check if the required headers are present
-        if not all(header in headers for header in header_mapping.keys()):
-            print(f"Error: Required headers not found in sheet '{sheet.title}'")
-            continue
+def export_by_team(filename):
+    """Export by team to the csv directory, setting the module's player count."""
+    global player_count
 
-        # Adjust column indices based on your header structure
-        team_index = headers.index(HEADER_TEAM)
-        
-        last_team_name = None
-        csv_file = None
-        writer = None
-        team_player_count = 0
-
-        # Iterate through the rest of the rows in the sheet
-        for row in sheet.iter_rows(min_row=2, values_only=True):  # start from the second row to skip the header
-            # if the row is empty, skip it
-            if row[team_index] is None:
-                continue
+    player_count = Exporter('csv', metrics=metrics).export_by_team(filename)
 
-            team_name = row[team_index]
-                
-            # If team name changes or is the first row, create a new CSV writer
-            if team_name != last_team_name:
-                if csv_file is not None:  # if not the first row
-                    csv_file.close()  # close the last CSV file
-                    if team_player_count < 10:  # if the last team had less than 10 players
-                        print(f"Alert: Team {last_team_name} has less than 10 players!")
-
-                print(f"Team:", team_name)
-                
-                csv_file, writer = create_csv_writer(team_name, headers)
-
-                last_team_name = team_name
-                
-            cleaned_row = clean_row(row, headers)
-            writer.writerow(cleaned_row)  # write the row to the CSV file
-            team_player_count += 1 
-
-        if csv_file is not None:
-            csv_file.close()  # close the last CSV file
-            if team_player_count < 10:  # if the last team had less than 10 players
-                print(f"Alert: Team {last_team_name} has less than 10 players!")
+def find_workbooks(path):
+    """Return the workbooks to export: the file itself, the workbooks in a directory or the files matching a glob."""
+    if os.path.isdir(path):
+        paths = [os.path.join(path, name) for name in os.listdir(path)]
+    else:
+        paths = glob.glob(path)
+    return sorted(path for path in paths if os.path.isfile(path) and path.lower().endswith(WORKBOOK_EXTENSIONS)
+                  and not os.path.basename(path).startswith('~$'))
+
+def export_workbook(filename, output_dir, by_team, cache=None, reader=READER_OPENPYXL):
+    """Export one workbook in a worker process, return a summary of the export.
+
+    The output printed during the export is returned with the summary, so the output
+    of parallel exports is not interleaved.
+    """
+    output = io.StringIO()
+    start = time.perf_counter()
+    # the roster index is written for the merged files
+    exporter = Exporter(output_dir, index=False, cache=cache, reader=reader)
+    summary = {'workbook': filename, 'output_dir': output_dir, 'players': 0, 'teams': 0, 'error': None}
+    with contextlib.redirect_stdout(output):
+        try:
+            summary['players'] = exporter.export_by_team(filename) if by_team else exporter.export_by_workbook(filename)
+        except Exception as e:
+            summary['error'] = f'{type(e).__name__}: {e}'
+    summary['teams'] = len(exporter.team_counts) if by_team else len(exporter.file_rows)
+    summary['files'] = exporter.file_rows
+    summary['warnings'] = exporter.warnings
+    summary['seconds'] = time.perf_counter() - start
+    summary['output'] = output.getvalue()
+    return summary
+
+def workbook_label(filename):
+    """Short name of a workbook, used to tell apart CSV files with the same name."""
+    return sanitize_filename(os.path.splitext(os.path.basename(filename))[0])
+
+def workbook_labels(workbooks):
+    """Map every workbook of a batch to a label no other workbook of the batch has.
+
+    Workbooks with the same file name in different directories get the name of their
+    directory in front, and a number if that is the same too.
+    """
+    labels = {workbook: workbook_label(workbook) for workbook in workbooks}
+    counts = Counter(labels.values())
+    for workbook in workbooks:
+        if counts[labels[workbook]] > 1:
+            parent = os.path.basename(os.path.dirname(os.path.abspath(workbook)))
+            labels[workbook] = sanitize_filename(f'{parent}_{labels[workbook]}')
+
+    taken = set()
+    for position, workbook in enumerate(workbooks, start=1):
+        if labels[workbook] in taken:
+            labels[workbook] = f'{labels[workbook]}_{position}'
+        taken.add(labels[workbook])
+    return labels
+
+def merge_exports(summaries, output_dir):
+    """Move the CSV files of every workbook into the output directory.
+
+    A CSV file name exported by more than one workbook, for example a team name used by two
+    clubs, is renamed for every workbook to <name>__<workbook>.csv, so no club's roster
+    overwrites another's. The workbook labels are unique in the batch, and a renamed file
+    never replaces another merged file. The collision is added to the warnings of those workbooks.
+
+    Returns the players in every merged CSV file, and the list of (name, renamed files) collisions.
+    """
+    owners = {}
+    for summary in summaries:
+        if summary['error'] is None:
+            for csv_name in sorted(summary['files']):
+                owners.setdefault(csv_name, []).append(summary)
+    labels = workbook_labels([summary['workbook'] for summary in summaries])
+
+    # every exported name is kept for the workbook that exported it alone
+    taken = {csv_name for csv_name, exported_by in owners.items() if len(exported_by) == 1}
+    file_rows = {}
+    collisions = []
+    for csv_name, exported_by in owners.items():
+        if len(exported_by) == 1:
+            os.replace(os.path.join(exported_by[0]['output_dir'], csv_name), os.path.join(output_dir, csv_name))
+            file_rows[csv_name] = exported_by[0]['files'][csv_name]
+            continue
+        base_name = os.path.splitext(csv_name)[0]
+        renamed = []
+        for summary in exported_by:
+            new_name = f'{base_name}__{labels[summary["workbook"]]}.csv'
+            number = 2
+            while new_name in taken:
+                new_name = f'{base_name}__{labels[summary["workbook"]]}_{number}.csv'
+                number += 1
+            taken.add(new_name)
+            os.replace(os.path.join(summary['output_dir'], csv_name), os.path.join(output_dir, new_name))
+            file_rows[new_name] = summary['files'][csv_name]
+            renamed.append(new_name)
+        for summary in exported_by:
+            summary['warnings'].append(f"Alert: {csv_name} was exported by several workbooks, saved as {', '.join(renamed)}")
+        collisions.append((csv_name, renamed))
+    return file_rows, collisions
+
+def export_batch(workbooks, output_dir='csv', by_team=False, jobs=None, cache=None, reader=READER_OPENPYXL):
+    """Export many workbooks in a process pool and merge their CSV files, return the workbook summaries."""
+    jobs = min(jobs or os.cpu_count() or 1, len(workbooks))
+    os.makedirs(output_dir, exist_ok=True)
+    # the workers export into their own directories next to the output, so the merge only renames files
+    batch_dir = tempfile.mkdtemp(prefix='.batch-', dir=output_dir)
+    try:
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            futures = []
+            for index, filename in enumerate(workbooks):
+                futures.append(executor.submit(export_workbook, filename, os.path.join(batch_dir, str(index)), by_team, cache,
+                                               reader))
+            summaries = []
+            for future in futures:
+                summary = future.result()
+                print(summary['output'], end='')
+                summaries.append(summary)
+
+        file_rows, collisions = merge_exports(summaries, output_dir)
+        for csv_name, renamed in collisions:
+            print(f"Alert: {csv_name} was exported by several workbooks, saved as {', '.join(renamed)}")
+        roster_index.update_index(output_dir, file_rows)
+    finally:
+        shutil.rmtree(batch_dir, ignore_errors=True)
+    return summaries
+
+def print_batch_summary(summaries):
+    """Print a line per workbook and the merged player total."""
+    print('\nWorkbook summary:')
+    for summary in summaries:
+        name = os.path.basename(summary['workbook'])
+        if summary['error'] is not None:
+            print(f"  {name}: failed -- {summary['error']}")
+        else:
+            print(f"  {name}: {summary['players']} players, {summary['teams']} CSV files, "
+                  f"{len(summary['warnings'])} warnings, {summary['seconds']:.1f} s")
 
 def main():
-    global player_count
+    global player_count, metrics
     
     # Command line argument parsing
     parser = argparse.ArgumentParser(description='Export Excel file to CSV.')
-    parser.add_argument('filename', help='Name of the Excel file to export.')
+    parser.add_argument('filename', help='Name of the Excel file to export, or a directory or glob of Excel files.')
     parser.add_argument('--by-team', action='store_true', help='If set, export by team. Otherwise, export by workbook.')
+    parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count() or 1,
+                        help='Number of workbooks to export in parallel when exporting several (default: number of CPUs).')
+    parser.add_argument('--sheet-cache', default=sheet_cache.DEFAULT_CACHE_DIR, metavar='DIR',
+                        help='Directory caching the parsed sheets of exported workbooks, so reruns on an unchanged '
+                             f'workbook skip parsing it (default: {sheet_cache.DEFAULT_CACHE_DIR}).')
+    parser.add_argument('--sheet-cache-size', type=int, default=sheet_cache.DEFAULT_MAX_BYTES // 2**20, metavar='MB',
+                        help='Size limit of the sheet cache, the least recently used workbooks are removed first '
+                             '(default: %(default)s MB).')
+    parser.add_argument('--no-sheet-cache', action='store_true', help='Always parse the workbooks.')
+    parser.add_argument('--reader', choices=[READER_OPENPYXL, READER_XLSX], default=READER_OPENPYXL,
+                        help='Read workbooks with openpyxl (default), or with the faster xlsx reader that only reads '
+                             'the mapped columns and falls back to openpyxl for workbooks it can not read.')
+    parser.add_argument('--check', action='store_true',
+                        help='Check the workbooks for data problems in a single pass without writing any CSV file, '
+                             'and write every problem found to the check report.')
+    parser.add_argument('--check-report', default=CHECK_REPORT, metavar='PATH',
+                        help='Report written by --check, as CSV for a .csv file and JSON otherwise '
+                             '(default: %(default)s).')
+    run_metrics.add_arguments(parser)
 
     args = parser.parse_args()
 
+    metrics = run_metrics.Metrics('export_csv_from_excel', args.metrics, run_metrics.profile_dir(args))
+    cache = None if args.no_sheet_cache else sheet_cache.SheetCache(args.sheet_cache, args.sheet_cache_size * 2**20)
+
+    if args.check:
+        main_check(args, cache)
+        return
+
     # Create the "csv" directory if it doesn't exist
     if not os.path.exists("csv"):
         os.makedirs("csv")
 
-    # Check if the Excel file exists
-    if not os.path.exists(args.filename):
-        print(f"Error: File '{args.filename}' not found")
-        sys.exit(1)
+    if not os.path.isfile(args.filename):
+        main_batch(args, cache)
+        return
 
+    exporter = Exporter('csv', metrics=metrics, cache=cache, reader=args.reader)
+    start = time.perf_counter()
     if args.by_team:
-        export_by_team(args.filename)
+        player_count = exporter.export_by_team(args.filename)
     else:
-        export_by_workbook(args.filename)
+        player_count = exporter.export_by_workbook(args.filename)
+    seconds = time.perf_counter() - start
         
     # Print total player count after processing all workbooks
     print(f'\nTotal players: {player_count}')
+
+    metrics.record('export', args.filename, mode='by_team' if args.by_team else 'by_workbook', rows=player_count,
+                   seconds=round(seconds, 4), rows_per_second=run_metrics.rate(player_count, seconds))
+    metrics.save()
+
+def main_check(args, cache=None):
+    """Check the workbook, or the workbooks in a directory or matching a glob, and write the check report."""
+    workbooks = [args.filename] if os.path.isfile(args.filename) else find_workbooks(args.filename)
+    # Check if there is any Excel file to check
+    if not workbooks:
+        print(f"Error: File '{args.filename}' not found")
+        sys.exit(1)
+
+    # the workbooks are checked one after the other, players are looked up across all of them
+    exporter = Exporter('csv', metrics=metrics, cache=cache, reader=args.reader)
+    check = RosterCheck()
+    start = time.perf_counter()
+    for filename in workbooks:
+        exporter.check(filename, check)
+    report = check.finish()
+    seconds = time.perf_counter() - start
+    write_check_report(report, args.check_report)
+
+    print(f"Checked {report['rows']} players on {len(report['teams'])} teams in {len(workbooks)} workbook(s), "
+          f"{len(report['problems'])} problems found:")
+    for problem, count in report['problem_counts'].items():
+        print(f'  {problem}: {count}')
+    for alert in report['name_alerts']:
+        print(alert)
+    print(f'Report written to {args.check_report}')
+
+    metrics.record('check', args.filename, rows=report['rows'], problems=len(report['problems']),
+                   seconds=round(seconds, 4), rows_per_second=run_metrics.rate(report['rows'], seconds))
+    metrics.save()
+
+def main_batch(args, cache=None):
+    """Export the workbooks in a directory or matching a glob in parallel."""
+    global player_count
+
+    workbooks = find_workbooks(args.filename)
+    # Check if there is any Excel file to export
+    if not workbooks:
+        print(f"Error: File '{args.filename}' not found")
+        sys.exit(1)
+
+    with metrics.stage('export_batch'):
+        summaries = export_batch(workbooks, 'csv', args.by_team, args.jobs, cache, args.reader)
+    player_count = sum(summary['players'] for summary in summaries)
+
+    print_batch_summary(summaries)
+    # Print total player count after processing all workbooks
+    print(f'\nTotal players: {player_count}')
+
+    for summary in summaries:
+        metrics.record('workbooks', summary['workbook'], players=summary['players'], teams=summary['teams'],
+                       seconds=round(summary['seconds'], 4), error=summary['error'])
+    metrics.save()
+
+    if any(summary['error'] is not None for summary in summaries):
+        sys.exit(1)
     
 if __name__ == '__main__':
     main()
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# File: file_cache.py
+#
+# A directory of cache files with a size cap, shared by the sheet cache and the
+# card cache. Using a file touches it, and when the directory grows over its cap
+# the least recently used files are removed first.
+#
+import os
+
+
+class FileCache:
+    """Cache files ending in suffix, in a directory limited to max_bytes."""
+
+    suffix = ''
+
+    def __init__(self, cache_dir, max_bytes):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+
+    def entries(self):
+        """Return (last used time, size, path) of every cache file."""
+        entries = []
+        try:
+            with os.scandir(self.cache_dir) as dir_entries:
+                for entry in dir_entries:
+                    if entry.name.endswith(self.suffix):
+                        try:
+                            stat = entry.stat()
+                        except FileNotFoundError:
+                            continue
+                        entries.append((stat.st_mtime_ns, stat.st_size, entry.path))
+        except FileNotFoundError:
+            pass
+        return entries
+
+    def evict(self):
+        """Remove the least recently used files until the cache fits in max_bytes."""
+        entries = sorted(self.entries())
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            self.remove(path)
+            total -= size
+
+    @staticmethod
+    def remove(path):
+        # another run may have removed it already
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
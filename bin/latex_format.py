@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# File: latex_format.py
+#
+# Precompiled LaTeX formats for the roster preamble. The preamble shared by all
+# rosters (documentclass and packages) is dumped once into a format file with
+# mylatexformat, and every roster is compiled against it, so pdflatex does not
+# load datatool, fontenc, fix-cm, geometry and mdframed again for every team.
+#
+# Formats are cached by the hash of the preamble and of the TeX installation,
+# so they are rebuilt when the template or TeX changes.
+#
+import os
+import re
+import shutil
+import logging
+import subprocess
+
+import build_manifest
+import latex_runner
+
+FORMAT_CACHE_DIR_NAME = 'latex_formats'
+MAX_CACHED_FORMATS = 8
+
+# Marks the end of the preamble dumped into the format, this is \relax when compiling without a format
+DUMP_MARKER = r'\csname endofdump\endcsname'
+DUMP_MARKER_PATTERN = re.compile(r'^(?=[ \t]*\\DTLloaddb)', re.M)
+BEGIN_DOCUMENT = r'\begin{document}'
+
+
+def get_format_cache_dir(latex_dir):
+    """The format cache is stored next to the LaTeX output directory."""
+    latex_dir = os.path.abspath(latex_dir)
+    return os.path.join(os.path.dirname(latex_dir), FORMAT_CACHE_DIR_NAME)
+
+
+def mark_end_of_dump(content):
+    """Mark the end of the shared preamble before the roster's own CSV file is loaded."""
+    return DUMP_MARKER_PATTERN.sub(lambda match: DUMP_MARKER + '\n', content, count=1)
+
+
+def get_preamble(content):
+    """Return the part of a LaTeX file that goes into the format, None if there is no preamble."""
+    ends = [content.find(marker) for marker in (DUMP_MARKER, BEGIN_DOCUMENT)]
+    ends = [end for end in ends if end >= 0]
+    if not ends:
+        return None
+    return content[:min(ends)]
+
+
+def tex_installation_id(pdflatex_path):
+    """Identify the TeX installation, a format only works with the installation that made it."""
+    parts = [os.path.realpath(pdflatex_path)]
+    try:
+        parts.append(str(os.stat(os.path.realpath(pdflatex_path)).st_mtime_ns))
+        parts.append(subprocess.run([pdflatex_path, '--version'], capture_output=True, text=True).stdout)
+
+        # the base format changes when the installation is updated
+        kpsewhich = shutil.which('kpsewhich', path=os.path.dirname(pdflatex_path)) or shutil.which('kpsewhich')
+        if kpsewhich:
+            base_format = subprocess.run([kpsewhich, '-engine=pdftex', 'pdflatex.fmt'],
+                                         capture_output=True, text=True).stdout.strip()
+            if base_format:
+                parts.append(f'{base_format}:{os.stat(base_format).st_mtime_ns}')
+    except OSError as e:
+        logging.warning(f'Could not identify the TeX installation: {e}')
+    return build_manifest.hash_text(*parts)
+
+
+def prepare_format(tex_file_path, pdflatex_path, cache_dir, timeout=latex_runner.DEFAULT_TIMEOUT):
+    """Return the path of the cached format for the LaTeX file's preamble, building it if needed.
+
+    Returns None if the format can not be built in timeout seconds, the LaTeX files are then
+    compiled normally.
+    """
+    with open(tex_file_path, 'r') as f:
+        preamble = get_preamble(f.read())
+    if preamble is None:
+        logging.warning(f'No preamble found in {tex_file_path}, compiling without a format.')
+        return None
+
+    key = build_manifest.hash_text(preamble, tex_installation_id(pdflatex_path))[:16]
+    format_name = f'roster-{key}'
+    format_path = os.path.join(cache_dir, format_name + '.fmt')
+    if os.path.exists(format_path):
+        os.utime(format_path)
+        logging.info(f'Using cached format: {format_path}')
+        return format_path
+
+    os.makedirs(cache_dir, exist_ok=True)
+    source_file = format_name + '.tex'
+    with open(os.path.join(cache_dir, source_file), 'w') as f:
+        f.write(preamble + BEGIN_DOCUMENT + '\n\\end{document}\n')
+
+    logging.info(f'Building format: {format_path}')
+    with open(os.path.join(cache_dir, format_name + '.build.log'), 'w') as log_file:
+        try:
+            result = subprocess.run(
+                [pdflatex_path, '-ini'] + latex_runner.BATCH_OPTIONS + [f'-jobname={format_name}',
+                                                                        '&pdflatex', 'mylatexformat.ltx', source_file],
+                cwd=cache_dir, stdin=subprocess.DEVNULL, stdout=log_file, stderr=subprocess.STDOUT, timeout=timeout
+            )
+            returncode = result.returncode
+        except subprocess.TimeoutExpired:
+            logging.warning(f'Building the format timed out after {timeout} s.')
+            returncode = None
+    if returncode != 0 or not os.path.exists(format_path):
+        logging.warning(f'Could not build the format, compiling without it. See {log_file.name} for details.')
+        return None
+
+    prune_format_cache(cache_dir)
+    return format_path
+
+
+def prune_format_cache(cache_dir, keep=MAX_CACHED_FORMATS):
+    """Remove the least recently used formats and their build files."""
+    formats = sorted((entry for entry in os.scandir(cache_dir) if entry.name.endswith('.fmt')),
+                     key=lambda entry: entry.stat().st_mtime, reverse=True)
+    for entry in formats[keep:]:
+        format_name = entry.name[:-len('.fmt')]
+        for file in os.listdir(cache_dir):
+            if file.startswith(format_name + '.'):
+                os.remove(os.path.join(cache_dir, file))
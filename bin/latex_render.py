@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# File: latex_render.py
+#
+# Render roster templates without datatool. The CSV file is read once in Python
+# and the DTLenvforeach* block of the template is repeated for every player with
+# the field macros replaced by the escaped values, so pdflatex only typesets.
+# Card documents, for card_cache.py, put every player on a page of their own.
+#
+import re
+import csv
+
+# \DTLloaddb{roster}{CSV_FILE}, the CSV_FILE placeholder is replaced by the CSV file path
+LOADDB_PATTERN = re.compile(r'^[ \t]*\\DTLloaddb(?:\[[^\]]*\])?\{[^}]*\}\{CSV_FILE\}[^\n]*\n?', re.M)
+
+# \begin{DTLenvforeach*}{roster}{\FirstName=Firstname,...} player block \end{DTLenvforeach*}
+FOREACH_PATTERN = re.compile(
+    r'\\begin\{DTLenvforeach\*?\}\{[^}]*\}\{(?P<assignments>[^}]*)\}(?P<block>.*?)\\end\{DTLenvforeach\*?\}', re.S)
+
+BEGIN_DOCUMENT = r'\begin{document}'
+
+# Writes "<team index> <first page>" to <jobname>.pages for every team of a combined document
+PAGE_MARKS_SETUP = r'''\newwrite\rosterpages
+\immediate\openout\rosterpages=\jobname.pages
+\newcommand\rosterstart[1]{\clearpage\write\rosterpages{#1 \thepage}}
+'''
+
+# Card documents typeset every player on a page of their own and write "card <index> <top> <text height>"
+# and "end <index> <bottom>" to <jobname>.cards, positions in sp from the bottom of the page
+CARD_MARKS_SETUP = r'''\newwrite\rostercards
+\immediate\openout\rostercards=\jobname.cards
+\newcommand\rostercard[1]{\clearpage\pdfsavepos\write\rostercards{card #1 \number\pdflastypos\space\number\textheight}}
+\newcommand\rostercardend[1]{\par\pdfsavepos\write\rostercards{end #1 \number\pdflastypos}}
+'''
+
+# TeX points are 1/72.27 inch, PDF points 1/72 inch
+SP_PER_PDF_POINT = 65536 * 72.27 / 72
+
+DATATOOL_PATTERN = re.compile(r'^[ \t]*\\usepackage(?:\[[^\]]*\])?\{datatool\}[^\n]*\n?', re.M)
+
+LATEX_SPECIAL_CHARACTERS = {
+    '\\': r'\textbackslash{}',
+    '{': r'\{',
+    '}': r'\}',
+    '$': r'\$',
+    '&': r'\&',
+    '#': r'\#',
+    '^': r'\^{}',
+    '_': r'\_',
+    '%': r'\%',
+    '~': r'\textasciitilde{}',
+}
+LATEX_SPECIAL_PATTERN = re.compile('|'.join(re.escape(c) for c in LATEX_SPECIAL_CHARACTERS))
+
+
+def escape_latex(value):
+    """Escape the characters that have a special meaning in LaTeX."""
+    if value is None:
+        return ''
+    return LATEX_SPECIAL_PATTERN.sub(lambda match: LATEX_SPECIAL_CHARACTERS[match.group()], str(value))
+
+
+def parse_player_block(template_content):
+    """Split a template into the text before the player block, the block itself, the text after
+    and the mapping of field macro names to CSV columns."""
+    match = FOREACH_PATTERN.search(template_content)
+    if match is None:
+        raise ValueError('Template has no DTLenvforeach block to render the players with.')
+
+    fields = {}
+    for assignment in match.group('assignments').split(','):
+        macro, _, column = assignment.partition('=')
+        fields[macro.strip().lstrip('\\')] = column.strip()
+
+    return template_content[:match.start()], match.group('block'), template_content[match.end():], fields
+
+
+def compile_field_pattern(fields):
+    """Match the field macros and the blanks TeX would skip after them, including the end of line."""
+    names = '|'.join(re.escape(name) for name in sorted(fields, key=len, reverse=True))
+    return re.compile(r'\\(' + names + r')(?![A-Za-z])[ \t]*(\n?)')
+
+
+def render_player_block(block, pattern, fields, row):
+    """Fill in one player block with the escaped values of a CSV row."""
+    # every value is a group, so it can not run into a control word before it, like \itshape\Team.
+    # An end of line right after a macro is ignored by TeX, keep the line break but comment it out
+    return pattern.sub(lambda match: '{' + escape_latex(row.get(fields[match.group(1)])) + '}' +
+                       ('%' + match.group(2) if match.group(2) else ''), block)
+
+
+def remove_datatool(content):
+    """Remove the CSV loading and, when nothing else uses it, the datatool package."""
+    content = LOADDB_PATTERN.sub('', content)
+    without_package = DATATOOL_PATTERN.sub('', content)
+    if '\\DTL' not in without_package:
+        content = without_package
+    return content
+
+
+def read_roster(csv_file_path):
+    """Read the player rows of a roster CSV file."""
+    with open(csv_file_path, 'r', newline='') as f:
+        return list(csv.DictReader(f))
+
+
+def render_inline_roster(template_content, csv_file_path):
+    """Render a roster with the player frames written straight into the document body."""
+    before, block, after, fields = parse_player_block(template_content)
+    pattern = compile_field_pattern(fields)
+
+    players = ''.join(render_player_block(block, pattern, fields, row) for row in read_roster(csv_file_path))
+    return remove_datatool(before + players + after)
+
+
+def render_combined_rosters(template_content, csv_file_paths):
+    """Render the rosters of several teams into one document, every team starts on a new page.
+
+    The first page of every team is recorded in <jobname>.pages, see read_page_marks.
+    Teams without players are left out.
+    """
+    before, block, after, fields = parse_player_block(template_content)
+    begin = before.find(BEGIN_DOCUMENT)
+    if begin < 0:
+        raise ValueError('Template has no \\begin{document}.')
+    pattern = compile_field_pattern(fields)
+
+    teams = []
+    for index, csv_file_path in enumerate(csv_file_paths):
+        players = ''.join(render_player_block(block, pattern, fields, row) for row in read_roster(csv_file_path))
+        if players:
+            teams.append(f'\\rosterstart{{{index}}}%\n' + players)
+
+    return remove_datatool(before[:begin] + PAGE_MARKS_SETUP + before[begin:] + ''.join(teams) + after)
+
+
+def read_page_marks(pages_file_path, page_count, team_count):
+    """Return the (first, last) page of every team of a combined document, None for teams without pages."""
+    marks = []
+    with open(pages_file_path, 'r') as f:
+        for line in f:
+            if line.strip():
+                index, page = line.split()
+                marks.append((int(index), int(page)))
+
+    page_ranges = [None] * team_count
+    for position, (index, first) in enumerate(marks):
+        last = marks[position + 1][1] - 1 if position + 1 < len(marks) else page_count
+        if first <= last:
+            page_ranges[index] = (first, last)
+    return page_ranges
+
+
+def render_card_document(template_content, rows):
+    """Render every row as a card, the template's player block, on a page of its own.
+
+    The position of every card on its page is recorded in <jobname>.cards, see read_card_marks.
+    """
+    before, block, after, fields = parse_player_block(template_content)
+    begin = before.find(BEGIN_DOCUMENT)
+    if begin < 0:
+        raise ValueError('Template has no \\begin{document}.')
+    pattern = compile_field_pattern(fields)
+
+    cards = ''.join(f'\\rostercard{{{index}}}%\n' + render_player_block(block, pattern, fields, row) +
+                    f'\\rostercardend{{{index}}}%\n' for index, row in enumerate(rows))
+    return remove_datatool(before[:begin] + CARD_MARKS_SETUP + before[begin:] + cards + after)
+
+
+def read_card_marks(cards_file_path, card_count):
+    """Return the (top, bottom, text height) of every card of a card document, in PDF points.
+
+    Raises ValueError for a card without marks or one that did not fit on its page.
+    """
+    marks = {}
+    with open(cards_file_path, 'r') as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 4 and parts[0] == 'card':
+                marks[int(parts[1])] = [int(parts[2]) / SP_PER_PDF_POINT, None, int(parts[3]) / SP_PER_PDF_POINT]
+            elif len(parts) == 3 and parts[0] == 'end' and int(parts[1]) in marks:
+                marks[int(parts[1])][1] = int(parts[2]) / SP_PER_PDF_POINT
+
+    cards = []
+    for index in range(card_count):
+        top, bottom, text_height = marks.get(index, (None, None, None))
+        if top is None or bottom is None or bottom >= top:
+            raise ValueError(f'Card {index} was not typeset on a page of its own')
+        cards.append((top, bottom, text_height))
+    return cards
@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# File: latex_runner.py
+#
+# Runs pdflatex for the roster builds. pdflatex runs in batch mode, stops at the
+# first error and has its input closed, so a bad value in a CSV file fails the
+# roster instead of waiting at a TeX prompt, and every run has a time limit.
+# The output of a run is kept in memory and only written to a log file when the
+# run fails. A second pass only runs when the TeX log of the first asks for one.
+#
+# run_pdflatex_async is the same runner for asyncio code, like roster_build.py.
+#
+# pdflatex is taken from the --pdflatex option or the PDFLATEX environment
+# variable, then looked up on the PATH and in the MacTeX install location.
+#
+import os
+import re
+import time
+import asyncio
+import contextlib
+import shutil
+import subprocess
+from collections import namedtuple
+
+PDFLATEX_ENV = 'PDFLATEX'
+PDFLATEX_LOCATIONS = ['/Library/TeX/texbin/pdflatex']
+
+# Options of every pdflatex run, so it never waits for input
+BATCH_OPTIONS = ['-interaction=batchmode', '-halt-on-error']
+
+# Seconds a single pdflatex run may take
+DEFAULT_TIMEOUT = 120
+
+MAX_PASSES = 2
+
+# Warnings of the TeX log asking for another run
+RERUN_PATTERN = re.compile(rb'Rerun to get|Label\(s\) may have changed|Please rerun LaTeX')
+ERROR_PATTERN = re.compile(rb'^! (.+)$', re.M)
+
+LatexRun = namedtuple('LatexRun', ['ok', 'returncode', 'passes', 'seconds', 'error'])
+
+
+def resolve_pdflatex(configured=None):
+    """Return the path of pdflatex, raise FileNotFoundError if it can not be found.
+
+    configured is a path or command name, the PDFLATEX environment variable is used when it is None.
+    """
+    configured = configured or os.environ.get(PDFLATEX_ENV)
+    if configured:
+        path = shutil.which(configured)
+        if path is None:
+            raise FileNotFoundError(f'pdflatex not found at {configured}. Please install it and try again.')
+        return path
+
+    path = shutil.which('pdflatex')
+    if path is None:
+        path = next((location for location in PDFLATEX_LOCATIONS if os.access(location, os.X_OK)), None)
+    if path is None:
+        raise FileNotFoundError(f'pdflatex not found on the PATH or in {", ".join(PDFLATEX_LOCATIONS)}. '
+                                f'Please install it, or set {PDFLATEX_ENV} or --pdflatex to its path.')
+    return path
+
+
+def read_tex_log(tex_log_path):
+    try:
+        with open(tex_log_path, 'rb') as f:
+            return f.read()
+    except FileNotFoundError:
+        return b''
+
+
+def find_error(*texts):
+    """The first TeX error message of the TeX log or output, None if there is none."""
+    for text in texts:
+        match = ERROR_PATTERN.search(text)
+        if match:
+            return match.group(1).decode('utf-8', errors='replace').strip()
+    return None
+
+
+def check_pass(returncode, output, tex_log_path):
+    """Return the error of a finished pdflatex pass, None if it succeeded, and whether it asks for a rerun."""
+    tex_log = read_tex_log(tex_log_path)
+    if returncode != 0:
+        return find_error(tex_log, output) or f'pdflatex exited with code {returncode}', False
+    return None, RERUN_PATTERN.search(tex_log) is not None
+
+
+class PdflatexPasses:
+    """The passes of a pdflatex run, whatever runs the processes.
+
+    command is the full command line of a pass. The output of every pass is collected,
+    and written to log_file_path if a pass fails or times out.
+    """
+
+    def __init__(self, command, tex_file_path, output_dir, log_file_path=None, max_passes=MAX_PASSES):
+        self.command = command + [output_dir, tex_file_path]
+        self.tex_log_path = os.path.join(output_dir, os.path.splitext(os.path.basename(tex_file_path))[0] + '.log')
+        self.log_file_path = log_file_path
+        self.max_passes = max_passes
+        self.output = bytearray()
+        self.returncode = self.error = None
+        self.passes = 0
+        self.done = False
+        self.start = time.perf_counter()
+
+    def next_pass(self):
+        """Count another pass, return False when the run is done."""
+        if self.done or self.passes >= self.max_passes:
+            return False
+        self.passes += 1
+        return True
+
+    def finish_pass(self, returncode, output):
+        self.output += output
+        self.returncode = returncode
+        self.error, rerun = check_pass(returncode, self.output, self.tex_log_path)
+        self.done = self.error is not None or not rerun
+
+    def time_out(self, output, timeout):
+        self.output += output or b''
+        self.error = f'timed out after {timeout} s'
+        self.done = True
+
+    def result(self):
+        """Write the log of a failed run and return its LatexRun."""
+        seconds = time.perf_counter() - self.start
+        if self.error is not None and self.log_file_path is not None:
+            with open(self.log_file_path, 'wb') as f:
+                f.write(self.output)
+                f.write(f'\n{" ".join(self.command)}\nFailed on pass {self.passes}: {self.error}\n'.encode())
+        return LatexRun(self.error is None, self.returncode, self.passes, seconds, self.error)
+
+
+def run_pdflatex(command, tex_file_path, output_dir, timeout=DEFAULT_TIMEOUT, log_file_path=None,
+                 max_passes=MAX_PASSES):
+    """Run pdflatex on a LaTeX file, again while its log asks for a rerun, up to max_passes runs.
+
+    command is the pdflatex command line up to the output directory. The output of every pass
+    is captured, and written to log_file_path if a pass fails or takes longer than timeout seconds.
+    """
+    passes = PdflatexPasses(command, tex_file_path, output_dir, log_file_path, max_passes)
+    while passes.next_pass():
+        try:
+            result = subprocess.run(passes.command, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE,
+                                    stderr=subprocess.STDOUT, timeout=timeout)
+        except subprocess.TimeoutExpired as e:
+            # run() has killed pdflatex already
+            passes.time_out(e.output, timeout)
+        else:
+            passes.finish_pass(result.returncode, result.stdout)
+    return passes.result()
+
+
+async def run_pdflatex_async(command, tex_file_path, output_dir, timeout=DEFAULT_TIMEOUT, log_file_path=None,
+                             max_passes=MAX_PASSES):
+    """Like run_pdflatex, with pdflatex run as an asyncio subprocess so the event loop keeps going.
+
+    pdflatex is killed when the run times out or the task is cancelled.
+    """
+    passes = PdflatexPasses(command, tex_file_path, output_dir, log_file_path, max_passes)
+    while passes.next_pass():
+        process = await asyncio.create_subprocess_exec(*passes.command, stdin=subprocess.DEVNULL,
+                                                       stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+        try:
+            stdout, _ = await asyncio.wait_for(process.communicate(), timeout)
+        except asyncio.TimeoutError:
+            passes.time_out(b'', timeout)
+        else:
+            passes.finish_pass(process.returncode, stdout)
+        finally:
+            if process.returncode is None:
+                # reap pdflatex, so neither the process nor its pipe is left behind
+                with contextlib.suppress(ProcessLookupError):
+                    process.kill()
+                await process.wait()
+    return passes.result()
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# File: names.py
+#
+# Player name normalisation shared by the exporters and condition_data. The
+# capitalisation rules are a table tried in order, the first rule that applies
+# formats the name. Results are kept in a bounded LRU cache, surnames repeat
+# heavily across a league, and alerts about names a person should check are
+# collected instead of printed.
+#
+import re
+from collections import namedtuple
+from functools import lru_cache
+
+# Distinct first and last names kept in the cache
+DEFAULT_CACHE_SIZE = 1 << 16
+
+# Suffixes written in capitals in two word names, 'johnson iii' -> 'Johnson III'
+ROMAN_SUFFIXES = frozenset(['ii', 'iii', 'iv'])
+
+# Two letter first names that are names, not initials
+TWO_LETTER_NAMES = frozenset(['ty'])
+
+# Mc and Mac names with a doubled c, like McCarthy or MacCormack, need checking by hand
+MC_MAC_PATTERN = re.compile(r'ma?cc', re.IGNORECASE)
+
+# applies(name, folded, is_last_name) -> bool, and format(name) -> str, name is stripped and folded is lower case
+NameRule = namedtuple('NameRule', ['name', 'applies', 'format'])
+
+
+def format_two_words(name):
+    return ' '.join(word.upper() if word.lower() in ROMAN_SUFFIXES else word.capitalize() for word in name.split())
+
+
+NAME_RULES = (
+    # two letter last names, 'LI' -> 'Li'
+    NameRule('two_letter_last_name', lambda name, folded, is_last_name: len(name) == 2 and is_last_name,
+             lambda name: name[0].upper() + name[1].lower()),
+    # two letter first names are initials, 'jo' -> 'JO', unless they are names like Ty
+    NameRule('initials', lambda name, folded, is_last_name: len(name) == 2 and folded not in TWO_LETTER_NAMES,
+             str.upper),
+    # every part of a hyphenated name is capitalised, 'smith-jones' -> 'Smith-Jones'
+    NameRule('hyphenated', lambda name, folded, is_last_name: '-' in name,
+             lambda name: '-'.join(word.capitalize() for word in name.split('-'))),
+    # two word names, with roman numeral suffixes in capitals
+    NameRule('two_words', lambda name, folded, is_last_name: len(name.split()) == 2, format_two_words),
+    NameRule('capitalize', lambda name, folded, is_last_name: True, str.capitalize),
+)
+
+# Alerts are checked after the two letter and hyphenated rules, those names are never flagged
+ALERT_AFTER_RULE = 'hyphenated'
+
+
+class NameNormalizer:
+    """Normalises first and last names with the rule table, caching the results.
+
+    Alerts are collected in the alerts dict, by name, in the order they were found. Each
+    normaliser has its own cache and alerts, so parallel exports do not share them.
+    """
+
+    def __init__(self, cache_size=DEFAULT_CACHE_SIZE, rules=NAME_RULES):
+        self.rules = rules
+        self.alert_rule_index = [rule.name for rule in rules].index(ALERT_AFTER_RULE) + 1
+        self.alerts = {}
+        self.normalize = lru_cache(maxsize=cache_size)(self._normalize)
+        self.last_name = lru_cache(maxsize=cache_size)(self._last_name)
+
+    def first_name(self, name):
+        """Normalise a first name."""
+        return self.normalize(name)
+
+    def _normalize(self, name, is_last_name=False):
+        if name is None:
+            return None
+        name = name.strip()
+        folded = name.lower()
+        for index, rule in enumerate(self.rules):
+            if index == self.alert_rule_index and MC_MAC_PATTERN.search(folded):
+                self.alerts.setdefault(name, f"Alert: Found 'cc' in name '{name}'")
+            if rule.applies(name, folded, is_last_name):
+                return rule.format(name)
+        return name
+
+    def _last_name(self, name):
+        # last names in mixed case are kept as entered
+        if name is not None and name.isupper():
+            return self.normalize(name, True)
+        elif name is not None and name.islower():
+            return self.normalize(name)
+        return name
+
+    def cache_info(self):
+        return self.normalize.cache_info()
@@ -0,0 +1,467 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# File: pdf_pages.py
+#
+# Just enough PDF reading and writing to count, split and concatenate the pages
+# of the PDF files pdflatex makes, and to place pages on other pages as form
+# XObjects, using only the standard library.
+#
+# Objects are found by scanning the file for "n g obj" instead of trusting the
+# cross-reference table, object streams (PDF 1.5, pdfTeX's default) are unpacked.
+# Values are kept as parsed, strings and real numbers are written back verbatim.
+#
+import re
+import zlib
+from collections import namedtuple
+
+WHITESPACE = b'\0\t\n\f\r '
+
+OBJECT_PATTERN = re.compile(rb'(\d+)\s+(\d+)\s+obj\b')
+TOKEN_END_PATTERN = re.compile(rb'[\0\t\n\f\r ()<>\[\]{}/%]')
+NUMBER_PATTERN = re.compile(rb'[+-]?(\d+\.?\d*|\.\d+)$')
+
+# Page attributes a page inherits from its parent page tree nodes
+INHERITED_PAGE_ATTRIBUTES = ('Resources', 'MediaBox', 'CropBox', 'Rotate')
+
+
+class PdfError(Exception):
+    """Raised for PDF files that can not be read."""
+
+
+class Name(str):
+    """A PDF name, stored without the leading slash."""
+
+
+class Raw(bytes):
+    """A PDF value written back exactly as it was read (strings and real numbers)."""
+
+
+Ref = namedtuple('Ref', ['num', 'gen'])
+
+
+class Stream:
+    """A PDF stream, the data is kept encoded."""
+
+    def __init__(self, attributes, data):
+        self.attributes = attributes
+        self.data = data
+
+    def decoded(self):
+        """Return the decoded stream data, only FlateDecode is supported."""
+        filters = self.attributes.get('Filter')
+        filters = filters if isinstance(filters, list) else [filters] if filters else []
+        data = self.data
+        for name in filters:
+            if name != 'FlateDecode':
+                raise PdfError(f'Unsupported stream filter /{name}')
+            data = zlib.decompress(data)
+        return apply_predictor(data, self.attributes.get('DecodeParms'))
+
+
+def apply_predictor(data, parms):
+    """Undo the PNG predictors used in cross-reference streams."""
+    if not isinstance(parms, dict) or parms.get('Predictor', 1) < 10:
+        return data
+    columns = parms.get('Columns', 1)
+    rows, previous = [], bytearray(columns)
+    for start in range(0, len(data), columns + 1):
+        kind, row = data[start], bytearray(data[start + 1:start + 1 + columns])
+        if kind == 2:
+            row = bytearray((a + b) & 0xff for a, b in zip(row, previous))
+        elif kind != 0:
+            raise PdfError(f'Unsupported PNG predictor {kind}')
+        rows.append(bytes(row))
+        previous = row
+    return b''.join(rows)
+
+
+class Parser:
+    """Parse PDF values from a byte string."""
+
+    def __init__(self, data, position=0):
+        self.data = data
+        self.position = position
+
+    def skip_whitespace(self):
+        data = self.data
+        while self.position < len(data):
+            c = data[self.position]
+            if c in WHITESPACE:
+                self.position += 1
+            elif c == 0x25:  # % comment
+                end = data.find(b'\n', self.position)
+                self.position = len(data) if end < 0 else end + 1
+            else:
+                break
+
+    def next_token(self):
+        """Return the next bare token (number, keyword) without consuming it."""
+        self.skip_whitespace()
+        match = TOKEN_END_PATTERN.search(self.data, self.position)
+        end = match.start() if match else len(self.data)
+        return self.data[self.position:end]
+
+    def parse(self):
+        """Parse the next value."""
+        self.skip_whitespace()
+        data = self.data
+        if self.position >= len(data):
+            raise PdfError('Unexpected end of data')
+        c = data[self.position:self.position + 1]
+
+        if c == b'/':
+            self.position += 1
+            match = TOKEN_END_PATTERN.search(data, self.position)
+            end = match.start() if match else len(data)
+            name = data[self.position:end].decode('latin-1')
+            self.position = end
+            return Name(name)
+        if c == b'<' and data[self.position:self.position + 2] == b'<<':
+            return self.parse_dictionary()
+        if c == b'<':
+            end = data.index(b'>', self.position) + 1
+            value, self.position = Raw(data[self.position:end]), end
+            return value
+        if c == b'(':
+            return self.parse_literal_string()
+        if c == b'[':
+            self.position += 1
+            items = []
+            while True:
+                self.skip_whitespace()
+                if data[self.position:self.position + 1] == b']':
+                    self.position += 1
+                    return items
+                items.append(self.parse())
+
+        token = self.next_token()
+        if not token:
+            raise PdfError(f'Unexpected {c!r} at offset {self.position}')
+        self.position += len(token)
+        if token == b'true':
+            return True
+        if token == b'false':
+            return False
+        if token == b'null':
+            return None
+        if NUMBER_PATTERN.match(token):
+            if token.isdigit():
+                return self.parse_reference(int(token))
+            try:
+                return int(token)
+            except ValueError:
+                return Raw(token)
+        raise PdfError(f'Unexpected token {token!r} at offset {self.position}')
+
+    def parse_reference(self, number):
+        """A positive integer may start an "n g R" reference."""
+        saved = self.position
+        generation = self.next_token()
+        if generation.isdigit():
+            self.position += len(generation)
+            if self.next_token() == b'R':
+                self.position += 1
+                return Ref(number, int(generation))
+        self.position = saved
+        return number
+
+    def parse_dictionary(self):
+        self.position += 2
+        items = {}
+        while True:
+            self.skip_whitespace()
+            if self.data[self.position:self.position + 2] == b'>>':
+                self.position += 2
+                return items
+            key = self.parse()
+            if not isinstance(key, Name):
+                raise PdfError(f'Dictionary key {key!r} is not a name')
+            items[key] = self.parse()
+
+    def parse_literal_string(self):
+        data, start, depth = self.data, self.position, 0
+        position = start
+        while position < len(data):
+            c = data[position]
+            if c == 0x5c:  # backslash escape
+                position += 2
+                continue
+            if c == 0x28:
+                depth += 1
+            elif c == 0x29:
+                depth -= 1
+                if depth == 0:
+                    self.position = position + 1
+                    return Raw(data[start:self.position])
+            position += 1
+        raise PdfError('Unterminated string')
+
+    def parse_object(self):
+        """Parse "value" or "dictionary stream ... endstream" after "n g obj"."""
+        value = self.parse()
+        self.skip_whitespace()
+        if not isinstance(value, dict) or not self.data.startswith(b'stream', self.position):
+            return value
+
+        start = self.position + len(b'stream')
+        if self.data.startswith(b'\r\n', start):
+            start += 2
+        elif self.data.startswith(b'\n', start):
+            start += 1
+        length = value.get('Length')
+        end = start + length if isinstance(length, int) else -1
+        if end < 0 or not self.data[end:end + 30].lstrip().startswith(b'endstream'):
+            # indirect or wrong /Length, look for the end of the stream instead
+            end = self.data.index(b'endstream', start)
+            while end > start and self.data[end - 1] in b'\r\n':
+                end -= 1
+        self.position = self.data.index(b'endstream', end) + len(b'endstream')
+        return Stream(value, self.data[start:end])
+
+
+class PdfDocument:
+    """The objects and pages of a PDF file."""
+
+    def __init__(self, data):
+        self.objects = {}
+        self.trailer = {}
+        self.read_objects(data)
+        self.read_object_streams()
+
+        root = self.resolve(self.trailer.get('Root'))
+        if not isinstance(root, dict):
+            raise PdfError('PDF file has no document catalog')
+        self.pages = []
+        self.collect_pages(root.get('Pages'), {}, set())
+
+    @classmethod
+    def open(cls, pdf_file_path):
+        with open(pdf_file_path, 'rb') as f:
+            return cls(f.read())
+
+    def read_objects(self, data):
+        """Scan the file for objects, later definitions win like incremental updates."""
+        position = 0
+        while True:
+            match = OBJECT_PATTERN.search(data, position)
+            if match is None:
+                break
+            parser = Parser(data, match.end())
+            try:
+                value = parser.parse_object()
+            except (PdfError, ValueError, IndexError):
+                position = match.end()
+                continue
+            ref = Ref(int(match.group(1)), int(match.group(2)))
+            self.objects[ref] = value
+            if isinstance(value, Stream) and value.attributes.get('Type') == 'XRef':
+                self.trailer.update(value.attributes)
+            position = parser.position
+
+        # classic trailer dictionaries
+        for match in re.finditer(rb'trailer\s*<<', data):
+            parser = Parser(data, match.end() - 2)
+            try:
+                self.trailer.update(parser.parse())
+            except PdfError:
+                pass
+
+    def read_object_streams(self):
+        """Unpack the objects stored in object streams."""
+        for value in list(self.objects.values()):
+            if not isinstance(value, Stream) or value.attributes.get('Type') != 'ObjStm':
+                continue
+            data = value.decoded()
+            first = value.attributes['First']
+            header = Parser(data[:first])
+            offsets = [(header.parse(), header.parse()) for _ in range(value.attributes['N'])]
+            for number, offset in offsets:
+                ref = Ref(number, 0)
+                if ref not in self.objects:
+                    self.objects[ref] = Parser(data, first + offset).parse()
+
+    def resolve(self, value):
+        """Follow a reference to its object."""
+        while isinstance(value, Ref):
+            value = self.objects.get(value)
+        return value
+
+    def collect_pages(self, node_ref, inherited, seen):
+        """Walk the page tree, collecting (page reference, page dictionary with inherited attributes)."""
+        if node_ref in seen:
+            raise PdfError('Loop in the page tree')
+        seen.add(node_ref)
+        node = self.resolve(node_ref)
+        if not isinstance(node, dict):
+            raise PdfError('Broken page tree')
+
+        inherited = dict(inherited)
+        for attribute in INHERITED_PAGE_ATTRIBUTES:
+            if attribute in node:
+                inherited[attribute] = node[attribute]
+
+        if node.get('Type') == 'Pages' or 'Kids' in node:
+            for kid in self.resolve(node.get('Kids', [])):
+                self.collect_pages(kid, inherited, seen)
+        else:
+            page = dict(node)
+            for attribute, value in inherited.items():
+                page.setdefault(attribute, value)
+            self.pages.append((node_ref, page))
+
+
+class PdfWriter:
+    """Collect pages from PDF documents and write them as a new PDF file."""
+
+    def __init__(self):
+        self.objects = [None, None]  # 1: catalog, 2: page tree
+        self.page_refs = []
+        self.copied = {}
+
+    def add_object(self, value):
+        self.objects.append(value)
+        return Ref(len(self.objects), 0)
+
+    def add_page(self, document, index, attributes=None):
+        """Copy a page, and everything it uses, from a document. attributes are added to the page dictionary."""
+        source_ref, page = document.pages[index]
+        page_refs = {ref for ref, _ in document.pages}
+        page = {key: value for key, value in page.items() if key != 'Parent'}
+
+        new_ref = self.add_object(None)
+        self.copied[(id(document), source_ref)] = new_ref
+        page = self.copy(document, page, page_refs)
+        page.update(attributes or {})
+        page['Parent'] = Ref(2, 0)
+        self.objects[new_ref.num - 1] = page
+        self.page_refs.append(new_ref)
+        return new_ref
+
+    def add_new_page(self, page):
+        """Add a page made from scratch, page is its dictionary without /Parent."""
+        page = dict(page)
+        page[Name('Parent')] = Ref(2, 0)
+        new_ref = self.add_object(page)
+        self.page_refs.append(new_ref)
+        return new_ref
+
+    def add_form(self, document, index, bbox):
+        """Copy a page as a form XObject clipped to bbox, in the page's coordinates, and return its reference."""
+        _, page = document.pages[index]
+        page_refs = {ref for ref, _ in document.pages}
+        contents = document.resolve(page.get('Contents'))
+        contents = contents if isinstance(contents, list) else [contents] if contents is not None else []
+        data = b'\n'.join(document.resolve(stream).decoded() for stream in contents)
+        attributes = {Name('Type'): Name('XObject'), Name('Subtype'): Name('Form'), Name('BBox'): bbox,
+                      Name('Resources'): self.copy(document, page.get('Resources', {}), page_refs),
+                      Name('Filter'): Name('FlateDecode')}
+        return self.add_object(Stream(attributes, zlib.compress(data)))
+
+    def copy(self, document, value, page_refs):
+        """Copy a value, renumbering its references. References to pages that are not copied become null."""
+        if isinstance(value, Ref):
+            key = (id(document), value)
+            if key in self.copied:
+                return self.copied[key]
+            if value in page_refs:
+                return None
+            new_ref = self.add_object(None)
+            self.copied[key] = new_ref
+            self.objects[new_ref.num - 1] = self.copy(document, document.objects.get(value), page_refs)
+            return new_ref
+        if isinstance(value, dict):
+            return {key: self.copy(document, item, page_refs) for key, item in value.items()}
+        if isinstance(value, list):
+            return [self.copy(document, item, page_refs) for item in value]
+        if isinstance(value, Stream):
+            return Stream(self.copy(document, value.attributes, page_refs), value.data)
+        return value
+
+    def write(self, pdf_file_path):
+        self.objects[0] = {Name('Type'): Name('Catalog'), Name('Pages'): Ref(2, 0)}
+        self.objects[1] = {Name('Type'): Name('Pages'), Name('Kids'): self.page_refs,
+                           Name('Count'): len(self.page_refs)}
+
+        output = bytearray(b'%PDF-1.5\n%\xe2\xe3\xcf\xd3\n')
+        offsets = []
+        for number, value in enumerate(self.objects, start=1):
+            offsets.append(len(output))
+            output += b'%d 0 obj\n' % number
+            output += serialize_object(value)
+            output += b'\nendobj\n'
+
+        xref = len(output)
+        output += b'xref\n0 %d\n0000000000 65535 f \n' % (len(self.objects) + 1)
+        for offset in offsets:
+            output += b'%010d 00000 n \n' % offset
+        output += b'trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (len(self.objects) + 1, xref)
+
+        with open(pdf_file_path, 'wb') as f:
+            f.write(output)
+
+
+def serialize(value):
+    """Serialize a value as PDF syntax."""
+    if isinstance(value, Name):
+        return b'/' + value.encode('latin-1')
+    if isinstance(value, Raw):
+        return bytes(value)
+    if isinstance(value, bool):
+        return b'true' if value else b'false'
+    if value is None:
+        return b'null'
+    if isinstance(value, Ref):
+        return b'%d %d R' % (value.num, value.gen)
+    if isinstance(value, int):
+        return b'%d' % value
+    if isinstance(value, float):
+        return (b'%.4f' % value).rstrip(b'0').rstrip(b'.')
+    if isinstance(value, str):
+        return b'(' + value.encode('latin-1').replace(b'\\', b'\\\\').replace(b'(', b'\\(').replace(b')', b'\\)') + b')'
+    if isinstance(value, list):
+        return b'[' + b' '.join(serialize(item) for item in value) + b']'
+    if isinstance(value, dict):
+        return b'<<' + b''.join(b'/' + key.encode('latin-1') + b' ' + serialize(item) + b'\n'
+                                for key, item in value.items()) + b'>>'
+    raise PdfError(f'Can not serialize {value!r}')
+
+
+def serialize_object(value):
+    if isinstance(value, Stream):
+        attributes = dict(value.attributes)
+        attributes[Name('Length')] = len(value.data)
+        return serialize(attributes) + b'\nstream\n' + value.data + b'\nendstream'
+    return serialize(value)
+
+
+def page_count(pdf_file_path):
+    """Return the number of pages in a PDF file."""
+    return len(PdfDocument.open(pdf_file_path).pages)
+
+
+def write_pages(pdf_file_path, pages):
+    """Write a PDF file with the given (document, page index) pages."""
+    writer = PdfWriter()
+    for document, index in pages:
+        writer.add_page(document, index)
+    writer.write(pdf_file_path)
+
+
+def split_pdf(pdf_file_path, page_ranges):
+    """Split a PDF file into several files, page_ranges maps the output file path to the
+    (first, last) page numbers, counting from 1."""
+    document = PdfDocument.open(pdf_file_path)
+    for output_file_path, (first, last) in page_ranges.items():
+        if not 1 <= first <= last <= len(document.pages):
+            raise PdfError(f'Pages {first}-{last} are not in {pdf_file_path}')
+        write_pages(output_file_path, [(document, index) for index in range(first - 1, last)])
+
+
+def concatenate_pdfs(pdf_file_paths, output_file_path):
+    """Write the pages of several PDF files, one after the other, into one PDF file."""
+    pages = []
+    for pdf_file_path in pdf_file_paths:
+        document = PdfDocument.open(pdf_file_path)
+        pages.extend((document, index) for index in range(len(document.pages)))
+    write_pages(output_file_path, pages)
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# File: pdf_preview.py
+#
+# Proofreading previews of the rosters, written straight to PDF without TeX.
+# Every player gets the frame of templates/RosterTemplate.tex: name and sweater
+# number in large bold type, the team in italics below, five frames a page.
+# The measurements were taken from pdflatex's output of the template, the text
+# is set in the standard Helvetica fonts every PDF viewer has, so nothing is
+# embedded and the widths below are all that is needed to center it.
+#
+# Custom templates are not interpreted, pdflatex stays the backend for the
+# rosters that get printed.
+#
+import csv
+import zlib
+import unicodedata
+
+from pdf_pages import Name, PdfWriter, Stream
+
+# US letter with 0.5in margins, like the article class with geometry
+PAGE_WIDTH = 612
+PAGE_HEIGHT = 792
+MARGIN = 36
+
+# Player frames, in points from pdflatex's output of RosterTemplate.tex
+FRAME_WIDTH = PAGE_WIDTH - 2 * MARGIN
+FRAME_HEIGHT = 138.12
+FRAME_PITCH = 141.108
+FRAME_LINE_WIDTH = 0.996
+FRAMES_PER_PAGE = 5
+
+# Text of a frame, baselines are measured from the top of the frame
+TEXT_WIDTH = 510.24  # the 18cm minipage, longer lines are set smaller
+NAME_SIZE = 35.8655
+NAME_BASELINE = 65.651
+NAME_GAP = 23.2       # between the first and last name
+SWEATER_GAP = 36.654  # between the last name and the sweater number
+TEAM_SIZE = 17.2154
+TEAM_BASELINE = NAME_BASELINE + 50.265
+
+NAME_FONT = 'Helvetica-Bold'
+TEAM_FONT = 'Helvetica-Oblique'
+
+# Glyph widths in thousandths of the font size, from the Adobe font metrics, for ' ' to '~'
+HELVETICA_WIDTHS = dict(zip(map(chr, range(32, 127)), [
+    278, 278, 355, 556, 556, 889, 667, 191, 333, 333, 389, 584, 278, 333, 278, 278,
+    556, 556, 556, 556, 556, 556, 556, 556, 556, 556, 278, 278, 584, 584, 584, 556,
+    1015, 667, 667, 722, 722, 667, 611, 778, 722, 278, 500, 667, 556, 833, 722, 778,
+    667, 778, 722, 667, 611, 722, 667, 944, 667, 667, 611, 278, 278, 278, 469, 556,
+    333, 556, 556, 500, 556, 556, 278, 556, 556, 222, 222, 500, 222, 833, 556, 556,
+    556, 556, 333, 500, 278, 556, 500, 722, 500, 500, 500, 334, 260, 334, 584]))
+HELVETICA_BOLD_WIDTHS = dict(zip(map(chr, range(32, 127)), [
+    278, 333, 474, 556, 556, 889, 722, 238, 333, 333, 389, 584, 278, 333, 278, 278,
+    556, 556, 556, 556, 556, 556, 556, 556, 556, 556, 333, 333, 584, 584, 584, 611,
+    975, 722, 722, 722, 722, 667, 611, 778, 722, 278, 556, 722, 611, 833, 722, 778,
+    667, 778, 722, 667, 611, 722, 667, 944, 667, 667, 611, 333, 278, 333, 584, 556,
+    333, 556, 611, 556, 611, 556, 333, 611, 611, 278, 278, 556, 278, 889, 611, 611,
+    611, 611, 389, 556, 333, 611, 556, 778, 556, 556, 500, 389, 280, 389, 584]))
+FONT_WIDTHS = {NAME_FONT: HELVETICA_BOLD_WIDTHS, TEAM_FONT: HELVETICA_WIDTHS}
+
+# Resource names of the fonts in the page content
+FONT_RESOURCES = {NAME_FONT: 'F1', TEAM_FONT: 'F2'}
+
+# Width of characters without a metric, an average lower case letter
+DEFAULT_WIDTH = 556
+
+# The fonts use WinAnsiEncoding, characters it does not have are shown as '?'
+ENCODING = 'cp1252'
+
+
+def encode_text(text):
+    return text.encode(ENCODING, errors='replace')
+
+
+def char_width(char, widths):
+    """Width of a character, accented letters are as wide as the letter without the accent."""
+    width = widths.get(char)
+    if width is None:
+        width = widths.get(unicodedata.normalize('NFKD', char)[:1], DEFAULT_WIDTH)
+    return width
+
+
+def text_width(text, font):
+    """Width of a text in thousandths of the font size."""
+    widths = FONT_WIDTHS[font]
+    return sum(char_width(char, widths) for char in encode_text(text).decode(ENCODING))
+
+
+def show_text(font, size, parts, gaps, center_x, baseline):
+    """Content operators showing text parts separated by gaps (points), centered on center_x.
+
+    The text is set smaller if it is wider than the frame's text width.
+    """
+    width = sum(text_width(part, font) for part in parts) * size / 1000 + sum(gaps)
+    if width > TEXT_WIDTH:
+        size, width = size * TEXT_WIDTH / width, TEXT_WIDTH
+    items = [b'<' + encode_text(parts[0]).hex().encode() + b'>']
+    for gap, part in zip(gaps, parts[1:]):
+        items.append(b'%.1f <%s>' % (-gap * 1000 / size, encode_text(part).hex().encode()))
+    return (b'BT /%s %.4f Tf %.3f %.3f Td [%s] TJ ET\n'
+            % (FONT_RESOURCES[font].encode(), size, center_x - width / 2, baseline, b' '.join(items)))
+
+
+def player_frame(player, top):
+    """Content operators of a player's frame, top is the top of the frame."""
+    inset = FRAME_LINE_WIDTH / 2
+    content = (b'%.3f w %.3f %.3f %.3f %.3f re S\n'
+               % (FRAME_LINE_WIDTH, MARGIN + inset, top - FRAME_HEIGHT - inset, FRAME_WIDTH - 2 * inset, FRAME_HEIGHT))
+    center_x = PAGE_WIDTH / 2
+    content += show_text(NAME_FONT, NAME_SIZE, [player['Firstname'], player['Lastname'], player['Sweater']],
+                         [NAME_GAP, SWEATER_GAP], center_x, top - NAME_BASELINE)
+    content += show_text(TEAM_FONT, TEAM_SIZE, [player['Team']], [], center_x, top - TEAM_BASELINE)
+    return content
+
+
+def page_contents(players):
+    """Yield the content of every page, FRAMES_PER_PAGE players a page."""
+    for first in range(0, len(players), FRAMES_PER_PAGE):
+        content = b'0 G 0 g\n'
+        for position, player in enumerate(players[first:first + FRAMES_PER_PAGE]):
+            content += player_frame(player, PAGE_HEIGHT - MARGIN - position * FRAME_PITCH)
+        yield content
+
+
+def read_players(csv_file_path):
+    """Read the players of a roster CSV file, the template's columns default to blank."""
+    with open(csv_file_path, 'r', newline='') as f:
+        return [{column: (row.get(column) or '').strip() for column in ('Firstname', 'Lastname', 'Sweater', 'Team')}
+                for row in csv.DictReader(f)]
+
+
+def write_preview(players, pdf_file_path):
+    """Write the preview PDF of a list of players, return the number of pages.
+
+    A roster without players gets one blank page.
+    """
+    writer = PdfWriter()
+    fonts = {Name(resource): writer.add_object({Name('Type'): Name('Font'), Name('Subtype'): Name('Type1'),
+                                                Name('BaseFont'): Name(font), Name('Encoding'): Name('WinAnsiEncoding')})
+             for font, resource in FONT_RESOURCES.items()}
+    resources = writer.add_object({Name('Font'): fonts})
+
+    for content in list(page_contents(players)) or [b'']:
+        stream = writer.add_object(Stream({Name('Filter'): Name('FlateDecode')}, zlib.compress(content)))
+        writer.add_new_page({Name('Type'): Name('Page'), Name('MediaBox'): [0, 0, PAGE_WIDTH, PAGE_HEIGHT],
+                             Name('Resources'): resources, Name('Contents'): stream})
+    writer.write(pdf_file_path)
+    return len(writer.page_refs)
+
+
+def write_roster_preview(csv_file_path, pdf_file_path):
+    """Write the preview PDF of a roster CSV file, return the number of pages."""
+    return write_preview(read_players(csv_file_path), pdf_file_path)
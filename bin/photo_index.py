@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# File: photo_index.py
+#
+# Index of the player photos in a photo day folder. Photo file names are split
+# into case, accent and punctuation folded name tokens, and every token points
+# to the photos that contain it, so a player is matched by intersecting the
+# photos of their first and last name tokens instead of testing every file.
+# Tokens must match whole, so short names like "Al" no longer match "Alan".
+#
+# A player matching several photos is told apart by the sweater number in the
+# file name if possible, otherwise the match is reported as ambiguous. A player
+# without an exact match falls back to the closest photo name with difflib.
+#
+# Folder listings can be cached by the folder's modification time, so reruns
+# only scan the folders whose photos changed.
+#
+import os
+import re
+import json
+import difflib
+import time
+import threading
+import unicodedata
+from collections import namedtuple
+
+# Minimum difflib ratio between a player's name and a photo name for a fuzzy match
+FUZZY_CUTOFF = 0.85
+
+MATCH_EXACT = 'exact'
+MATCH_FUZZY = 'fuzzy'
+MATCH_AMBIGUOUS = 'ambiguous'
+MATCH_MISSING = 'missing'
+
+# kind is one of the MATCH_ constants, photo is None unless the match is exact or fuzzy
+PhotoMatch = namedtuple('PhotoMatch', ['photo', 'kind', 'candidates'])
+
+TOKEN_PATTERN = re.compile(r'[^\W_]+')
+
+# Folders modified this recently are not cached, a change within the same mtime tick could be missed
+RACY_MTIME_NS = 2 * 10**9
+
+
+def name_tokens(text):
+    """Split a name or file name into lower case tokens without accents or punctuation."""
+    if not text:
+        return []
+    text = unicodedata.normalize('NFKD', str(text))
+    text = ''.join(c for c in text if not unicodedata.combining(c)).casefold()
+    return TOKEN_PATTERN.findall(text)
+
+
+def name_keys(tokens):
+    """The index keys of a file name: its tokens, and adjacent tokens joined, so O Brien matches OBrien."""
+    keys = set(tokens)
+    keys.update(first + second for first, second in zip(tokens, tokens[1:]))
+    return keys
+
+
+class PhotoIndex:
+    """Token index of a list of photo paths."""
+
+    def __init__(self, photo_paths):
+        self.photos = list(photo_paths)
+        self.postings = {}      # token -> indexes of the photos containing it
+        self.fuzzy_names = {}   # photo name without numbers -> indexes of the photos with that name
+        self.numbers = []       # numbers in each photo name
+
+        for photo_index, photo in enumerate(self.photos):
+            tokens = name_tokens(os.path.splitext(os.path.basename(photo))[0])
+            for key in name_keys(tokens):
+                self.postings.setdefault(key, set()).add(photo_index)
+            words = [token for token in tokens if not token.isdigit()]
+            self.fuzzy_names.setdefault(' '.join(words), []).append(photo_index)
+            self.numbers.append({int(token) for token in tokens if token.isdigit()})
+
+    def __len__(self):
+        return len(self.photos)
+
+    def name_candidates(self, name):
+        """Indexes of the photos containing all tokens of the name, or the name written as one word."""
+        tokens = name_tokens(name)
+        if not tokens:
+            return set()
+        postings = [self.postings.get(token, set()) for token in tokens]
+        candidates = set.intersection(*sorted(postings, key=len))
+        return candidates | self.postings.get(''.join(tokens), set())
+
+    def match(self, firstname, lastname, sweater=None):
+        """Find the photo of a player."""
+        candidates = self.name_candidates(lastname) & self.name_candidates(firstname)
+        if len(candidates) > 1 and sweater:
+            # photo days often put the sweater number in the file name
+            number = ''.join(filter(str.isdigit, str(sweater)))
+            if number:
+                with_number = {index for index in candidates if int(number) in self.numbers[index]}
+                candidates = with_number or candidates
+
+        if len(candidates) == 1:
+            return PhotoMatch(self.photos[candidates.pop()], MATCH_EXACT, [])
+        if candidates:
+            return PhotoMatch(None, MATCH_AMBIGUOUS, sorted(self.photos[index] for index in candidates))
+        return self.fuzzy_match(firstname, lastname)
+
+    def fuzzy_match(self, firstname, lastname):
+        """Find the photo whose name is closest to the player's name, in either order."""
+        first, last = ' '.join(name_tokens(firstname)), ' '.join(name_tokens(lastname))
+        if not first or not last:
+            return PhotoMatch(None, MATCH_MISSING, [])
+
+        best_ratio, best_names = 0, []
+        for query in (f'{first} {last}', f'{last} {first}'):
+            for name in difflib.get_close_matches(query, self.fuzzy_names, n=3, cutoff=FUZZY_CUTOFF):
+                ratio = difflib.SequenceMatcher(None, query, name).ratio()
+                if ratio > best_ratio:
+                    best_ratio, best_names = ratio, [name]
+                elif ratio == best_ratio and name not in best_names:
+                    best_names.append(name)
+
+        candidates = sorted(self.photos[index] for name in best_names for index in self.fuzzy_names[name])
+        if len(candidates) == 1:
+            return PhotoMatch(candidates[0], MATCH_FUZZY, candidates)
+        if candidates:
+            return PhotoMatch(None, MATCH_AMBIGUOUS, candidates)
+        return PhotoMatch(None, MATCH_MISSING, [])
+
+
+class DirectoryScanCache:
+    """Cached listings of photo folders, keyed by the folder's modification time.
+
+    Adding, removing or renaming a photo changes its folder's modification time, so only
+    those folders are scanned again. Listings hold the names of the regular files in the
+    folder. The cache is shared by threads and saved as JSON.
+    """
+
+    @staticmethod
+    def cacheable_mtime(directory):
+        """The folder's modification time, None if it is too recent to trust."""
+        mtime_ns = os.stat(directory).st_mtime_ns
+        return mtime_ns if time.time_ns() - mtime_ns > RACY_MTIME_NS else None
+
+    def __init__(self, cache_path):
+        self.cache_path = cache_path
+        self.lock = threading.Lock()
+        self.scanned = 0
+        try:
+            with open(cache_path, 'r') as f:
+                self.folders = json.load(f)
+        except (OSError, ValueError):
+            self.folders = {}
+        if not isinstance(self.folders, dict):
+            self.folders = {}
+
+    def listdir(self, directory):
+        """Return the names of the files in the directory, from the cache if it did not change."""
+        key = os.path.abspath(directory)
+        mtime_ns = self.cacheable_mtime(directory)
+        with self.lock:
+            entry = self.folders.get(key)
+        if entry is not None and mtime_ns is not None and entry['mtime_ns'] == mtime_ns:
+            return list(entry['files'])
+
+        with os.scandir(directory) as entries:
+            files = sorted(entry.name for entry in entries if entry.is_file())
+        with self.lock:
+            self.folders[key] = {'mtime_ns': mtime_ns, 'files': files}
+            self.scanned += 1
+        return list(files)
+
+    def add_file(self, directory, name, mtime_ns):
+        """Record a file written to a scanned folder, so writing it does not invalidate the listing.
+
+        mtime_ns is the folder's modification time read before the file was written. The
+        listing is only kept if it was cached for that time, otherwise the folder changed
+        since it was read, or was too recent to trust, and is scanned again on the next run.
+        """
+        key = os.path.abspath(directory)
+        new_mtime_ns = self.cacheable_mtime(directory)
+        with self.lock:
+            entry = self.folders.get(key)
+            if entry is None:
+                return
+            if entry['mtime_ns'] is None or entry['mtime_ns'] != mtime_ns or new_mtime_ns is None:
+                del self.folders[key]
+                return
+            if name not in entry['files']:
+                entry['files'] = sorted(entry['files'] + [name])
+            entry['mtime_ns'] = new_mtime_ns
+
+    def save(self):
+        """Write the cache atomically."""
+        temp_path = self.cache_path + '.tmp'
+        with self.lock:
+            with open(temp_path, 'w') as f:
+                json.dump(self.folders, f, indent=2, sort_keys=True)
+        os.replace(temp_path, self.cache_path)
@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# File: roster_build.py
+#
+# One command from a registration workbook to PDF rosters, instead of exporting
+# to csv/, copying the files into data/ and running create_latex_rosters.py:
+#
+#   bin/roster-build workbook.xlsx
+#
+# The workbook is exported by team in a worker thread. As soon as a sheet is
+# read its team files are copied into the data directory and handed to the
+# event loop, which writes their .tex files and compiles them with pdflatex
+# subprocesses, at most --jobs at a time, while the exporter reads the next
+# sheet. The first rosters are ready before the last sheet is read, and a build
+# takes about as long as the slower of exporting and compiling, not both.
+#
+# A team on more than one sheet is built again when a later sheet adds players,
+# its builds never overlap. Rosters that did not change since their last build
+# are skipped, like with create_latex_rosters.py; the manifest records the
+# sheets a team was on, so a rerun waits for a team's last sheet instead of
+# building it from the first. Paths are relative to the current directory.
+#
+import os
+import sys
+import time
+import shutil
+import asyncio
+import logging
+import argparse
+from collections import Counter
+
+import build_manifest
+import create_latex_rosters
+import export_csv_from_excel
+import latex_runner
+import run_metrics
+import sheet_cache
+
+DEFAULT_CSV_DIR = 'csv'
+DEFAULT_DATA_DIR = 'data'
+DEFAULT_LATEX_DIR = os.path.join('output', 'latex')
+DEFAULT_TEMPLATE = os.path.join(create_latex_rosters.get_project_root(), 'templates', 'RosterTemplate.tex')
+
+# Roster build results
+BUILT = 'built'
+UP_TO_DATE = 'up_to_date'
+FAILED = 'failed'
+
+# Run metrics, collected with --metrics or --profile
+metrics = run_metrics.Metrics('roster_build')
+
+
+def copy_team_file(csv_file_path, data_dir):
+    """Copy a team file into the data directory, atomically so a running build never reads half a file."""
+    data_file_path = os.path.join(data_dir, os.path.basename(csv_file_path))
+    temp_path = data_file_path + '.tmp'
+    shutil.copyfile(csv_file_path, temp_path)
+    os.replace(temp_path, data_file_path)
+    return data_file_path
+
+
+class RosterBuild:
+    """Build the rosters of a workbook, compiling the teams of every sheet while the next one is read.
+
+    results maps every roster to BUILT, UP_TO_DATE or FAILED. Successful builds are recorded
+    in the build manifest, if one is given.
+    """
+
+    def __init__(self, template_file, data_dir, latex_dir, pdflatex_path, jobs=1,
+                 render=create_latex_rosters.RENDER_DATATOOL, timeout=latex_runner.DEFAULT_TIMEOUT, manifest=None):
+        self.template_file = template_file
+        self.data_dir = data_dir
+        self.latex_dir = latex_dir
+        self.command = create_latex_rosters.latex_command(pdflatex_path)
+        self.template_hash = build_manifest.hash_file(template_file)
+        self.jobs = jobs
+        self.render = render
+        self.timeout = timeout
+        self.manifest = manifest
+        # sheets every team was on in the last build, and in this one so far
+        self.last_sheets = {name: entry.get('sheets', 1) for name, entry in (manifest or {}).get('rosters', {}).items()}
+        self.sheets = Counter()
+        self.results = {}
+        self.first_pdf_seconds = None
+        self.start = None
+        self.slots = None   # asyncio.Semaphore of the compile jobs, made in the event loop
+        self.team_locks = {}  # roster name -> asyncio.Lock, a team is built once at a time
+
+    async def run(self, workbook, exporter):
+        """Export the workbook by team and build the rosters, return the number of players."""
+        loop = asyncio.get_running_loop()
+        self.slots = asyncio.Semaphore(self.jobs)
+        self.start = time.perf_counter()
+        finished_sheets = asyncio.Queue()
+
+        def sheet_done(title, team_files):
+            # runs in the exporter thread, before the next sheet can add to the team files
+            data_files = [copy_team_file(csv_file_path, self.data_dir) for csv_file_path in team_files.values()]
+            loop.call_soon_threadsafe(finished_sheets.put_nowait, data_files)
+
+        def export():
+            try:
+                return exporter.export_by_team(workbook, sheet_done)
+            finally:
+                loop.call_soon_threadsafe(finished_sheets.put_nowait, None)
+
+        exported = loop.run_in_executor(None, export)
+        builds = []
+        waiting = {}  # roster name -> team file, for teams that were on more sheets in the last build
+        while True:
+            data_files = await finished_sheets.get()
+            if data_files is None:
+                break
+            for data_file_path in data_files:
+                name = os.path.splitext(os.path.basename(data_file_path))[0]
+                self.sheets[name] += 1
+                if self.sheets[name] < self.last_sheets.get(name, 1):
+                    waiting[name] = data_file_path
+                    continue
+                waiting.pop(name, None)
+                builds.append(asyncio.create_task(self.build_roster(data_file_path, self.sheets[name])))
+        try:
+            players = await exported
+            # the teams that are on fewer sheets than last time are complete now
+            builds.extend(asyncio.create_task(self.build_roster(data_file_path, self.sheets[name]))
+                          for name, data_file_path in waiting.items())
+            return players
+        finally:
+            await asyncio.gather(*builds)
+
+    async def build_roster(self, data_file_path, sheets=1):
+        """Generate and compile a roster, unless it is up to date. sheets is the number of sheets the team is on."""
+        name = os.path.splitext(os.path.basename(data_file_path))[0]
+        tex_file_path = os.path.join(self.latex_dir, name + '.tex')
+        pdf_file_path = os.path.join(self.latex_dir, name + '.pdf')
+
+        async with self.team_locks.setdefault(name, asyncio.Lock()):
+            if sheets < self.sheets[name]:
+                # a later sheet added players while this build waited, the build of that sheet replaces it
+                return
+            try:
+                key = build_manifest.roster_build_key(build_manifest.hash_file(data_file_path), self.template_hash,
+                                                      self.command, self.render)
+                if self.manifest is not None and build_manifest.is_up_to_date(self.manifest, name, key,
+                                                                              tex_file_path, pdf_file_path):
+                    logging.info(f'Up-to-date: {pdf_file_path}')
+                    self.results[name] = UP_TO_DATE
+                    # the file may have had the players of a later sheet already, keep the sheets of the team
+                    build_manifest.record_build(self.manifest, name, key, sheets=sheets)
+                    return
+
+                start = time.perf_counter()
+                create_latex_rosters.create_latex_file_from_template(self.template_file, data_file_path, tex_file_path,
+                                                                     self.render)
+                metrics.record('rosters', name, generate_seconds=round(time.perf_counter() - start, 4))
+                async with self.slots:
+                    ok = await self.compile(name, tex_file_path, pdf_file_path)
+            except OSError as e:
+                logging.error(f'Error building roster {name}: {e}')
+                ok = False
+
+            self.results[name] = BUILT if ok else FAILED
+            if ok and self.manifest is not None:
+                build_manifest.record_build(self.manifest, name, key, sheets=sheets)
+
+    async def compile(self, name, tex_file_path, pdf_file_path):
+        """Compile a LaTeX file in its own build directory and move the PDF next to it."""
+        build_dir = os.path.join(self.latex_dir, create_latex_rosters.BUILD_DIR_NAME, name)
+        os.makedirs(build_dir, exist_ok=True)
+        log_file_path = os.path.join(build_dir, create_latex_rosters.LATEX_LOG_NAME)
+
+        logging.info(f'Compiling LaTeX file: {tex_file_path}')
+        run = await latex_runner.run_pdflatex_async(self.command, tex_file_path, build_dir, self.timeout, log_file_path)
+        metrics.record('rosters', name, compile_seconds=round(run.seconds, 4), exit_code=run.returncode,
+                       passes=run.passes)
+        if not run.ok:
+            # Keep the build directory of failed jobs around for inspection
+            logging.error(f'Error compiling {tex_file_path}: {run.error}, check {log_file_path} for details.')
+            return False
+
+        shutil.move(os.path.join(build_dir, name + '.pdf'), pdf_file_path)
+        shutil.rmtree(build_dir, ignore_errors=True)
+        if self.first_pdf_seconds is None:
+            self.first_pdf_seconds = time.perf_counter() - self.start
+        logging.info(f'Created PDF: {pdf_file_path}')
+        return True
+
+    def count(self, result):
+        return sum(1 for value in self.results.values() if value == result)
+
+
+def parse_args(args):
+    parser = argparse.ArgumentParser(description='Build the PDF rosters of a registration workbook in one streaming run.')
+    parser.add_argument('workbook', help='Registration workbook to build the rosters of.')
+    parser.add_argument('--template', default=DEFAULT_TEMPLATE,
+                        help='LaTeX template of a roster (default: templates/RosterTemplate.tex).')
+    parser.add_argument('--csv-dir', default=DEFAULT_CSV_DIR, help='Directory of the exported team files (default: %(default)s).')
+    parser.add_argument('--data-dir', help=f'Directory the rosters are built from (default: {DEFAULT_DATA_DIR}/<workbook name>).')
+    parser.add_argument('--latex-dir', default=DEFAULT_LATEX_DIR,
+                        help='Directory of the LaTeX files and PDF rosters (default: %(default)s).')
+    parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count() or 1,
+                        help='Number of rosters to compile in parallel (default: number of CPUs).')
+    parser.add_argument('--force', action='store_true',
+                        help='Rebuild every roster, even if nothing changed since the last build.')
+    parser.add_argument('--render', choices=[create_latex_rosters.RENDER_DATATOOL, create_latex_rosters.RENDER_INLINE],
+                        default=create_latex_rosters.RENDER_DATATOOL,
+                        help='Load the CSV file with datatool (default) or write the players straight into the .tex file.')
+    parser.add_argument('--reader', choices=[export_csv_from_excel.READER_OPENPYXL, export_csv_from_excel.READER_XLSX],
+                        default=export_csv_from_excel.READER_OPENPYXL, help='Workbook reader (default: %(default)s).')
+    parser.add_argument('--no-sheet-cache', action='store_true', help='Always parse the workbook.')
+    parser.add_argument('--pdflatex', metavar='PATH',
+                        help=f'pdflatex to run (default: ${latex_runner.PDFLATEX_ENV}, or pdflatex on the PATH).')
+    parser.add_argument('--latex-timeout', type=float, default=latex_runner.DEFAULT_TIMEOUT, metavar='SECONDS',
+                        help='Fail a roster when a pdflatex run takes longer than this (default: %(default)s).')
+    run_metrics.add_arguments(parser)
+
+    options = parser.parse_args(args)
+    if options.jobs < 1:
+        parser.error('--jobs must be at least 1')
+    if options.latex_timeout <= 0:
+        parser.error('--latex-timeout must be positive')
+    return options
+
+
+def main(args=None):
+    """Build the rosters of a workbook, return the exit status."""
+    global metrics
+
+    options = parse_args(sys.argv[1:] if args is None else args)
+    metrics = run_metrics.Metrics('roster_build', options.metrics, run_metrics.profile_dir(options))
+    try:
+        pdflatex_path = latex_runner.resolve_pdflatex(options.pdflatex)
+        create_latex_rosters.check_dependencies(pdflatex_path, options.template)
+        if not os.path.isfile(options.workbook):
+            raise FileNotFoundError(f"Workbook '{options.workbook}' not found")
+    except FileNotFoundError as e:
+        logging.error(e)
+        return 1
+
+    data_dir = options.data_dir or os.path.join(DEFAULT_DATA_DIR, export_csv_from_excel.workbook_label(options.workbook))
+    data_dir, latex_dir = os.path.abspath(data_dir), os.path.abspath(options.latex_dir)
+    for directory in (options.csv_dir, data_dir, latex_dir):
+        os.makedirs(directory, exist_ok=True)
+
+    manifest_path = build_manifest.get_manifest_path(latex_dir)
+    manifest = build_manifest.load_manifest(manifest_path)
+    if options.force:
+        manifest['rosters'] = {}
+
+    cache = None if options.no_sheet_cache else sheet_cache.SheetCache()
+    exporter = export_csv_from_excel.Exporter(options.csv_dir, metrics=metrics, cache=cache, reader=options.reader)
+    build = RosterBuild(options.template, data_dir, latex_dir, pdflatex_path, options.jobs, options.render,
+                        options.latex_timeout, manifest)
+
+    logging.info(f'Building the rosters of {options.workbook} in {latex_dir} ({options.jobs} jobs)')
+    status = 0
+    players = 0
+    try:
+        with metrics.stage('build'):
+            players = asyncio.run(build.run(options.workbook, exporter))
+    except Exception as e:
+        logging.error(f'An error occurred: {e}')
+        status = 1
+    finally:
+        build_manifest.save_manifest(manifest_path, manifest)
+    seconds = time.perf_counter() - build.start if build.start is not None else 0.0
+    create_latex_rosters.cleanup_auxiliary_tex_files(latex_dir)
+
+    first_pdf = f', first PDF after {build.first_pdf_seconds:.1f} s' if build.first_pdf_seconds is not None else ''
+    logging.info(f'{players} players, rosters built: {build.count(BUILT)}, up-to-date: {build.count(UP_TO_DATE)}, '
+                 f'failed: {build.count(FAILED)}, in {seconds:.1f} s{first_pdf}')
+    metrics.record('build', options.workbook, players=players, rosters=len(build.results), failed=build.count(FAILED),
+                   seconds=round(seconds, 4), first_pdf_seconds=build.first_pdf_seconds and round(build.first_pdf_seconds, 4))
+    metrics.save()
+
+    if build.count(FAILED):
+        logging.error(f'Finished with {build.count(FAILED)} failed rosters, see the logs in '
+                      f'{os.path.join(latex_dir, create_latex_rosters.BUILD_DIR_NAME)}.')
+        status = 1
+    return status
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# File: roster_index.py
+#
+# Sidecar index of the roster CSV files in a directory. The exporter records the
+# number of players, size, modification time and SHA-256 hash of every CSV file
+# it writes, so count_players can answer from the index instead of parsing the
+# files. A file whose size or modification time changed since it was indexed is
+# counted again.
+#
+import os
+import json
+
+import build_manifest
+
+INDEX_NAME = 'roster_index.json'
+INDEX_VERSION = 1
+
+
+def get_index_path(csv_dir):
+    """The index is stored in the CSV directory, next to the files it describes."""
+    return os.path.join(csv_dir, INDEX_NAME)
+
+
+def load_index(csv_dir):
+    """Load the index of a CSV directory, an unreadable or outdated index is treated as empty."""
+    try:
+        with open(get_index_path(csv_dir), 'r') as f:
+            index = json.load(f)
+    except (OSError, ValueError):
+        index = None
+
+    if not isinstance(index, dict) or index.get('version') != INDEX_VERSION:
+        index = {'version': INDEX_VERSION, 'files': {}}
+    return index
+
+
+def save_index(csv_dir, index):
+    """Write the index atomically so an interrupted run never leaves it half written."""
+    index_path = get_index_path(csv_dir)
+    temp_path = index_path + '.tmp'
+    with open(temp_path, 'w') as f:
+        json.dump(index, f, indent=2, sort_keys=True)
+    os.replace(temp_path, index_path)
+
+
+def file_entry(file_path, rows, stat=None):
+    """Index entry for a CSV file with the given number of rows."""
+    stat = stat or os.stat(file_path)
+    return {'rows': rows, 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns,
+            'sha256': build_manifest.hash_file(file_path)}
+
+
+def lookup(index, csv_dir, file_name, stat=None):
+    """Return the indexed number of rows of a CSV file, None if the file changed since it was indexed.
+
+    A file with the same size but a new modification time, for example after a copy, is
+    hashed, and its entry is refreshed if the contents are unchanged.
+    """
+    entry = index['files'].get(file_name)
+    if entry is None:
+        return None
+    file_path = os.path.join(csv_dir, file_name)
+    stat = stat or os.stat(file_path)
+    if entry['size'] != stat.st_size:
+        return None
+    if entry['mtime_ns'] != stat.st_mtime_ns:
+        if entry.get('sha256') != build_manifest.hash_file(file_path):
+            return None
+        entry['mtime_ns'] = stat.st_mtime_ns
+    return entry['rows']
+
+
+def update_index(csv_dir, file_rows, index=None):
+    """Record the row counts of the given CSV files, and forget files that no longer exist.
+
+    Updates the given index, or the one saved in the CSV directory, and saves it.
+    """
+    if index is None:
+        index = load_index(csv_dir)
+    index['files'] = {file_name: entry for file_name, entry in index['files'].items()
+                      if os.path.isfile(os.path.join(csv_dir, file_name))}
+    for file_name, rows in file_rows.items():
+        index['files'][file_name] = file_entry(os.path.join(csv_dir, file_name), rows)
+    save_index(csv_dir, index)
+    return index
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# File: run_metrics.py
+#
+# Run metrics for the bin/ tools. A Metrics object collects stage timings and
+# per-sheet, per-team and per-roster records while a tool runs and writes them
+# as JSON with --metrics, so a slow run can be put down to Excel parsing,
+# cleaning or TeX. With --profile every top level stage is also run under
+# cProfile and its stats are written to --profile-dir as <tool>-<stage>.pstats,
+# to be read with `python3 -m pstats`.
+#
+# Metrics are off unless a metrics file or profile directory is given, the
+# tools then only pay for a few no-op calls per batch.
+#
+import os
+import sys
+import copy
+import json
+import time
+import cProfile
+import threading
+import contextlib
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+DEFAULT_PROFILE_DIR = 'profile'
+
+
+class Metrics:
+    """Collects the timings and records of one run of a tool.
+
+    Records are grouped in sections, for example 'sheets' or 'rosters', each mapping a
+    name to a dict of values. Timers add up the time spent in interleaved steps such as
+    reading, cleaning and writing, stages are the top level steps of the run. Metrics
+    can be recorded from several threads.
+    """
+
+    def __init__(self, tool, metrics_path=None, profile_dir=None):
+        self.tool = tool
+        self.metrics_path = metrics_path
+        self.profile_dir = profile_dir
+        self.enabled = metrics_path is not None or profile_dir is not None
+        self.started = time.perf_counter()
+        self.stages = {}
+        self.timers = {}
+        self.sections = {}
+        self._lock = threading.Lock()
+        self._profiling = False
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        """Time a top level stage, and profile it with --profile.
+
+        Only the outermost stage is profiled, and cProfile only sees the calling thread.
+        """
+        if not self.enabled:
+            yield
+            return
+
+        profiler = None
+        if self.profile_dir is not None and not self._profiling:
+            profiler = cProfile.Profile()
+            self._profiling = True
+            profiler.enable()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            if profiler is not None:
+                profiler.disable()
+                self._profiling = False
+                self.dump_profile(profiler, name)
+            with self._lock:
+                self.stages[name] = self.stages.get(name, 0) + seconds
+
+    def timer(self, name):
+        """Context manager adding the time spent in it to the named timer."""
+        if not self.enabled:
+            return contextlib.nullcontext()
+        return self._timer(name)
+
+    @contextlib.contextmanager
+    def _timer(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - start)
+
+    def timed_iter(self, name, iterable):
+        """Iterate, adding the time spent waiting for each item to the named timer."""
+        if not self.enabled:
+            return iter(iterable)
+        return self._timed_iter(name, iterable)
+
+    def _timed_iter(self, name, iterable):
+        iterator = iter(iterable)
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                self.add_time(name, time.perf_counter() - start)
+                return
+            self.add_time(name, time.perf_counter() - start)
+            yield item
+
+    def add_time(self, name, seconds):
+        with self._lock:
+            self.timers[name] = self.timers.get(name, 0) + seconds
+
+    def record(self, section, name, **values):
+        """Set values in the named record of a section."""
+        if not self.enabled:
+            return
+        with self._lock:
+            self.sections.setdefault(section, {}).setdefault(name, {}).update(values)
+
+    def count(self, section, name, value=1):
+        """Add to a counter in a section."""
+        if not self.enabled:
+            return
+        with self._lock:
+            counters = self.sections.setdefault(section, {})
+            counters[name] = counters.get(name, 0) + value
+
+    def dump_profile(self, profiler, stage_name):
+        os.makedirs(self.profile_dir, exist_ok=True)
+        file_name = ''.join(c if c.isalnum() or c in '-_' else '_' for c in f'{self.tool}-{stage_name}')
+        profiler.dump_stats(os.path.join(self.profile_dir, file_name + '.pstats'))
+
+    def report(self):
+        """Return the collected metrics as a JSON serialisable dict."""
+        with self._lock:
+            report = {
+                'tool': self.tool,
+                'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                'seconds': round(time.perf_counter() - self.started, 4),
+                'stages': {name: round(seconds, 4) for name, seconds in self.stages.items()},
+                'timers': {name: round(seconds, 4) for name, seconds in self.timers.items()},
+                'peak_memory_kb': peak_memory_kb(),
+            }
+            report.update(copy.deepcopy(self.sections))
+        return report
+
+    def save(self):
+        """Write the metrics file, if one was asked for."""
+        if self.metrics_path is None:
+            return
+        with open(self.metrics_path, 'w') as f:
+            json.dump(self.report(), f, indent=2)
+
+
+def rate(count, seconds):
+    """Items per second, None if no time was measured."""
+    return round(count / seconds, 1) if seconds else None
+
+
+def peak_memory_kb():
+    """Peak resident memory of this process and of its finished child processes, like pdflatex."""
+    if resource is None:
+        return None
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    scale = 1024 if sys.platform == 'darwin' else 1
+    return {
+        'self': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss // scale,
+        'children': resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss // scale,
+    }
+
+
+def add_arguments(parser):
+    """Add the --metrics and --profile options to a tool's argument parser."""
+    parser.add_argument('--metrics', metavar='FILE',
+                        help='Write run metrics (stage timings, row counts, compile times) to this JSON file.')
+    parser.add_argument('--profile', action='store_true', help='Write cProfile stats for every stage to the profile directory.')
+    parser.add_argument('--profile-dir', metavar='DIR', default=DEFAULT_PROFILE_DIR,
+                        help='Directory of the --profile stats (default: %(default)s).')
+
+
+def profile_dir(args):
+    """The directory to write profile stats to, None without --profile."""
+    return args.profile_dir if args.profile else None
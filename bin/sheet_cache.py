@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# File: sheet_cache.py
+#
+# Cache of the parsed sheets of registration workbooks. The exporter only needs
+# the mapped columns (first name, last name, team, jersey number and any extra
+# mapped header) of every sheet, so those are stored column by column, marshal
+# encoded and zlib compressed, one file per workbook. Entries are keyed by the
+# workbook's contents, the reader version and the mapped headers, so a rerun
+# on an unchanged workbook skips parsing the XLSX file altogether.
+#
+# The cache has a size cap, the least recently used entries are removed when it
+# is exceeded. Cleaning is not cached, changes to the name rules apply on reruns.
+#
+import os
+import zlib
+import marshal
+import datetime
+import tempfile
+
+import openpyxl
+
+import build_manifest
+from file_cache import FileCache
+
+CACHE_VERSION = 1
+DEFAULT_CACHE_DIR = '.sheet_cache'
+DEFAULT_MAX_BYTES = 256 * 2**20
+ENTRY_SUFFIX = '.sheets'
+MAGIC = b'RSHC'
+
+# Cell values marshal can not store are saved as (type name, text) tuples, openpyxl never returns tuples
+CELL_TYPES = {
+    'datetime': (datetime.datetime, datetime.datetime.isoformat, datetime.datetime.fromisoformat),
+    'date': (datetime.date, datetime.date.isoformat, datetime.date.fromisoformat),
+    'time': (datetime.time, datetime.time.isoformat, datetime.time.fromisoformat),
+    'timedelta': (datetime.timedelta, lambda value: value.total_seconds(),
+                  lambda seconds: datetime.timedelta(seconds=seconds)),
+}
+PLAIN_TYPES = (type(None), bool, int, float, str)
+
+
+def encode_value(value):
+    """Encode a cell value for marshal, raise TypeError for values that can not be cached."""
+    if isinstance(value, PLAIN_TYPES):
+        return value
+    # datetime is a subclass of date, so test the exact type
+    for name, (cell_type, encode, _) in CELL_TYPES.items():
+        if type(value) is cell_type:
+            return name, encode(value)
+    raise TypeError(f'Can not cache cell value of type {type(value).__name__}')
+
+
+def decode_value(value):
+    if isinstance(value, tuple):
+        name, encoded = value
+        return CELL_TYPES[name][2](encoded)
+    return value
+
+
+def rows_to_columns(rows, width):
+    """Turn a list of rows into a list of width columns."""
+    return [list(column) for column in zip(*rows)] if rows else [[] for _ in range(width)]
+
+
+class SheetCache(FileCache):
+    """Cached mapped columns of workbook sheets, in a directory limited to max_bytes.
+
+    A cached workbook is a list of (sheet title, mapped headers, rows), the headers are
+    None for sheets without the required headers.
+    """
+
+    suffix = ENTRY_SUFFIX
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        super().__init__(cache_dir, max_bytes)
+
+    def key(self, filename, mapping, reader=None):
+        """Key of a workbook's entry, from its contents, the reader version and the mapped headers."""
+        reader = reader or f'openpyxl {openpyxl.__version__}'
+        return build_manifest.hash_text(str(CACHE_VERSION), reader, str(marshal.version),
+                                        *sorted(map(str, mapping)), build_manifest.hash_file(filename))
+
+    def entry_path(self, key):
+        return os.path.join(self.cache_dir, key + ENTRY_SUFFIX)
+
+    def load(self, key):
+        """Return the cached sheets of a workbook, None if it is not cached or the entry can not be read."""
+        path = self.entry_path(key)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            if not data.startswith(MAGIC):
+                raise ValueError('not a sheet cache entry')
+            sheets = marshal.loads(zlib.decompress(data[len(MAGIC):]))
+            # reading an entry makes it the most recently used one
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, EOFError, TypeError, zlib.error):
+            self.remove(path)
+            return None
+        return [(title, headers, zip(*[[decode_value(value) for value in column] for column in columns]))
+                for title, headers, columns in sheets]
+
+    def store(self, key, sheets):
+        """Cache the sheets of a workbook, return False if they can not be cached."""
+        try:
+            encoded = [(title, headers, [[encode_value(value) for value in column]
+                                         for column in rows_to_columns(rows, len(headers or ()))])
+                       for title, headers, rows in sheets]
+        except TypeError:
+            return False
+        data = MAGIC + zlib.compress(marshal.dumps(encoded))
+        if len(data) > self.max_bytes:
+            return False
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(suffix='.tmp', dir=self.cache_dir)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(temp_path, self.entry_path(key))
+        except BaseException:
+            self.remove(temp_path)
+            raise
+        self.evict()
+        return True
@@ -12,9 +12,14 @@ import os
 import argparse
 import sys
 
+import names
+
 # Initial player count
 player_count = 0
 
+# Same name rules as export_csv_from_excel
+name_normalizer = names.NameNormalizer()
+
 # Header constants needs to match the headers in the Excel file
 HEADER_FIRSTNAME = 'Players First Name'
 HEADER_LASTNAME = 'Players Last Name'
@@ -41,18 +46,12 @@ def clean_row(row, headers):
     if row[firstname_index] is None:
         print(f"Error: {HEADER_FIRSTNAME} is empty in row '{row[lastname_index]}' -- team: {row[headers.index(HEADER_TEAM)]}")
     else:
-        row[firstname_index] = row[firstname_index].strip()
-        # Make sure the first letter of the first name is upper case and the rest are lower case
-        row[firstname_index] = row[firstname_index].lower()
-        row[firstname_index] = row[firstname_index][0].upper() + row[firstname_index][1:]
+        row[firstname_index] = name_normalizer.first_name(row[firstname_index])
 
     if row[lastname_index] is None:
         print(f"Error: {HEADER_LASTNAME} is empty in row '{row[firstname_index]}' -- team: {row[headers.index(HEADER_TEAM)]}")
     else:
-        row[lastname_index] = row[lastname_index].strip()
-        # Make sure the first letter of the last name is upper case and the rest are lower case
-        row[lastname_index] = row[lastname_index].lower()
-        row[lastname_index] = row[lastname_index][0].upper() + row[lastname_index][1:]
+        row[lastname_index] = name_normalizer.last_name(row[lastname_index])
 
     # Check and clean Sweater number
     if row[sweater_index] is not None:
@@ -195,7 +194,10 @@ def main():
         export_by_team(args.filename)
     else:
         export_by_workbook(args.filename)
-        
+
+    for alert in name_normalizer.alerts.values():
+        print(alert)
+
     # Print total player count after processing all workbooks
     print(f'\nTotal players: {player_count}')
     
@@ -0,0 +1,13 @@
+import os
+import sys
+import pytest
+
+FAKE_PDFLATEX = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'benchmarks', 'fake_pdflatex.py')
+
+@pytest.fixture
+def fake_pdflatex(tmp_path):
+    """Executable wrapper around the fake pdflatex script."""
+    wrapper = tmp_path / 'pdflatex'
+    wrapper.write_text(f'#!/bin/sh\nexec "{sys.executable}" "{FAKE_PDFLATEX}" "$@"\n')
+    wrapper.chmod(0o755)
+    return str(wrapper)
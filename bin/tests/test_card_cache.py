@@ -0,0 +1,166 @@
+import os
+import sys
+import argparse
+import pytest
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from bin import card_cache
+from bin import create_latex_rosters
+from bin import latex_render
+from bin import pdf_pages
+from bin import run_metrics
+
+ROSTER_TEMPLATE = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'templates', 'RosterTemplate.tex')
+EXAMPLE_PDF = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'Examples', 'latex', '12U_Black.pdf')
+
+# The frame of 12U_Black.pdf, in points
+EXAMPLE_TOP = 756.0
+EXAMPLE_BOTTOM = 617.383
+
+def write_roster(csv_dir, team, players):
+    os.makedirs(csv_dir, exist_ok=True)
+    with open(os.path.join(csv_dir, team + '.csv'), 'w') as f:
+        f.write('Firstname,Lastname,Team,Sweater\n')
+        for first_name, sweater in players:
+            f.write(f'{first_name},Stonefield,{team},{sweater}\n')
+
+def write_card_marks(cards_file_path, cards):
+    sp = latex_render.SP_PER_PDF_POINT
+    with open(cards_file_path, 'w') as f:
+        for index, (top, bottom, text_height) in enumerate(cards):
+            f.write(f'card {index} {round(top * sp)} {round(text_height * sp)}\nend {index} {round(bottom * sp)}\n')
+
+def test_render_card_document():
+    with open(ROSTER_TEMPLATE) as f:
+        template_content = f.read()
+    rows = [{'Firstname': 'Ian', 'Lastname': 'Stonefield', 'Sweater': '10', 'Team': '12U_AAA'},
+            {'Firstname': 'Dylan', 'Lastname': 'Lee', 'Sweater': '7', 'Team': '12U_AAA'}]
+
+    content = latex_render.render_card_document(template_content, rows)
+
+    assert content.index(latex_render.CARD_MARKS_SETUP) < content.index('\\begin{document}')
+    assert content.index('\\rostercard{0}') < content.index('Ian') < content.index('\\rostercardend{0}')
+    assert content.index('\\rostercard{1}') < content.index('Dylan') < content.index('\\rostercardend{1}')
+    assert 'DTLloaddb' not in content
+
+def test_render_card_team_line():
+    with open(ROSTER_TEMPLATE) as f:
+        template_content = f.read()
+    rows = [{'Firstname': 'Evan', 'Lastname': 'Stonefield', 'Sweater': '4', 'Team': 'Bantam AAA'}]
+
+    content = latex_render.render_card_document(template_content, rows)
+
+    # every cached card would fail on \itshapeBantam
+    assert '\\itshape{Bantam AAA}' in content
+    assert '\\itshapeBantam' not in content
+
+def test_read_card_marks(tmp_path):
+    cards_file_path = str(tmp_path / 'cards.cards')
+    write_card_marks(cards_file_path, [(756, 615, 720), (756, 600, 720)])
+
+    cards = latex_render.read_card_marks(cards_file_path, 2)
+    assert [tuple(round(value, 3) for value in card) for card in cards] == [(756, 615, 720), (756, 600, 720)]
+
+    # a card that ran onto the next page ends above its start
+    write_card_marks(cards_file_path, [(756, 615, 720), (100, 700, 720)])
+    with pytest.raises(ValueError):
+        latex_render.read_card_marks(cards_file_path, 2)
+    with pytest.raises(ValueError):
+        latex_render.read_card_marks(cards_file_path, 3)
+
+def test_assemble_cards(tmp_path):
+    cache = card_cache.CardCache(str(tmp_path / 'cards'))
+    cards_file_path = str(tmp_path / 'example.cards')
+    write_card_marks(cards_file_path, [(EXAMPLE_TOP, EXAMPLE_BOTTOM, 720)])
+    cache.store_cards(EXAMPLE_PDF, cards_file_path, ['black'])
+    assert cache.has('black')
+
+    # five frames fit on a page, like the template's
+    roster_pdf = str(tmp_path / 'roster.pdf')
+    assert cache.assemble(['black'] * 7, roster_pdf) == 2
+
+    document = pdf_pages.PdfDocument.open(roster_pdf)
+    _, page = document.pages[1]
+    content = document.resolve(page['Contents']).decoded()
+    assert content.splitlines() == [b'q 1 0 0 1 0 0 cm /Card0 Do Q', b'q 1 0 0 1 0 -138.617 cm /Card1 Do Q']
+
+    form = document.resolve(document.resolve(page['Resources'])['XObject']['Card0'])
+    example = pdf_pages.PdfDocument.open(EXAMPLE_PDF)
+    assert form.decoded() == example.resolve(example.pages[0][1]['Contents']).decoded()
+    assert [float(value) for value in form.attributes['BBox']] == [0, EXAMPLE_BOTTOM, 612, EXAMPLE_TOP]
+    assert 'Font' in document.resolve(form.attributes['Resources'])
+
+def test_store_cards_checks_pages(tmp_path):
+    cache = card_cache.CardCache(str(tmp_path / 'cards'))
+    cards_file_path = str(tmp_path / 'example.cards')
+    write_card_marks(cards_file_path, [(EXAMPLE_TOP, EXAMPLE_BOTTOM, 720)] * 2)
+    with pytest.raises(card_cache.PdfError):
+        cache.store_cards(EXAMPLE_PDF, cards_file_path, ['a', 'b'])
+
+def test_build_card_rosters(tmp_path, fake_pdflatex, monkeypatch):
+    monkeypatch.setattr(create_latex_rosters, 'metrics', run_metrics.Metrics('create_latex_rosters', str(tmp_path / 'm.json')))
+    csv_dir = str(tmp_path / 'csv')
+    latex_dir = str(tmp_path / 'output' / 'latex')
+    os.makedirs(latex_dir)
+    write_roster(csv_dir, '12U_AAA', [(f'Player{number}', number) for number in range(7)])
+    write_roster(csv_dir, '12U_Red', [('Dylan', 4), ('Evan', 5)])
+    write_roster(csv_dir, '12U_Black', [])
+    options = argparse.Namespace(force=False, jobs=2)
+    cache = card_cache.CardCache(card_cache.get_card_cache_dir(latex_dir))
+
+    def build():
+        return create_latex_rosters.build_card_rosters(csv_dir, ROSTER_TEMPLATE, latex_dir, fake_pdflatex, options)
+
+    # A team without players gets no PDF file
+    assert build() == ['12U_Black']
+    assert len(cache.entries()) == 9
+    assert pdf_pages.page_count(os.path.join(latex_dir, '12U_AAA.pdf')) == 2
+    assert pdf_pages.page_count(os.path.join(latex_dir, '12U_Red.pdf')) == 1
+    assert create_latex_rosters.metrics.report()['rosters']['12U_AAA']['cards'] == 7
+    assert not os.path.exists(os.path.join(latex_dir, '_build', 'cards_1'))
+
+    # A new sweater number typesets one card, only that team is put together again
+    write_roster(csv_dir, '12U_Red', [('Dylan', 4), ('Evan', 9)])
+    aaa_pdf = os.path.join(latex_dir, '12U_AAA.pdf')
+    aaa_mtime = os.stat(aaa_pdf).st_mtime_ns
+    compile_latex_file = create_latex_rosters.compile_latex_file
+    typeset = []
+
+    def counting_compile(tex_file_path, *args):
+        with open(tex_file_path) as f:
+            typeset.append(f.read().count('\\rostercard{'))
+        return compile_latex_file(tex_file_path, *args)
+
+    monkeypatch.setattr(create_latex_rosters, 'compile_latex_file', counting_compile)
+    assert build() == ['12U_Black']
+    assert typeset == [1]
+    assert len(cache.entries()) == 10
+    assert os.stat(aaa_pdf).st_mtime_ns == aaa_mtime
+    assert pdf_pages.page_count(os.path.join(latex_dir, '12U_Red.pdf')) == 1
+
+def test_build_card_rosters_failed_card(tmp_path, fake_pdflatex):
+    csv_dir = str(tmp_path / 'csv')
+    latex_dir = str(tmp_path / 'output' / 'latex')
+    os.makedirs(latex_dir)
+    write_roster(csv_dir, '12U_Blue', [('Ian', 1), ('Scott', 2), ('Evan', 3)])
+    write_roster(csv_dir, '12U_Red', [('Dylan', 4), ('FAKE_FAIL', 5), ('Jo', 6)])
+
+    # all cards are in one document, only the roster with the card pdflatex rejects fails
+    failed = create_latex_rosters.build_card_rosters(csv_dir, ROSTER_TEMPLATE, latex_dir, fake_pdflatex,
+                                                     argparse.Namespace(force=False, jobs=1))
+
+    assert failed == ['12U_Red']
+    assert pdf_pages.page_count(os.path.join(latex_dir, '12U_Blue.pdf')) == 1
+    assert not os.path.exists(os.path.join(latex_dir, '12U_Red.pdf'))
+    assert len(card_cache.CardCache(card_cache.get_card_cache_dir(latex_dir)).entries()) == 5
+    # only the build directory of the failed card is kept
+    assert os.listdir(os.path.join(latex_dir, '_build')) == ['cards_1_2_2_1']
+
+def test_parse_options_cards():
+    options, _ = create_latex_rosters.parse_options(['script_name', '--render', 'cards', 'csv_directory'])
+    assert options.render == create_latex_rosters.RENDER_CARDS
+
+    with pytest.raises(SystemExit):
+        create_latex_rosters.parse_options(['script_name', '--render', 'cards', '--format-cache', 'csv_directory'])
@@ -0,0 +1,62 @@
+import os
+import sys
+import csv
+import pytest
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from bin import condition_data
+
+
+def write_rows(path, rows):
+    with open(path, 'w', newline='') as f:
+        csv.writer(f).writerows(rows)
+
+
+def read_rows(path):
+    with open(path, newline='') as f:
+        return list(csv.reader(f))
+
+
+def test_process_csv_uses_exporter_name_rules(tmp_path):
+    roster = str(tmp_path / 'Bantam_AAA.csv')
+    write_rows(roster, [['Firstname', 'Lastname', 'Team', 'Sweater', 'Notes'],
+                        [' ian', 'STONEFIELD', ' Bantam AAA ', '#7', 'keep Me'],
+                        ['mary-kate', 'McDonald', 'Bantam AAA', '', 'extra', 'cells']])
+
+    assert condition_data.process_csv(roster, roster) == 3
+
+    assert read_rows(roster) == [['Firstname', 'Lastname', 'Team', 'Sweater', 'Notes'],
+                                 ['Ian', 'Stonefield', 'Bantam AAA', '7', 'keep Me'],
+                                 ['Mary-Kate', 'McDonald', 'Bantam AAA', '00', 'extra', 'cells']]
+    assert os.listdir(tmp_path) == ['Bantam_AAA.csv']
+
+
+def test_process_csv_keeps_roster_on_failure(tmp_path, monkeypatch):
+    roster = str(tmp_path / 'Bantam_AAA.csv')
+    rows = [['Firstname', 'Lastname', 'Team', 'Sweater']] + [['ian', 'stonefield', 'Bantam AAA', '7']] * 10
+    write_rows(roster, rows)
+
+    def failing_rows(reader):
+        yield next(reader)
+        raise KeyboardInterrupt
+
+    monkeypatch.setattr(condition_data, 'condition_rows', failing_rows)
+    with pytest.raises(KeyboardInterrupt):
+        condition_data.process_csv(roster, roster)
+
+    assert read_rows(roster) == rows
+    assert os.listdir(tmp_path) == ['Bantam_AAA.csv']
+
+
+def test_main_conditions_directory(tmp_path, capsys):
+    for team in ['Red', 'Black', 'White']:
+        write_rows(str(tmp_path / f'{team}.csv'), [['Firstname', 'Lastname', 'Team', 'Sweater'], ['ian', 'stonefield', team, '1']])
+    (tmp_path / 'notes.txt').write_text('ian')
+
+    condition_data.main([str(tmp_path), '--jobs', '2'])
+
+    assert read_rows(str(tmp_path / 'White.csv'))[1] == ['Ian', 'Stonefield', 'White', '1']
+    assert (tmp_path / 'notes.txt').read_text() == 'ian'
+    assert 'Conditioned 3 of 3 files.' in capsys.readouterr().out
@@ -1,5 +1,7 @@
 import os
 import sys
+import time
+import threading
 import pytest
 
 # Add the project root to the Python path
@@ -7,10 +9,32 @@ sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')
 
 from bin.create_latex_rosters import get_csv_dir_and_template
 from bin.create_latex_rosters import get_project_root
+from bin.create_latex_rosters import parse_options
+from bin.create_latex_rosters import compile_latex_files
+from bin.create_latex_rosters import process_csv_files
+from bin.create_latex_rosters import record_successful_builds
+from bin.create_latex_rosters import create_latex_file_from_template
+from bin.create_latex_rosters import build_combined_rosters
+from bin.create_latex_rosters import compile_latex_pipeline
+from bin import build_manifest
+from bin import latex_render
+from bin import latex_format
+from bin import pdf_pages
+from bin import run_metrics
+from bin import create_latex_rosters
+
+ROSTER_TEMPLATE = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'templates', 'RosterTemplate.tex')
+
 
 def remove_bin_tests(path):
     return path.replace('/bin/tests', '')
 
+def write_tex_files(latex_dir, names, failing=()):
+    os.makedirs(latex_dir, exist_ok=True)
+    for name in names:
+        with open(os.path.join(latex_dir, name + '.tex'), 'w') as f:
+            f.write('FAKE_FAIL' if name in failing else 'roster')
+
 # @pytest.fixture
 # def setup_directories(monkeypatch):
 #     project_root = os.path.dirname(os.path.abspath(__file__))
@@ -68,4 +92,285 @@ def test_missing_arguments():
 def test_get_project_root():
     project_root = get_project_root()
     project_root = remove_bin_tests(project_root)
-    assert os.path.basename(project_root) == '/Users/srs/src/latex-rosters'
\ No newline at end of file
+    assert os.path.basename(project_root) == '/Users/srs/src/latex-rosters'
+
+def write_csv_files(csv_dir, teams):
+    os.makedirs(csv_dir, exist_ok=True)
+    for team, players in teams.items():
+        with open(os.path.join(csv_dir, team + '.csv'), 'w') as f:
+            f.write('Firstname,Lastname,Team,Sweater\n')
+            for player in players:
+                f.write(f'{player},Stonefield,{team},10\n')
+
+def test_parse_options_jobs():
+    options, args = parse_options(['script_name', '--jobs', '4', 'csv_directory', 'Custom.tex'])
+    assert options.jobs == 4
+    assert args == ['script_name', 'csv_directory', 'Custom.tex']
+
+    options, args = parse_options(['script_name', 'csv_directory'])
+    assert options.jobs == 1
+    assert args == ['script_name', 'csv_directory']
+
+def test_compile_latex_files_in_parallel(tmp_path, fake_pdflatex):
+    latex_dir = str(tmp_path / 'latex')
+    names = ['12U_AAA', '12U_Black', '12U_Red', '14U_A']
+    write_tex_files(latex_dir, names, failing=['12U_Black'])
+
+    failed = compile_latex_files(latex_dir, fake_pdflatex, jobs=3)
+
+    assert failed == [os.path.join(latex_dir, '12U_Black.tex')]
+    for name in ['12U_AAA', '12U_Red', '14U_A']:
+        assert os.path.exists(os.path.join(latex_dir, name + '.pdf'))
+        assert not os.path.exists(os.path.join(latex_dir, '_build', name))
+
+    # The failed roster keeps its own build directory and log
+    assert not os.path.exists(os.path.join(latex_dir, '12U_Black.pdf'))
+    assert os.path.exists(os.path.join(latex_dir, '_build', '12U_Black', 'latex_logfile.log'))
+
+def test_incremental_build(tmp_path, fake_pdflatex):
+    csv_dir = str(tmp_path / 'csv')
+    latex_dir = str(tmp_path / 'latex')
+    os.makedirs(latex_dir)
+    template_file = str(tmp_path / 'RosterTemplate.tex')
+    with open(template_file, 'w') as f:
+        f.write('\\DTLloaddb{roster}{CSV_FILE}')
+    write_csv_files(csv_dir, {'12U_AAA': ['Ian', 'Scott'], '12U_Red': ['Dylan']})
+    command = [fake_pdflatex, '-output-directory']
+
+    def build(manifest):
+        stale = process_csv_files(csv_dir, template_file, latex_dir, manifest, command)
+        failed = compile_latex_files(latex_dir, fake_pdflatex, 2, list(stale))
+        record_successful_builds(manifest, stale, failed)
+        return sorted(os.path.basename(tex_file_path) for tex_file_path in stale)
+
+    manifest = build_manifest.load_manifest(build_manifest.get_manifest_path(latex_dir))
+    assert build(manifest) == ['12U_AAA.tex', '12U_Red.tex']
+    assert build(manifest) == []
+
+    # A late registration only rebuilds that team
+    write_csv_files(csv_dir, {'12U_Red': ['Dylan', 'Evan']})
+    assert build(manifest) == ['12U_Red.tex']
+
+    # Changing the template or the compiler command rebuilds everything
+    with open(template_file, 'a') as f:
+        f.write('% changed')
+    assert build(manifest) == ['12U_AAA.tex', '12U_Red.tex']
+    command.append('-halt-on-error')
+    assert build(manifest) == ['12U_AAA.tex', '12U_Red.tex']
+
+def test_manifest_round_trip(tmp_path):
+    manifest_path = build_manifest.get_manifest_path(str(tmp_path / 'latex'))
+    assert manifest_path == str(tmp_path / 'build_manifest.json')
+
+    manifest = build_manifest.load_manifest(manifest_path)
+    build_manifest.record_build(manifest, '12U_AAA', 'abc')
+    build_manifest.save_manifest(manifest_path, manifest)
+    assert build_manifest.load_manifest(manifest_path)['rosters'] == {'12U_AAA': {'key': 'abc'}}
+
+    # A corrupt manifest is treated as empty
+    with open(manifest_path, 'w') as f:
+        f.write('{not json')
+    assert build_manifest.load_manifest(manifest_path)['rosters'] == {}
+
+def test_escape_latex():
+    assert latex_render.escape_latex('Smith & Sons #1 50% $5_a') == 'Smith \\& Sons \\#1 50\\% \\$5\\_a'
+    assert latex_render.escape_latex('{~^\\}') == '\\{\\textasciitilde{}\\^{}\\textbackslash{}\\}'
+    assert latex_render.escape_latex(None) == ''
+
+def test_inline_render(tmp_path):
+    csv_file_path = str(tmp_path / '12U_AAA.csv')
+    with open(csv_file_path, 'w') as f:
+        f.write('Firstname,Lastname,Team,Sweater\nIan,Stonefield,12U AAA,1\nJo,O&Brien,12U AAA,10\n')
+    output_file_path = str(tmp_path / '12U_AAA.tex')
+
+    create_latex_file_from_template(ROSTER_TEMPLATE, csv_file_path, output_file_path, 'inline')
+
+    with open(output_file_path) as f:
+        content = f.read()
+    assert 'datatool' not in content
+    assert 'DTL' not in content
+    assert content.count('\\begin{playerframe}') == 2
+    assert '\\textbf{{Ian}} \\hspace{.25mm} \\textbf{{Stonefield}} \\hspace{5mm} \\textbf{{1}}' in content
+    assert '\\textbf{{O\\&Brien}}' in content
+    assert '\\itshape{12U AAA}' in content
+    assert content.rstrip().endswith('\\end{document}')
+
+def test_inline_render_team_after_control_word(tmp_path):
+    csv_file_path = str(tmp_path / 'Bantam_AAA.csv')
+    with open(csv_file_path, 'w') as f:
+        f.write('Firstname,Lastname,Team,Sweater\nEvan,Stonefield,Bantam AAA,4\n')
+
+    with open(ROSTER_TEMPLATE) as f:
+        content = latex_render.render_inline_roster(f.read(), csv_file_path)
+
+    # \itshapeBantam would be an undefined control sequence
+    assert '\\itshape{Bantam AAA}' in content
+    assert '\\itshapeBantam' not in content
+
+def test_inline_render_needs_player_block():
+    with pytest.raises(ValueError):
+        latex_render.render_inline_roster('\\begin{document}\\end{document}', 'unused.csv')
+
+def test_format_preamble():
+    content = '\\documentclass{article}\n\\usepackage{datatool}\n\\DTLloaddb{roster}{a.csv}\n\\begin{document}\n\\end{document}'
+    marked = latex_format.mark_end_of_dump(content)
+    assert '\\usepackage{datatool}\n\\csname endofdump\\endcsname\n\\DTLloaddb' in marked
+    assert latex_format.get_preamble(marked) == '\\documentclass{article}\n\\usepackage{datatool}\n'
+
+    # Inline rosters have no CSV file to load, the whole preamble goes into the format
+    inline = '\\documentclass{article}\n\\begin{document}\n\\end{document}'
+    assert latex_format.mark_end_of_dump(inline) == inline
+    assert latex_format.get_preamble(inline) == '\\documentclass{article}\n'
+
+def test_prepare_format_cache(tmp_path, fake_pdflatex):
+    cache_dir = str(tmp_path / 'latex_formats')
+    tex_file_path = str(tmp_path / 'roster.tex')
+    with open(tex_file_path, 'w') as f:
+        f.write('\\documentclass{article}\n\\begin{document}\n\\end{document}')
+
+    format_file = latex_format.prepare_format(tex_file_path, fake_pdflatex, cache_dir)
+    assert format_file is not None and os.path.exists(format_file)
+    assert latex_format.prepare_format(tex_file_path, fake_pdflatex, cache_dir) == format_file
+
+    # A changed template gets its own format
+    with open(tex_file_path, 'w') as f:
+        f.write('\\documentclass{report}\n\\begin{document}\n\\end{document}')
+    assert latex_format.prepare_format(tex_file_path, fake_pdflatex, cache_dir) != format_file
+
+    # Without mylatexformat the rosters are compiled without a format
+    with open(tex_file_path, 'w') as f:
+        f.write('\\documentclass{article}% FAKE_NO_FORMAT\n\\begin{document}\n\\end{document}')
+    assert latex_format.prepare_format(tex_file_path, fake_pdflatex, cache_dir) is None
+
+def test_compile_with_format(tmp_path, fake_pdflatex):
+    latex_dir = str(tmp_path / 'latex')
+    write_tex_files(latex_dir, ['12U_AAA'])
+    failed = compile_latex_files(latex_dir, fake_pdflatex, format_file=str(tmp_path / 'roster-abc.fmt'))
+    assert failed == []
+    assert os.path.exists(os.path.join(latex_dir, '12U_AAA.pdf'))
+
+def test_combined_rosters(tmp_path, fake_pdflatex):
+    csv_dir = str(tmp_path / 'csv')
+    latex_dir = str(tmp_path / 'output' / 'latex')
+    os.makedirs(latex_dir)
+    write_csv_files(csv_dir, {'12U_AAA': ['Ian'] * 7, '12U_Black': [], '12U_Red': ['Dylan', 'Evan']})
+
+    failed = build_combined_rosters(csv_dir, ROSTER_TEMPLATE, latex_dir, fake_pdflatex)
+
+    # A team without players gets no pages
+    assert failed == ['12U_Black']
+    assert pdf_pages.page_count(str(tmp_path / 'output' / 'all_rosters.pdf')) == 3
+    assert pdf_pages.page_count(os.path.join(latex_dir, '12U_AAA.pdf')) == 2
+    assert pdf_pages.page_count(os.path.join(latex_dir, '12U_Red.pdf')) == 1
+    assert not os.path.exists(os.path.join(latex_dir, '12U_Black.pdf'))
+    assert not os.path.exists(os.path.join(latex_dir, '_build', 'all_rosters'))
+
+def test_combined_render_team_line(tmp_path):
+    csv_dir = str(tmp_path / 'csv')
+    os.makedirs(csv_dir)
+    for team, player in [('Bantam_AAA', 'Evan,Stonefield,Bantam AAA,4'), ('Squirt_A', 'Ian,Stonefield,Squirt A,1')]:
+        with open(os.path.join(csv_dir, team + '.csv'), 'w') as f:
+            f.write(f'Firstname,Lastname,Team,Sweater\n{player}\n')
+
+    with open(ROSTER_TEMPLATE) as f:
+        content = latex_render.render_combined_rosters(f.read(), [os.path.join(csv_dir, team + '.csv')
+                                                                  for team in ['Bantam_AAA', 'Squirt_A']])
+
+    assert '\\itshape{Bantam AAA}' in content
+    assert '\\itshape{Squirt A}' in content
+    assert '\\itshapeBantam' not in content and '\\itshapeSquirt' not in content
+
+def test_read_page_marks(tmp_path):
+    pages_file_path = str(tmp_path / 'all_rosters.pages')
+    with open(pages_file_path, 'w') as f:
+        f.write('0 1\n2 3\n3 3\n')
+    assert latex_render.read_page_marks(pages_file_path, 4, 4) == [(1, 2), None, None, (3, 4)]
+
+def test_pipeline_compiles_while_generating(tmp_path, fake_pdflatex):
+    latex_dir = str(tmp_path / 'latex')
+    write_tex_files(latex_dir, ['12U_AAA', '12U_Black', '12U_Red'], failing=['12U_Red'])
+    # a stale LaTeX file from an earlier run is not compiled
+    write_tex_files(latex_dir, ['Old_Team'])
+
+    def latex_files():
+        yield os.path.join(latex_dir, '12U_AAA.tex'), 'key-a'
+        # the first PDF is ready before the rest has been generated
+        deadline = time.time() + 10
+        while not os.path.exists(os.path.join(latex_dir, '12U_AAA.pdf')) and time.time() < deadline:
+            time.sleep(0.01)
+        assert os.path.exists(os.path.join(latex_dir, '12U_AAA.pdf'))
+        yield os.path.join(latex_dir, '12U_Black.tex'), 'key-b'
+        yield os.path.join(latex_dir, '12U_Red.tex'), 'key-r'
+
+    compiled, failed = compile_latex_pipeline(latex_files(), latex_dir, fake_pdflatex, jobs=2)
+
+    assert list(compiled) == [os.path.join(latex_dir, name + '.tex') for name in ['12U_AAA', '12U_Black', '12U_Red']]
+    assert failed == [os.path.join(latex_dir, '12U_Red.tex')]
+    assert os.path.exists(os.path.join(latex_dir, '12U_Black.pdf'))
+    assert not os.path.exists(os.path.join(latex_dir, 'Old_Team.pdf'))
+
+def test_pipeline_survives_job_errors(tmp_path, monkeypatch):
+    latex_dir = str(tmp_path / 'latex')
+    names = [f'Team_{number}' for number in range(6)]
+    write_tex_files(latex_dir, names)
+
+    def compile_job(tex_file_path, *args):
+        raise RuntimeError('broken PDF')
+
+    monkeypatch.setattr(create_latex_rosters, 'compile_latex_job', compile_job)
+    latex_files = [(os.path.join(latex_dir, name + '.tex'), 'key') for name in names]
+    results = []
+    # more files than the queue holds, a dead worker would block the generation
+    thread = threading.Thread(target=lambda: results.append(
+        compile_latex_pipeline(iter(latex_files), latex_dir, 'pdflatex', jobs=1)), daemon=True)
+    thread.start()
+    thread.join(30)
+
+    assert results, 'the pipeline hung after a failed job'
+    compiled, failed = results[0]
+    assert failed == [tex_file_path for tex_file_path, _ in latex_files]
+
+def test_pipeline_records_metrics(tmp_path, fake_pdflatex, monkeypatch):
+    monkeypatch.setattr(create_latex_rosters, 'metrics', run_metrics.Metrics('create_latex_rosters', str(tmp_path / 'm.json')))
+    latex_dir = str(tmp_path / 'latex')
+    write_tex_files(latex_dir, ['12U_AAA', '12U_Red'], failing=['12U_Red'])
+    latex_files = [(os.path.join(latex_dir, name + '.tex'), 'key') for name in ['12U_AAA', '12U_Red']]
+
+    compile_latex_pipeline(iter(latex_files), latex_dir, fake_pdflatex, jobs=2)
+
+    rosters = create_latex_rosters.metrics.report()['rosters']
+    assert rosters['12U_AAA']['exit_code'] == 0
+    assert rosters['12U_AAA']['pages'] == pdf_pages.page_count(os.path.join(latex_dir, '12U_AAA.pdf'))
+    assert rosters['12U_Red']['exit_code'] != 0
+    assert 'pages' not in rosters['12U_Red']
+    assert rosters['12U_AAA']['compile_seconds'] >= 0
+
+def test_parse_options_backend():
+    options, args = parse_options(['script_name', '--backend', 'preview', 'csv_directory'])
+    assert options.backend == create_latex_rosters.BACKEND_PREVIEW
+    assert args == ['script_name', 'csv_directory']
+
+    with pytest.raises(SystemExit):
+        parse_options(['script_name', '--backend', 'preview', '--combined', 'csv_directory'])
+
+def test_parse_options_combined():
+    options, _ = parse_options(['script_name', '--combined', 'csv_directory'])
+    assert options.combined
+
+    # options of the per-team builds are not silently ignored
+    for option in (['--render', 'inline'], ['--force'], ['--jobs', '4'], ['--format-cache']):
+        with pytest.raises(SystemExit):
+            parse_options(['script_name', '--combined'] + option + ['csv_directory'])
+
+def test_build_previews(tmp_path, monkeypatch):
+    monkeypatch.setattr(create_latex_rosters, 'metrics', run_metrics.Metrics('create_latex_rosters', str(tmp_path / 'm.json')))
+    csv_dir = str(tmp_path / 'csv')
+    preview_dir = str(tmp_path / 'preview')
+    os.makedirs(preview_dir)
+    write_csv_files(csv_dir, {'12U_AAA': ['Ian'] * 7, '12U_Red': ['Dylan', 'Evan']})
+
+    assert create_latex_rosters.build_previews(csv_dir, preview_dir) == []
+
+    assert pdf_pages.page_count(os.path.join(preview_dir, '12U_AAA.pdf')) == 2
+    assert pdf_pages.page_count(os.path.join(preview_dir, '12U_Red.pdf')) == 1
+    assert create_latex_rosters.metrics.report()['rosters']['12U_AAA']['pages'] == 2
@@ -0,0 +1,60 @@
+import os
+import sys
+import csv
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from bin import create_mm_csv_data
+
+
+def test_main_writes_memory_mate_csv(tmp_path, capsys):
+    photos = tmp_path / 'photos'
+    photos.mkdir()
+    for name in ['Bantam AAA Team Photo.jpg', 'Ian Stonefield.jpg', 'Al Jones.jpg', 'Alan Jones.jpg', '.DS_Store']:
+        (photos / name).write_text('')
+    roster = tmp_path / 'Bantam_AAA.csv'
+    roster.write_text('Firstname,Lastname,Team,Sweater\nIan ,Stonefield,Bantam AAA,1\nAl,Jones,Bantam AAA,2\n'
+                      'Evan,Smith,Bantam AAA,3\n')
+
+    report = create_mm_csv_data.main(['create_mm_csv_data.py', 'Bantam AAA', str(roster), str(photos)])
+
+    with open(photos / 'Bantam_AAA_mm.csv', newline='') as f:
+        rows = list(csv.DictReader(f))
+    team_photo = f'{photos}/Bantam AAA Team Photo.jpg'
+    assert [(row['Firstname'], row['Photo'], row['Team']) for row in rows] == [
+        ('Ian', f'{photos}/Ian Stonefield.jpg', team_photo),
+        ('Al', f'{photos}/Al Jones.jpg', team_photo),
+        ('Evan', 'blank', team_photo),
+    ]
+    assert report['unused'] == [f'{photos}/Alan Jones.jpg']
+    assert 'Error: could not find player photo: Smith' in capsys.readouterr().out
+
+
+def test_batch_builds_every_team_and_caches_scans(tmp_path, monkeypatch, capsys):
+    monkeypatch.setattr(create_mm_csv_data.photo_index, 'RACY_MTIME_NS', 0)
+    csv_dir, photos_root = tmp_path / 'csv', tmp_path / 'photos'
+    csv_dir.mkdir()
+    for team, players in {'Bantam_AAA': ['Ian,Stonefield'], 'Squirt_A': ['Evan,Stonefield'], 'Peewee_B': ['Dylan,Jones']}.items():
+        (csv_dir / f'{team}.csv').write_text('Firstname,Lastname,Team,Sweater\n' + '\n'.join(f'{player},,1' for player in players) + '\n')
+    for folder, photos in {'Bantam AAA': ['Team Photo.jpg', 'Ian Stonefield.jpg'], 'Squirt A': ['Team Photo.jpg']}.items():
+        (photos_root / folder).mkdir(parents=True)
+        for photo in photos:
+            (photos_root / folder / photo).write_text('')
+
+    summaries, errors = create_mm_csv_data.main_batch(str(csv_dir), str(photos_root), jobs=2)
+
+    assert [summary['team'] for summary in summaries] == ['Bantam AAA', 'Squirt A']
+    assert errors == 1
+    with open(photos_root / 'Bantam AAA' / 'Bantam_AAA_mm.csv', newline='') as f:
+        assert [row['Photo'] for row in csv.DictReader(f)] == [f'{photos_root}/Bantam AAA/Ian Stonefield.jpg']
+    output = capsys.readouterr().out
+    assert 'Error: no photo folder for Peewee_B.csv' in output
+    assert 'photo folders scanned: 2' in output
+
+    # only the folder with a new photo is scanned again
+    (photos_root / 'Squirt A' / 'Evan Stonefield.jpg').write_text('')
+    create_mm_csv_data.main_batch(str(csv_dir), str(photos_root))
+    assert 'photo folders scanned: 1' in capsys.readouterr().out
+    with open(photos_root / 'Squirt A' / 'Squirt_A_mm.csv', newline='') as f:
+        assert [row['Photo'] for row in csv.DictReader(f)] == [f'{photos_root}/Squirt A/Evan Stonefield.jpg']
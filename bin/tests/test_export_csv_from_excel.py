@@ -3,9 +3,16 @@
 #
 import pytest
 import export_csv_from_excel
+import roster_index
+import sheet_cache
 import csv
 import os
+import io
+import json
+import openpyxl
 import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
+from benchmarks.synthetic import synthetic_rows
 
 # Create workbook test data
 def create_test_workbook():
@@ -86,6 +93,20 @@ def test_clean_row():
     row = ['BEN', 'stoney', '10', 'Squirt AAA']
     assert export_csv_from_excel.clean_row(row, headers) == ['Ben', 'Stoney', '10', 'Squirt AAA']
     
+# Test the legacy cleaning functions print the name alerts they find
+def test_clean_row_prints_name_alerts(capsys):
+    headers = [export_csv_from_excel.HEADER_FIRSTNAME, export_csv_from_excel.HEADER_LASTNAME,
+               export_csv_from_excel.HEADER_SWEATER, export_csv_from_excel.HEADER_TEAM]
+    export_csv_from_excel.clean_row(['Ian', 'mccarthy', '4', 'Bantam AAA'], headers)
+    assert capsys.readouterr().out == "Alert: Found 'cc' in name 'mccarthy'\n"
+
+    # an alert is printed once
+    export_csv_from_excel.clean_row(['Evan', 'mccarthy', '5', 'Bantam AAA'], headers)
+    assert capsys.readouterr().out == ''
+
+    export_csv_from_excel.clean_rows([['Jo', 'maccallum', '6', 'Squirt A']], export_csv_from_excel.get_cleaning_plan(headers))
+    assert capsys.readouterr().out == "Alert: Found 'cc' in name 'maccallum'\n"
+
 # test the player count funcionality by passing in a list of rows
 def test_player_count():
     create_team_test_data()
@@ -131,4 +152,330 @@ def test_by_team():
             row_count += 1
         assert row_count == 7
 
-    cleanup_test_data()
\ No newline at end of file
+    cleanup_test_data()
+
+# Create a registration style workbook with the real headers and extra columns
+def create_registration_workbook(path, sheets):
+    headers = ['Registration Id', 'Players First Name', 'Players Last Name', 'Players Team', 'Jersey Number', 'Parent Email']
+    writer = pd.ExcelWriter(path, engine='xlsxwriter')
+    for sheet_name, rows in sheets.items():
+        rows = [[index, first, last, team, sweater, 'parent@example.com'] for index, (first, last, team, sweater) in enumerate(rows)]
+        pd.DataFrame(rows, columns=headers).to_excel(writer, sheet_name=sheet_name, index=False)
+    writer.close()
+
+def read_csv_rows(path):
+    with open(path, newline='') as csvfile:
+        return list(csv.reader(csvfile))
+
+# Test the streaming export drops the extra columns and keeps the sheet title intact
+def test_streaming_export_projects_columns(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    os.makedirs('csv')
+    create_registration_workbook('test.xlsx', {
+        'Bantam AAA': [['ian', 'STONEFIELD', 'Bantam AAA', '#1'], ['Scott', 'stonefield', 'Bantam AAA', None]],
+    })
+
+    export_csv_from_excel.export_by_workbook('test.xlsx')
+
+    assert read_csv_rows('csv/Bantam_AAA.csv') == [
+        ['Firstname', 'Lastname', 'Team', 'Sweater'],
+        ['Ian', 'Stonefield', 'Bantam AAA', '1'],
+        ['Scott', 'Stonefield', 'Bantam AAA', '00'],
+    ]
+    assert export_csv_from_excel.player_count == 2
+
+# Test unsorted team rows end up in one file per team, even with a single open file
+def test_by_team_unsorted_rows(tmp_path, monkeypatch, capsys):
+    monkeypatch.chdir(tmp_path)
+    os.makedirs('csv')
+    create_registration_workbook('test.xlsx', {
+        'Sheet A': [['Ian', 'Stonefield', 'Squirt A', '1'], ['Scott', 'Stonefield', 'Bantam AAA', '2'],
+                    ['Dylan', 'Stonefield', 'Squirt A', '3']],
+        'Sheet B': [['Evan', 'Stonefield', 'Bantam AAA', '4'], ['Aidan', 'Stonefield', 'Squirt A', '5']],
+    })
+    monkeypatch.setattr(export_csv_from_excel, 'MAX_OPEN_TEAM_FILES', 1)
+    monkeypatch.setattr(export_csv_from_excel, 'TEAM_BUFFER_ROWS', 1)
+
+    export_csv_from_excel.export_by_team('test.xlsx')
+
+    assert [row[0] for row in read_csv_rows('csv/Squirt_A.csv')] == ['Firstname', 'Ian', 'Dylan', 'Aidan']
+    assert [row[0] for row in read_csv_rows('csv/Bantam_AAA.csv')] == ['Firstname', 'Scott', 'Evan']
+    assert export_csv_from_excel.player_count == 5
+
+    output = capsys.readouterr().out
+    assert 'Alert: Team Squirt A has less than 10 players!' in output
+    assert 'Alert: Team Bantam AAA has less than 10 players!' in output
+
+# Test the router keeps per-team counts and buffers rows for teams without an open file
+def test_team_csv_router_counts(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    os.makedirs('csv')
+    headers = ['Players First Name', 'Players Last Name', 'Players Team', 'Jersey Number']
+    router = export_csv_from_excel.TeamCsvRouter(headers, max_open_files=2, buffer_rows=3)
+    for index in range(12):
+        team_name = ['Red', 'Black', 'White'][index % 3]
+        router.write(team_name, [str(index), 'Stonefield', team_name, str(index)])
+
+    assert len(router.open_files) == 2
+    assert router.buffers
+    router.close()
+
+    assert dict(router.team_counts) == {'Red': 4, 'Black': 4, 'White': 4}
+    assert router.small_teams(min_size=5) == ['Red', 'Black', 'White']
+    assert len(read_csv_rows('csv/White.csv')) == 5
+
+# Test the batched cleaning writes exactly the same CSV as clean_row
+def test_clean_rows_matches_clean_row():
+    headers = ['Players First Name', 'Players Last Name', 'Players Team', 'Jersey Number']
+    rows = synthetic_rows(2000, seed=1) + [[None, 'smith', 'Red', '1'], ['ian', None, 'Red', None]]
+
+    expected, batched = io.StringIO(), io.StringIO()
+    csv.writer(expected).writerows(export_csv_from_excel.clean_row(row, headers) for row in rows)
+    plan = export_csv_from_excel.get_cleaning_plan(headers)
+    for batch in export_csv_from_excel.iter_batches(rows, 300):
+        csv.writer(batched).writerows(export_csv_from_excel.clean_rows(batch, plan))
+
+    assert batched.getvalue() == expected.getvalue()
+
+# Test --metrics writes the rows per sheet, the team counts and the stage timings
+def test_main_writes_metrics(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    create_registration_workbook('test.xlsx', {
+        'Sheet A': [['Ian', 'Stonefield', 'Squirt A', '1'], ['Scott', 'Stonefield', 'Bantam AAA', '2']],
+        'Sheet B': [['Evan', 'Stonefield', 'Bantam AAA', '4']],
+    })
+    monkeypatch.setattr('sys.argv', ['export_csv_from_excel.py', 'test.xlsx', '--by-team', '--metrics', 'metrics.json'])
+    monkeypatch.setattr(export_csv_from_excel, 'metrics', export_csv_from_excel.metrics)
+
+    export_csv_from_excel.main()
+
+    with open('metrics.json') as f:
+        metrics = json.load(f)
+    assert {title: sheet['rows'] for title, sheet in metrics['sheets'].items()} == {'Sheet A': 2, 'Sheet B': 1}
+    assert metrics['teams'] == {'Squirt A': 1, 'Bantam AAA': 2}
+    assert metrics['export']['test.xlsx']['rows'] == 3
+    assert {'open_workbook', 'sheet Sheet A', 'sheet Sheet B'} <= set(metrics['stages'])
+    assert {'read', 'clean', 'write'} <= set(metrics['timers'])
+
+# Test exporters running in parallel threads keep their own totals, warnings and output directories
+def test_parallel_exporters(tmp_path):
+    workbooks = {}
+    for index in range(4):
+        path = str(tmp_path / f'league{index}.xlsx')
+        rows = [['Ian', 'Stonefield', f'Team {index}', str(number)] for number in range(index + 1)]
+        rows.append([None, 'Stonefield', f'Team {index}', '99'])
+        create_registration_workbook(path, {'Sheet A': rows})
+        workbooks[path] = str(tmp_path / f'csv{index}')
+
+    exporters = {path: export_csv_from_excel.Exporter(output_dir) for path, output_dir in workbooks.items()}
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        counts = list(executor.map(lambda path: exporters[path].export_by_team(path), workbooks))
+
+    assert counts == [2, 3, 4, 5]
+    for index, (path, exporter) in enumerate(exporters.items()):
+        assert exporter.player_count == index + 2
+        assert dict(exporter.team_counts) == {f'Team {index}': index + 2}
+        assert exporter.warnings == [f"Error: Players First Name is empty in row 'Stonefield' -- team: Team {index}",
+                                     f"Alert: Team Team {index} has less than 10 players!"]
+        assert sorted(os.listdir(workbooks[path])) == [f'Team_{index}.csv', 'roster_index.json']
+
+# Test the exporter writes the headers of its own mapping
+def test_exporter_header_mapping(tmp_path):
+    create_registration_workbook(str(tmp_path / 'test.xlsx'), {'Bantam AAA': [['ian', 'STONEFIELD', 'Bantam AAA', '#1']]})
+    mapping = dict(export_csv_from_excel.header_mapping, **{'Jersey Number': 'Number', 'Parent Email': 'Email'})
+
+    exporter = export_csv_from_excel.Exporter(str(tmp_path / 'out'), mapping)
+    exporter.export_by_workbook(str(tmp_path / 'test.xlsx'))
+
+    assert read_csv_rows(str(tmp_path / 'out' / 'Bantam_AAA.csv')) == [
+        ['Firstname', 'Lastname', 'Team', 'Number', 'Email'],
+        ['Ian', 'Stonefield', 'Bantam AAA', '1', 'parent@example.com'],
+    ]
+    assert export_csv_from_excel.header_mapping['Jersey Number'] == 'Sweater'
+
+# Test name alerts are reported once per export, after the rows
+def test_exporter_name_alerts(tmp_path, capsys):
+    rows = [['ian', 'mccarthy', 'Bantam AAA', str(number)] for number in range(10)]
+    create_registration_workbook(str(tmp_path / 'test.xlsx'), {'Bantam AAA': rows})
+
+    exporter = export_csv_from_excel.Exporter(str(tmp_path / 'out'))
+    exporter.export_by_team(str(tmp_path / 'test.xlsx'))
+
+    assert exporter.warnings == ["Alert: Found 'cc' in name 'mccarthy'"]
+    assert capsys.readouterr().out.count('Alert:') == 1
+
+# Test a rerun on an unchanged workbook reads the sheet cache instead of the workbook
+def test_exporter_sheet_cache(tmp_path, monkeypatch):
+    workbook = str(tmp_path / 'test.xlsx')
+    create_registration_workbook(workbook, {
+        'Sheet A': [['ian', 'STONEFIELD', 'Bantam AAA', '#1'], ['Scott', 'stonefield', 'Squirt A', None]],
+        'Sheet B': [['Evan', 'Stonefield', 'Bantam AAA', 4]],
+    })
+    cache = sheet_cache.SheetCache(str(tmp_path / 'cache'))
+
+    first = export_csv_from_excel.Exporter(str(tmp_path / 'first'), cache=cache)
+    first.export_by_team(workbook)
+
+    def no_parsing(filename):
+        raise AssertionError('the workbook was parsed again')
+    monkeypatch.setattr(export_csv_from_excel, 'open_workbook', no_parsing)
+    second = export_csv_from_excel.Exporter(str(tmp_path / 'second'), cache=cache)
+    assert second.export_by_team(workbook) == 3
+    assert second.warnings == first.warnings
+
+    for csv_name in ['Bantam_AAA.csv', 'Squirt_A.csv']:
+        assert read_csv_rows(str(tmp_path / 'second' / csv_name)) == read_csv_rows(str(tmp_path / 'first' / csv_name))
+    assert len(os.listdir(str(tmp_path / 'cache'))) == 1
+
+# Test the xlsx reader exports the same CSV files as openpyxl
+def test_exporter_xlsx_reader(tmp_path):
+    workbook = str(tmp_path / 'test.xlsx')
+    create_registration_workbook(workbook, {
+        'Sheet A': [['ian', 'STONEFIELD', 'Bantam AAA', '#1'], ['Scott', 'stonefield', 'Squirt A', None]],
+        'Sheet B': [['Evan', 'Stonefield', 'Bantam AAA', 4], ['Dylan', None, 'Squirt A', 12.0]],
+    })
+
+    exporters = {}
+    for reader in [export_csv_from_excel.READER_OPENPYXL, export_csv_from_excel.READER_XLSX]:
+        exporters[reader] = export_csv_from_excel.Exporter(str(tmp_path / reader), reader=reader)
+        assert exporters[reader].export_by_team(workbook) == 4
+
+    assert exporters['xlsx'].warnings == exporters['openpyxl'].warnings
+    for csv_name in ['Bantam_AAA.csv', 'Squirt_A.csv']:
+        assert read_csv_rows(str(tmp_path / 'xlsx' / csv_name)) == read_csv_rows(str(tmp_path / 'openpyxl' / csv_name))
+
+# Test workbooks the xlsx reader can not read are read with openpyxl
+def test_exporter_xlsx_reader_fallback(tmp_path, monkeypatch, capsys):
+    workbook = str(tmp_path / 'test.xlsx')
+    create_registration_workbook(workbook, {'Sheet A': [['Ian', 'Stonefield', 'Bantam AAA', '1']]})
+
+    def unsupported(filename):
+        raise export_csv_from_excel.xlsx_reader.UnsupportedWorkbook('strict OOXML')
+    monkeypatch.setattr(export_csv_from_excel.xlsx_reader, 'XlsxWorkbook', unsupported)
+    exporter = export_csv_from_excel.Exporter(str(tmp_path / 'out'), reader=export_csv_from_excel.READER_XLSX)
+
+    assert exporter.export_by_workbook(workbook) == 1
+    assert f"Reading {workbook} with openpyxl, the xlsx reader can not read it: strict OOXML" in capsys.readouterr().out
+    assert read_csv_rows(str(tmp_path / 'out' / 'Sheet_A.csv'))[1] == ['Ian', 'Stonefield', 'Bantam AAA', '1']
+
+# Create a registration workbook with the problems --check reports, and a sheet without the headers
+def create_problem_workbook(path):
+    create_registration_workbook(path, {
+        'Sheet A': [['ian', 'Stonefield', 'Squirt A', '#1'], ['Scott', 'stonefield', 'Squirt A', '1'],
+                    [None, 'Stonefield', 'Squirt A', 'N/A'], ['Evan', 'Stonefield', None, '4']],
+        'Sheet B': [['IAN', 'STONEFIELD', 'Bantam AAA', '7'], ['Dylan', None, 'Bantam AAA', None]],
+    })
+    wb = openpyxl.load_workbook(path)
+    wb.create_sheet('Notes').append(['Coach', 'Phone'])
+    wb.save(path)
+
+# Test a check reports every problem of every sheet with its row, without writing CSV files
+def test_exporter_check(tmp_path):
+    workbook = str(tmp_path / 'test.xlsx')
+    create_problem_workbook(workbook)
+    check = export_csv_from_excel.RosterCheck()
+
+    exporter = export_csv_from_excel.Exporter(str(tmp_path / 'csv'))
+    assert exporter.check(workbook, check) == 6
+    report = check.finish()
+
+    assert [(problem['problem'], problem['sheet'], problem['row'], problem['team'], problem['player'])
+            for problem in report['problems']] == [
+        ('duplicate_sweater', 'Sheet A', 3, 'Squirt A', 'Scott Stonefield'),
+        ('empty_first_name', 'Sheet A', 4, 'Squirt A', 'Stonefield'),
+        ('default_sweater', 'Sheet A', 4, 'Squirt A', 'Stonefield'),
+        ('empty_team', 'Sheet A', 5, None, 'Evan Stonefield'),
+        ('player_on_several_teams', 'Sheet B', 2, 'Bantam AAA', 'Ian Stonefield'),
+        ('empty_last_name', 'Sheet B', 3, 'Bantam AAA', 'Dylan'),
+        ('default_sweater', 'Sheet B', 3, 'Bantam AAA', 'Dylan'),
+        ('missing_headers', 'Notes', 1, None, None),
+        ('small_team', None, None, 'Squirt A', None),
+        ('small_team', None, None, 'Bantam AAA', None),
+    ]
+    assert report['problems'][0]['detail'] == "Sweater 1 is also worn by Ian Stonefield (test.xlsx sheet 'Sheet A' row 2)"
+    assert report['problems'][2]['detail'] == "Jersey Number 'N/A' has no digits, exported as 00"
+    assert report['problem_counts']['default_sweater'] == 2
+    assert report['teams'] == {'Squirt A': 3, 'Bantam AAA': 2}
+    assert not os.path.exists(str(tmp_path / 'csv'))
+
+# Test --check writes the report and no CSV files
+def test_main_check(tmp_path, monkeypatch, capsys):
+    monkeypatch.chdir(tmp_path)
+    create_problem_workbook('test.xlsx')
+    monkeypatch.setattr('sys.argv', ['export_csv_from_excel.py', '--check', 'test.xlsx', '--check-report', 'report.csv', '--no-sheet-cache'])
+    monkeypatch.setattr(export_csv_from_excel, 'metrics', export_csv_from_excel.metrics)
+
+    export_csv_from_excel.main()
+
+    rows = read_csv_rows('report.csv')
+    assert rows[0] == export_csv_from_excel.CHECK_COLUMNS
+    assert [row[0] for row in rows[1:]].count('small_team') == 2
+    assert not os.path.exists('csv')
+    output = capsys.readouterr().out
+    assert 'Checked 6 players on 2 teams in 1 workbook(s), 10 problems found:' in output
+    assert 'Report written to report.csv' in output
+
+# Test workbooks with the same name in different directories keep their own team files
+def test_export_batch_same_workbook_names(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    os.makedirs('a')
+    os.makedirs('b')
+    create_registration_workbook('a/club.xlsx', {'Sheet A': [[f'Ian{number}', 'Stonefield', 'Red', '1'] for number in range(3)]})
+    create_registration_workbook('b/club.xlsx', {'Sheet A': [[f'Evan{number}', 'Stonefield', 'Red', '4'] for number in range(5)]})
+
+    export_csv_from_excel.export_batch(['a/club.xlsx', 'b/club.xlsx'], 'csv', by_team=True, jobs=1)
+
+    assert sorted(os.listdir('csv')) == ['Red__a_club.csv', 'Red__b_club.csv', 'roster_index.json']
+    assert len(read_csv_rows('csv/Red__a_club.csv')) == 4
+    assert len(read_csv_rows('csv/Red__b_club.csv')) == 6
+
+# Test renamed team files never replace another merged file
+def test_merge_exports_never_overwrites(tmp_path):
+    summaries = []
+    for label, csv_names in [('north', ['Red.csv']), ('north_2', ['Red.csv']), ('other', ['Red__north.csv'])]:
+        output_dir = tmp_path / label
+        output_dir.mkdir()
+        for csv_name in csv_names:
+            (output_dir / csv_name).write_text(label)
+        summaries.append({'workbook': f'{label}.xlsx', 'output_dir': str(output_dir), 'error': None, 'warnings': [],
+                          'files': {csv_name: 1 for csv_name in csv_names}})
+    (tmp_path / 'csv').mkdir()
+
+    file_rows, _ = export_csv_from_excel.merge_exports(summaries, str(tmp_path / 'csv'))
+
+    assert sorted(file_rows) == ['Red__north.csv', 'Red__north_2.csv', 'Red__north_2_2.csv']
+    assert (tmp_path / 'csv' / 'Red__north.csv').read_text() == 'other'
+    assert sorted((tmp_path / 'csv' / name).read_text() for name in file_rows) == ['north', 'north_2', 'other']
+
+# Test workbooks are found in a directory or by a glob, skipping Excel lock files
+def test_find_workbooks(tmp_path):
+    for name in ['club_b.xlsx', 'club_a.xlsx', '~$club_a.xlsx', 'notes.txt']:
+        (tmp_path / name).write_text('')
+
+    assert export_csv_from_excel.find_workbooks(str(tmp_path)) == [str(tmp_path / 'club_a.xlsx'), str(tmp_path / 'club_b.xlsx')]
+    assert export_csv_from_excel.find_workbooks(str(tmp_path / '*_b.xlsx')) == [str(tmp_path / 'club_b.xlsx')]
+    assert export_csv_from_excel.find_workbooks(str(tmp_path / 'missing')) == []
+
+# Test a batch export merges the workbooks and renames team files exported by several workbooks
+def test_export_batch_merges_workbooks(tmp_path, monkeypatch, capsys):
+    monkeypatch.chdir(tmp_path)
+    create_registration_workbook('north.xlsx', {'Sheet A': [['Ian', 'Stonefield', 'Squirt A', '1'], ['Scott', 'Stonefield', 'Bantam AAA', '2']]})
+    create_registration_workbook('south.xlsx', {'Sheet A': [['Evan', 'Stonefield', 'Squirt A', '4']]})
+    with open('broken.xlsx', 'w') as f:
+        f.write('not a workbook')
+
+    summaries = export_csv_from_excel.export_batch(['broken.xlsx', 'north.xlsx', 'south.xlsx'], 'csv', by_team=True, jobs=2)
+
+    assert sorted(os.listdir('csv')) == ['Bantam_AAA.csv', 'Squirt_A__north.csv', 'Squirt_A__south.csv', 'roster_index.json']
+    assert {name: entry['rows'] for name, entry in roster_index.load_index('csv')['files'].items()} == {
+        'Bantam_AAA.csv': 1, 'Squirt_A__north.csv': 1, 'Squirt_A__south.csv': 1}
+    assert [row[0] for row in read_csv_rows('csv/Squirt_A__south.csv')] == ['Firstname', 'Evan']
+    assert [(summary['players'], summary['teams']) for summary in summaries] == [(0, 0), (2, 2), (1, 1)]
+    assert summaries[0]['error'] is not None
+    assert 'Alert: Squirt_A.csv was exported by several workbooks' in summaries[2]['warnings'][-1]
+
+    export_csv_from_excel.print_batch_summary(summaries)
+    output = capsys.readouterr().out
+    assert output.index('Team: Squirt A') < output.index('Workbook summary:')
+    assert '  broken.xlsx: failed -- ' in output
+    assert '  north.xlsx: 2 players, 2 CSV files' in output
@@ -0,0 +1,108 @@
+import os
+import sys
+import asyncio
+import pytest
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from bin import latex_runner
+from bin.create_latex_rosters import latex_command
+
+def compile_tex(tmp_path, pdflatex, content, name='roster', **kwargs):
+    tex_file_path = str(tmp_path / (name + '.tex'))
+    with open(tex_file_path, 'w') as f:
+        f.write(content)
+    build_dir = tmp_path / name
+    build_dir.mkdir()
+    log_file_path = str(build_dir / 'latex_logfile.log')
+    return latex_runner.run_pdflatex(latex_command(pdflatex), tex_file_path, str(build_dir), log_file_path=log_file_path,
+                                     **kwargs), log_file_path
+
+def test_resolve_pdflatex(tmp_path, monkeypatch, fake_pdflatex):
+    monkeypatch.setenv('PATH', str(tmp_path))
+    monkeypatch.delenv(latex_runner.PDFLATEX_ENV, raising=False)
+    assert latex_runner.resolve_pdflatex() == fake_pdflatex
+
+    monkeypatch.setenv(latex_runner.PDFLATEX_ENV, '/missing/pdflatex')
+    with pytest.raises(FileNotFoundError):
+        latex_runner.resolve_pdflatex()
+    assert latex_runner.resolve_pdflatex(fake_pdflatex) == fake_pdflatex
+
+    monkeypatch.delenv(latex_runner.PDFLATEX_ENV)
+    monkeypatch.setenv('PATH', str(tmp_path / 'empty'))
+    monkeypatch.setattr(latex_runner, 'PDFLATEX_LOCATIONS', [fake_pdflatex])
+    assert latex_runner.resolve_pdflatex() == fake_pdflatex
+    monkeypatch.setattr(latex_runner, 'PDFLATEX_LOCATIONS', [])
+    with pytest.raises(FileNotFoundError):
+        latex_runner.resolve_pdflatex()
+
+def test_runs_in_batch_mode(fake_pdflatex):
+    assert latex_command(fake_pdflatex) == [fake_pdflatex, '-interaction=batchmode', '-halt-on-error', '-output-directory']
+    assert latex_command(fake_pdflatex, '/cache/roster-abc.fmt')[-2:] == ['-fmt=/cache/roster-abc', '-output-directory']
+
+def test_second_pass_only_when_asked(tmp_path, fake_pdflatex):
+    run, log_file_path = compile_tex(tmp_path, fake_pdflatex, 'roster')
+    assert (run.ok, run.returncode, run.passes, run.error) == (True, 0, 1, None)
+    # the output of a successful run is not kept
+    assert not os.path.exists(log_file_path)
+
+    run, log_file_path = compile_tex(tmp_path, fake_pdflatex, 'FAKE_RERUN', name='labels')
+    assert (run.ok, run.passes) == (True, 2)
+    assert not os.path.exists(log_file_path)
+
+def test_failed_run_keeps_its_output(tmp_path, fake_pdflatex):
+    run, log_file_path = compile_tex(tmp_path, fake_pdflatex, 'FAKE_FAIL')
+
+    assert (run.ok, run.returncode, run.passes) == (False, 1, 1)
+    assert run.error == 'Undefined control sequence.'
+    with open(log_file_path) as f:
+        log = f.read()
+    assert 'This is fake pdfTeX' in log
+    assert 'Failed on pass 1: Undefined control sequence.' in log
+
+def test_hung_run_times_out(tmp_path, fake_pdflatex):
+    run, log_file_path = compile_tex(tmp_path, fake_pdflatex, 'FAKE_HANG', timeout=1)
+
+    assert not run.ok
+    assert run.error == 'timed out after 1 s'
+    assert run.seconds < 30
+    assert os.path.exists(log_file_path)
+
+def test_async_run_times_out(tmp_path, fake_pdflatex):
+    tex_file_path = str(tmp_path / 'roster.tex')
+    with open(tex_file_path, 'w') as f:
+        f.write('FAKE_HANG')
+    log_file_path = str(tmp_path / 'latex_logfile.log')
+
+    run = asyncio.run(latex_runner.run_pdflatex_async(latex_command(fake_pdflatex), tex_file_path, str(tmp_path),
+                                                      timeout=1, log_file_path=log_file_path))
+
+    assert (run.ok, run.passes, run.error) == (False, 1, 'timed out after 1 s')
+    assert 'Failed on pass 1: timed out after 1 s' in open(log_file_path).read()
+
+def test_cancelled_async_run_kills_pdflatex(tmp_path, fake_pdflatex, monkeypatch):
+    tex_file_path = str(tmp_path / 'roster.tex')
+    with open(tex_file_path, 'w') as f:
+        f.write('FAKE_HANG')
+    processes = []
+    create_subprocess_exec = asyncio.create_subprocess_exec
+
+    async def recording_exec(*args, **kwargs):
+        processes.append(await create_subprocess_exec(*args, **kwargs))
+        return processes[-1]
+
+    monkeypatch.setattr(asyncio, 'create_subprocess_exec', recording_exec)
+
+    async def cancel_run():
+        task = asyncio.ensure_future(latex_runner.run_pdflatex_async(latex_command(fake_pdflatex), tex_file_path,
+                                                                     str(tmp_path), timeout=60))
+        while not processes:
+            await asyncio.sleep(0.05)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(cancel_run())
+    # the hung pdflatex was killed and reaped with the task
+    assert processes[0].returncode is not None
@@ -0,0 +1,67 @@
+import os
+import sys
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from bin import names
+from bin.names import NameNormalizer
+
+
+def test_two_letter_names():
+    normalizer = NameNormalizer()
+
+    assert normalizer.normalize('LI', True) == 'Li'
+    assert normalizer.normalize(' jo ') == 'JO'
+    assert normalizer.normalize('ty') == 'Ty'
+    assert normalizer.last_name('LI') == 'Li'
+    assert normalizer.last_name('o') == 'O'
+
+
+def test_hyphenated_and_two_word_names():
+    normalizer = NameNormalizer()
+
+    assert normalizer.first_name('mary-KATE') == 'Mary-Kate'
+    assert normalizer.first_name('anne marie') == 'Anne Marie'
+    assert normalizer.last_name('johnson iii') == 'Johnson III'
+    assert normalizer.last_name('JOHNSON II') == 'Johnson II'
+    assert normalizer.last_name('van buren') == 'Van Buren'
+
+
+def test_mixed_case_last_names_are_kept():
+    normalizer = NameNormalizer()
+
+    assert normalizer.last_name('McDonald') == 'McDonald'
+    assert normalizer.last_name(None) is None
+    assert normalizer.first_name(None) is None
+
+
+def test_mc_mac_alerts_are_collected_once(capsys):
+    normalizer = NameNormalizer()
+
+    assert normalizer.last_name('mccarthy') == 'Mccarthy'
+    assert normalizer.last_name('MACCORMACK') == 'Maccormack'
+    assert normalizer.last_name('mccarthy') == 'Mccarthy'
+    assert normalizer.last_name('mcc-jones') == 'Mcc-Jones'
+
+    assert list(normalizer.alerts.values()) == ["Alert: Found 'cc' in name 'mccarthy'",
+                                                "Alert: Found 'cc' in name 'MACCORMACK'"]
+    assert capsys.readouterr().out == ''
+
+
+def test_results_are_cached():
+    normalizer = NameNormalizer(cache_size=2)
+
+    for name in ['ian', 'ian', 'evan', 'ian']:
+        normalizer.first_name(name)
+
+    info = normalizer.cache_info()
+    assert (info.hits, info.misses, info.maxsize) == (2, 2, 2)
+
+
+def test_custom_rule_table():
+    rules = names.NAME_RULES[:-1] + (names.NameRule('keep', lambda name, folded, is_last_name: True, str.strip),)
+    normalizer = NameNormalizer(rules=rules)
+
+    assert normalizer.first_name('dylan') == 'dylan'
+    assert normalizer.first_name('ivan-ho') == 'Ivan-Ho'
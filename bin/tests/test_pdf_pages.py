@@ -0,0 +1,43 @@
+import os
+import sys
+import pytest
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from bin import pdf_pages
+
+EXAMPLES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'Examples', 'latex')
+EXAMPLE_PDFS = [os.path.join(EXAMPLES_DIR, name) for name in ['12U_AAA.pdf', '12U_Black.pdf', '12U_Red.pdf']]
+
+def page_content(pdf_file_path, index):
+    document = pdf_pages.PdfDocument.open(pdf_file_path)
+    return document.resolve(document.pages[index][1]['Contents']).decoded()
+
+def test_page_count_with_object_streams():
+    # pdflatex output keeps most objects in compressed object streams
+    assert pdf_pages.page_count(EXAMPLE_PDFS[0]) == 1
+
+def test_concatenate_and_split(tmp_path):
+    combined = str(tmp_path / 'combined.pdf')
+    pdf_pages.concatenate_pdfs(EXAMPLE_PDFS, combined)
+    assert pdf_pages.page_count(combined) == 3
+
+    black, red = str(tmp_path / 'black.pdf'), str(tmp_path / 'red.pdf')
+    pdf_pages.split_pdf(combined, {black: (2, 2), red: (3, 3)})
+    assert pdf_pages.page_count(black) == 1
+    assert page_content(black, 0) == page_content(EXAMPLE_PDFS[1], 0)
+    assert page_content(red, 0) == page_content(EXAMPLE_PDFS[2], 0)
+
+def test_split_checks_page_range(tmp_path):
+    with pytest.raises(pdf_pages.PdfError):
+        pdf_pages.split_pdf(EXAMPLE_PDFS[0], {str(tmp_path / 'out.pdf'): (1, 2)})
+
+def test_parse_values():
+    parser = pdf_pages.Parser(b'<< /Kids [3 0 R 4 0 R] /Count 2 /Title (a (b) \\) c) /Scale -0.5 /Flag true >>')
+    value = parser.parse()
+    assert value['Kids'] == [pdf_pages.Ref(3, 0), pdf_pages.Ref(4, 0)]
+    assert value['Count'] == 2
+    assert value['Title'] == b'(a (b) \\) c)'
+    assert value['Scale'] == b'-0.5'
+    assert value['Flag'] is True
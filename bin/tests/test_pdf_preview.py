@@ -0,0 +1,58 @@
+import os
+import re
+import sys
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from bin import pdf_pages
+from bin import pdf_preview
+
+EXAMPLE_CSV = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'Examples', 'csv', '12U_Black.csv')
+
+
+def page_content(pdf_file_path, index=0):
+    document = pdf_pages.PdfDocument.open(pdf_file_path)
+    _, page = document.pages[index]
+    return document.resolve(page['Contents']).decoded().decode('latin-1')
+
+
+def test_text_width():
+    assert pdf_preview.text_width('Ian', pdf_preview.NAME_FONT) == 278 + 556 + 611
+    # accented letters are as wide as the plain letter
+    assert pdf_preview.text_width('José', pdf_preview.TEAM_FONT) == pdf_preview.text_width('Jose', pdf_preview.TEAM_FONT)
+
+
+def test_preview_of_example_roster(tmp_path):
+    pdf_file_path = str(tmp_path / '12U_Black.pdf')
+
+    assert pdf_preview.write_roster_preview(EXAMPLE_CSV, pdf_file_path) == 1
+
+    content = page_content(pdf_file_path)
+    assert content.count(' re S') == 3
+    assert '<5361726168>' in content  # Sarah
+    assert '<31325520426c61636b>' in content  # 12U Black
+
+
+def test_preview_pages(tmp_path):
+    players = [{'Firstname': 'Ian', 'Lastname': 'Stonefield', 'Sweater': str(number), 'Team': '12U AAA'}
+               for number in range(11)]
+    pdf_file_path = str(tmp_path / 'roster.pdf')
+
+    assert pdf_preview.write_preview(players, pdf_file_path) == 3
+    assert pdf_pages.page_count(pdf_file_path) == 3
+    assert page_content(pdf_file_path, 2).count(' re S') == 1
+
+    # a roster without players still gets a PDF
+    assert pdf_preview.write_preview([], pdf_file_path) == 1
+
+
+def test_long_names_are_set_smaller(tmp_path):
+    players = [{'Firstname': 'Maximiliano-Alejandro', 'Lastname': 'Wolfeschlegelsteinhausen', 'Sweater': '99',
+                'Team': '12U AAA'}]
+    pdf_file_path = str(tmp_path / 'roster.pdf')
+    pdf_preview.write_preview(players, pdf_file_path)
+
+    size, x = re.search(r'/F1 ([\d.]+) Tf ([\d.]+)', page_content(pdf_file_path)).groups()
+    assert float(size) < pdf_preview.NAME_SIZE
+    assert abs(float(x) - (pdf_preview.PAGE_WIDTH - pdf_preview.TEXT_WIDTH) / 2) < 0.01
@@ -0,0 +1,74 @@
+import os
+import sys
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from bin import photo_index
+from bin.photo_index import PhotoIndex
+
+
+def test_name_tokens_fold_case_accents_and_punctuation():
+    assert photo_index.name_tokens("O'Brien-Kelly, José 07.JPG") == ['o', 'brien', 'kelly', 'jose', '07', 'jpg']
+    assert photo_index.name_tokens(None) == []
+
+
+def test_match_whole_tokens_only():
+    index = PhotoIndex(['photos/Alan Smith.jpg', 'photos/Al Jones.jpg', 'photos/OBrien_Sean.jpg'])
+
+    assert index.match('Al', 'Jones') == ('photos/Al Jones.jpg', photo_index.MATCH_EXACT, [])
+    assert index.match('al', 'SMITH').kind != photo_index.MATCH_EXACT
+    assert index.match('Sean', "O'Brien").photo == 'photos/OBrien_Sean.jpg'
+    assert index.match('', 'Smith').kind == photo_index.MATCH_MISSING
+
+
+def test_match_ambiguous_and_sweater_number():
+    index = PhotoIndex(['photos/Ian Stonefield 7.jpg', 'photos/Ian Stonefield 12.jpg'])
+
+    assert index.match('Ian', 'Stonefield', '#12').photo == 'photos/Ian Stonefield 12.jpg'
+    match = index.match('Ian', 'Stonefield', '99')
+    assert match.kind == photo_index.MATCH_AMBIGUOUS
+    assert match.candidates == ['photos/Ian Stonefield 12.jpg', 'photos/Ian Stonefield 7.jpg']
+
+
+def test_fuzzy_fallback():
+    index = PhotoIndex(['photos/Stonefeild Ian.jpg', 'photos/Dylan Jones.jpg'])
+
+    match = index.match('Ian', 'Stonefield')
+    assert match.kind == photo_index.MATCH_FUZZY
+    assert match.photo == 'photos/Stonefeild Ian.jpg'
+    assert index.match('Evan', 'Smith').kind == photo_index.MATCH_MISSING
+
+
+def test_scan_cache_add_file(tmp_path):
+    folder = tmp_path / 'Squirt A'
+    folder.mkdir()
+    (folder / 'ian.jpg').write_text('')
+    old = 10**18
+    os.utime(folder, ns=(old, old))
+    cache = photo_index.DirectoryScanCache(str(tmp_path / 'cache.json'))
+    assert cache.listdir(str(folder)) == ['ian.jpg']
+
+    # a file written to the folder as it was listed is added to the listing
+    (folder / 'squirt_mm.csv').write_text('')
+    os.utime(folder, ns=(old + 1, old + 1))
+    cache.add_file(str(folder), 'squirt_mm.csv', old)
+    assert cache.folders[str(folder)] == {'mtime_ns': old + 1, 'files': ['ian.jpg', 'squirt_mm.csv']}
+
+    # a folder changed since it was listed is scanned again
+    (folder / 'evan.jpg').write_text('')
+    (folder / 'report.txt').write_text('')
+    os.utime(folder, ns=(old + 3, old + 3))
+    cache.add_file(str(folder), 'report.txt', old + 2)
+    assert str(folder) not in cache.folders
+    assert cache.listdir(str(folder)) == ['evan.jpg', 'ian.jpg', 'report.txt', 'squirt_mm.csv']
+    assert cache.scanned == 2
+
+    # so is a folder too recent to be cached
+    recent = tmp_path / 'Bantam AAA'
+    recent.mkdir()
+    cache.listdir(str(recent))
+    assert cache.folders[str(recent)]['mtime_ns'] is None
+    (recent / 'bantam_mm.csv').write_text('')
+    cache.add_file(str(recent), 'bantam_mm.csv', None)
+    assert str(recent) not in cache.folders
@@ -0,0 +1,90 @@
+import os
+import sys
+import csv
+import asyncio
+import pandas as pd
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from bin import roster_build
+from bin import export_csv_from_excel
+
+HEADERS = ['Players First Name', 'Players Last Name', 'Players Team', 'Jersey Number']
+
+def write_workbook(path, sheets):
+    with pd.ExcelWriter(path, engine='xlsxwriter') as writer:
+        for sheet_name, rows in sheets.items():
+            pd.DataFrame(rows, columns=HEADERS).to_excel(writer, sheet_name=sheet_name, index=False)
+
+def read_players(path):
+    with open(path, newline='') as f:
+        return [row['Firstname'] for row in csv.DictReader(f)]
+
+# Test the teams of a sheet are handed over complete before the next sheet is read
+def test_export_by_team_sheet_done(tmp_path):
+    workbook = str(tmp_path / 'test.xlsx')
+    write_workbook(workbook, {
+        'Squirt': [['Ian', 'Stonefield', 'Squirt A', 1], ['Scott', 'Stonefield', 'Squirt B', 2],
+                   ['Dylan', 'Stonefield', 'Squirt A', 3]],
+        'Bantam': [['Evan', 'Stonefield', 'Bantam AAA', 4], ['Aidan', 'Stonefield', 'Squirt A', 5]],
+    })
+    finished = []
+
+    def sheet_done(title, team_files):
+        finished.append((title, {team: read_players(path) for team, path in team_files.items()}))
+
+    exporter = export_csv_from_excel.Exporter(str(tmp_path / 'csv'))
+    assert exporter.export_by_team(workbook, sheet_done) == 5
+
+    assert finished == [
+        ('Squirt', {'Squirt A': ['Ian', 'Dylan'], 'Squirt B': ['Scott']}),
+        ('Bantam', {'Bantam AAA': ['Evan'], 'Squirt A': ['Ian', 'Dylan', 'Aidan']}),
+    ]
+
+# Test a workbook is built in one run, a team on two sheets is rebuilt with all its players
+def test_roster_build(tmp_path, monkeypatch, fake_pdflatex):
+    monkeypatch.chdir(tmp_path)
+    write_workbook('league.xlsx', {
+        'Squirt': [['Ian', 'Stonefield', 'Squirt A', 1], ['Scott', 'Stonefield', 'Squirt B', 2]],
+        'Bantam': [['Evan', 'Stonefield', 'Bantam AAA', 4], ['Dylan', 'Stonefield', 'Squirt A', 5]],
+    })
+
+    assert roster_build.main(['league.xlsx', '--pdflatex', fake_pdflatex, '--jobs', '2', '--no-sheet-cache']) == 0
+
+    latex_dir = tmp_path / 'output' / 'latex'
+    assert sorted(os.listdir(latex_dir)) == ['Bantam_AAA.pdf', 'Bantam_AAA.tex', 'Squirt_A.pdf', 'Squirt_A.tex',
+                                             'Squirt_B.pdf', 'Squirt_B.tex']
+    assert read_players(tmp_path / 'data' / 'league' / 'Squirt_A.csv') == ['Ian', 'Dylan']
+    assert str(tmp_path / 'data' / 'league' / 'Squirt_A.csv') in (latex_dir / 'Squirt_A.tex').read_text()
+    assert read_players(tmp_path / 'csv' / 'Squirt_A.csv') == ['Ian', 'Dylan']
+
+    # the manifest knows Squirt A is complete after the second sheet, whichever build of it ran
+    manifest = roster_build.build_manifest.load_manifest(roster_build.build_manifest.get_manifest_path(str(latex_dir)))
+    assert manifest['rosters']['Squirt_A']['sheets'] == 2
+
+    # nothing changed, nothing is compiled again
+    build = roster_build.RosterBuild(roster_build.DEFAULT_TEMPLATE, str(tmp_path / 'data' / 'league'), str(latex_dir),
+                                     fake_pdflatex, manifest=roster_build.build_manifest.load_manifest(
+                                         roster_build.build_manifest.get_manifest_path(str(latex_dir))))
+    exporter = export_csv_from_excel.Exporter(str(tmp_path / 'csv'))
+    assert asyncio.run(build.run('league.xlsx', exporter)) == 4
+    assert build.results == {'Squirt_A': roster_build.UP_TO_DATE, 'Squirt_B': roster_build.UP_TO_DATE,
+                             'Bantam_AAA': roster_build.UP_TO_DATE}
+
+# Test failed rosters are reported and keep their build directory
+def test_roster_build_failure(tmp_path, monkeypatch, fake_pdflatex):
+    monkeypatch.chdir(tmp_path)
+    write_workbook('league.xlsx', {'Squirt': [['Ian', 'Stonefield', 'FAKE_FAIL', 1], ['Scott', 'Stonefield', 'Squirt B', 2]]})
+
+    assert roster_build.main(['league.xlsx', '--pdflatex', fake_pdflatex, '--no-sheet-cache']) == 1
+
+    latex_dir = tmp_path / 'output' / 'latex'
+    assert (latex_dir / 'Squirt_B.pdf').exists()
+    assert not (latex_dir / 'FAKE_FAIL.pdf').exists()
+    assert (latex_dir / '_build' / 'FAKE_FAIL' / 'latex_logfile.log').exists()
+
+def test_missing_workbook(tmp_path, monkeypatch, fake_pdflatex):
+    monkeypatch.chdir(tmp_path)
+    assert roster_build.main(['missing.xlsx', '--pdflatex', fake_pdflatex]) == 1
+    assert not (tmp_path / 'output').exists()
@@ -0,0 +1,78 @@
+import os
+import sys
+import csv
+import time
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from bin import roster_index
+from bin import count_players
+
+
+def write_roster(path, players):
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['Firstname', 'Lastname', 'Team', 'Sweater'])
+        writer.writerows([f'Player{index}', 'Stonefield', 'Bantam AAA', str(index)] for index in range(players))
+
+
+def read_counts(path):
+    with open(path, newline='') as f:
+        return dict((team, int(count)) for team, count in list(csv.reader(f))[1:])
+
+
+def test_lookup_detects_changed_files(tmp_path):
+    csv_dir = str(tmp_path)
+    write_roster(os.path.join(csv_dir, 'Bantam_AAA.csv'), 3)
+    index = roster_index.update_index(csv_dir, {'Bantam_AAA.csv': 3})
+
+    assert roster_index.lookup(index, csv_dir, 'Bantam_AAA.csv') == 3
+    assert roster_index.lookup(index, csv_dir, 'Squirt_A.csv') is None
+
+    # touched but unchanged files are recognised by their hash
+    later = time.time() + 10
+    os.utime(os.path.join(csv_dir, 'Bantam_AAA.csv'), (later, later))
+    assert roster_index.lookup(index, csv_dir, 'Bantam_AAA.csv') == 3
+
+    write_roster(os.path.join(csv_dir, 'Bantam_AAA.csv'), 4)
+    assert roster_index.lookup(index, csv_dir, 'Bantam_AAA.csv') is None
+
+
+def test_corrupt_index_is_empty(tmp_path):
+    (tmp_path / roster_index.INDEX_NAME).write_text('{not json')
+    assert roster_index.load_index(str(tmp_path)) == {'version': roster_index.INDEX_VERSION, 'files': {}}
+
+
+def test_count_players_uses_index(tmp_path, monkeypatch, capsys):
+    monkeypatch.chdir(tmp_path)
+    csv_dir = str(tmp_path / 'csv')
+    os.makedirs(csv_dir)
+    write_roster(os.path.join(csv_dir, 'Bantam_AAA.csv'), 3)
+    write_roster(os.path.join(csv_dir, 'Squirt_A.csv'), 5)
+    write_roster(os.path.join(csv_dir, 'Removed.csv'), 1)
+    roster_index.update_index(csv_dir, {'Bantam_AAA.csv': 3, 'Squirt_A.csv': 5, 'Removed.csv': 1})
+    os.remove(os.path.join(csv_dir, 'Removed.csv'))
+    # a new roster and one edited after the export are counted again
+    write_roster(os.path.join(csv_dir, 'Peewee_B.csv'), 2)
+    write_roster(os.path.join(csv_dir, 'Squirt_A.csv'), 6)
+
+    count_players.main(csv_dir)
+
+    assert read_counts('per_team_count.csv') == {'Bantam AAA': 3, 'Squirt A': 6, 'Peewee B': 2}
+    assert 'Counted 2 changed files, 1 from the index.' in capsys.readouterr().out
+    assert sorted(roster_index.load_index(csv_dir)['files']) == ['Bantam_AAA.csv', 'Peewee_B.csv', 'Squirt_A.csv']
+
+    count_players.main(csv_dir)
+    assert 'changed files' not in capsys.readouterr().out
+
+
+def test_count_players_parallel_fallback(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(count_players, 'PARALLEL_MIN_FILES', 2)
+    for index in range(3):
+        write_roster(str(tmp_path / f'Team_{index}.csv'), index)
+
+    count_players.main(str(tmp_path))
+
+    assert read_counts('per_team_count.csv') == {'Team 0': 0, 'Team 1': 1, 'Team 2': 2}
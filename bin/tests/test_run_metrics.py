@@ -0,0 +1,69 @@
+import os
+import sys
+import json
+import pstats
+import argparse
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from bin import run_metrics
+from bin.run_metrics import Metrics
+
+
+def test_disabled_metrics_record_nothing(tmp_path):
+    metrics = Metrics('tool')
+    with metrics.stage('export'), metrics.timer('clean'):
+        metrics.record('sheets', 'Bantam', rows=2)
+        metrics.count('teams', 'Bantam AAA')
+    assert list(metrics.timed_iter('read', [1, 2])) == [1, 2]
+
+    metrics.save()
+    assert not metrics.enabled
+    assert metrics.stages == {} and metrics.timers == {} and metrics.sections == {}
+
+
+def test_metrics_report(tmp_path):
+    metrics_path = tmp_path / 'metrics.json'
+    metrics = Metrics('tool', str(metrics_path))
+    with metrics.stage('sheet Bantam'):
+        for batch in metrics.timed_iter('read', [[1, 2], [3]]):
+            with metrics.timer('clean'):
+                metrics.count('teams', 'Bantam AAA', len(batch))
+    metrics.record('rosters', '12U_AAA', exit_code=0)
+    metrics.record('rosters', '12U_AAA', pages=2)
+    metrics.save()
+
+    report = json.loads(metrics_path.read_text())
+    assert report['tool'] == 'tool'
+    assert list(report['stages']) == ['sheet Bantam']
+    assert set(report['timers']) == {'read', 'clean'}
+    assert report['teams'] == {'Bantam AAA': 3}
+    assert report['rosters'] == {'12U_AAA': {'exit_code': 0, 'pages': 2}}
+    assert 'peak_memory_kb' in report
+
+
+def test_profile_writes_stats_per_top_level_stage(tmp_path):
+    profile_dir = tmp_path / 'profile'
+    metrics = Metrics('tool', profile_dir=str(profile_dir))
+    with metrics.stage('generate_and_compile'):
+        with metrics.stage('prepare_format'):
+            sorted(range(1000))
+    with metrics.stage('sheet Bantam AAA'):
+        sorted(range(1000))
+
+    assert sorted(os.listdir(profile_dir)) == ['tool-generate_and_compile.pstats', 'tool-sheet_Bantam_AAA.pstats']
+    assert pstats.Stats(str(profile_dir / 'tool-sheet_Bantam_AAA.pstats')).total_calls > 0
+    assert set(metrics.stages) == {'generate_and_compile', 'prepare_format', 'sheet Bantam AAA'}
+
+
+def test_profile_option_keeps_the_positional_argument():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('filename')
+    run_metrics.add_arguments(parser)
+
+    args = parser.parse_args(['--profile', 'league.xlsx'])
+    assert (args.filename, run_metrics.profile_dir(args)) == ('league.xlsx', run_metrics.DEFAULT_PROFILE_DIR)
+    args = parser.parse_args(['--profile', '--profile-dir', 'stats', 'league.xlsx'])
+    assert run_metrics.profile_dir(args) == 'stats'
+    assert run_metrics.profile_dir(parser.parse_args(['--profile-dir', 'stats', 'league.xlsx'])) is None
@@ -0,0 +1,85 @@
+import os
+import sys
+import time
+import datetime
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from bin import sheet_cache
+from bin.sheet_cache import SheetCache
+
+SHEETS = [
+    ('Bantam AAA', ['Players First Name', 'Players Last Name', 'Players Team', 'Jersey Number'],
+     [['ian', 'STONEFIELD', 'Bantam AAA', 1], ['Scott', None, 'Bantam AAA', 2.5]]),
+    ('Notes', None, []),
+    ('Empty', ['Players First Name', 'Players Last Name', 'Players Team', 'Jersey Number'], []),
+]
+
+
+def loaded(sheets):
+    return [(title, headers, [list(row) for row in rows]) for title, headers, rows in sheets]
+
+
+def test_round_trip(tmp_path):
+    cache = SheetCache(str(tmp_path / 'cache'))
+
+    assert cache.load('missing') is None
+    assert cache.store('key', SHEETS)
+    assert loaded(cache.load('key')) == SHEETS
+
+
+def test_dates_are_kept(tmp_path):
+    cache = SheetCache(str(tmp_path))
+    values = [datetime.datetime(2012, 3, 4, 5, 6), datetime.date(2012, 3, 4), datetime.time(5, 6), datetime.timedelta(hours=1)]
+    sheets = [('Sheet1', ['Birth Date'], [[value] for value in values])]
+
+    cache.store('key', sheets)
+
+    assert loaded(cache.load('key')) == sheets
+    assert [type(row[0]) for row in loaded(cache.load('key'))[0][2]] == [type(value) for value in values]
+
+
+def test_values_that_can_not_be_cached(tmp_path):
+    cache = SheetCache(str(tmp_path))
+
+    assert not cache.store('key', [('Sheet1', ['Firstname'], [[object()]])])
+    assert cache.load('key') is None
+
+
+def test_key_depends_on_contents_and_mapping(tmp_path):
+    cache = SheetCache(str(tmp_path / 'cache'))
+    workbook = tmp_path / 'test.xlsx'
+    workbook.write_bytes(b'one')
+    key = cache.key(str(workbook), {'Players First Name': 'Firstname'})
+
+    assert cache.key(str(workbook), {'Players First Name': 'First'}) == key
+    assert cache.key(str(workbook), {'Players First Name': 'Firstname', 'Parent Email': 'Email'}) != key
+    workbook.write_bytes(b'two')
+    assert cache.key(str(workbook), {'Players First Name': 'Firstname'}) != key
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = SheetCache(str(tmp_path))
+    sheets = [('Sheet1', ['Firstname'], [[os.urandom(16).hex()] for _ in range(50)])]
+    cache.store('a', sheets)
+    cache.max_bytes = 3 * os.path.getsize(cache.entry_path('a')) + 100
+    for key in ['b', 'c']:
+        time.sleep(0.01)
+        cache.store(key, sheets)
+
+    time.sleep(0.01)
+    assert cache.load('a') is not None
+    time.sleep(0.01)
+    cache.store('d', sheets)
+
+    assert sorted(os.listdir(str(tmp_path))) == ['a.sheets', 'c.sheets', 'd.sheets']
+
+
+def test_corrupt_entries_are_removed(tmp_path):
+    cache = SheetCache(str(tmp_path))
+    with open(cache.entry_path('key'), 'wb') as f:
+        f.write(sheet_cache.MAGIC + b'not zlib')
+
+    assert cache.load('key') is None
+    assert not os.path.exists(cache.entry_path('key'))
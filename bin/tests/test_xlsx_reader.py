@@ -0,0 +1,140 @@
+import os
+import sys
+import datetime
+import zipfile
+
+import openpyxl
+import pytest
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from bin import xlsx_reader
+from bin.xlsx_reader import XlsxWorkbook
+
+CONTENT_TYPES = '''<?xml version="1.0" encoding="UTF-8"?>
+<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">
+<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>
+<Default Extension="xml" ContentType="application/xml"/>
+<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>
+<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>
+<Override PartName="/xl/sharedStrings.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sharedStrings+xml"/>
+<Override PartName="/xl/styles.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>
+</Types>'''
+
+PACKAGE_RELS = '''<?xml version="1.0" encoding="UTF-8"?>
+<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">
+<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>
+</Relationships>'''
+
+WORKBOOK = '''<?xml version="1.0" encoding="UTF-8"?>
+<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">
+<workbookPr date1904="1"/>
+<sheets><sheet name="Bantam &amp; Midget" sheetId="1" r:id="rId1"/></sheets>
+</workbook>'''
+
+WORKBOOK_RELS = '''<?xml version="1.0" encoding="UTF-8"?>
+<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">
+<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" Target="/xl/worksheets/sheet1.xml"/>
+<Relationship Id="rId2" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/sharedStrings" Target="sharedStrings.xml"/>
+<Relationship Id="rId3" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" Target="styles.xml"/>
+</Relationships>'''
+
+SHARED_STRINGS = '''<?xml version="1.0" encoding="UTF-8"?>
+<sst xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">
+<si><t>Players First Name</t></si>
+<si><t>Players Last Name</t></si>
+<si><r><t>Mc</t></r><r><rPr><b/></rPr><t>Carthy</t></r><rPh sb="0" eb="1"><t>x</t></rPh></si>
+<si><t xml:space="preserve"> ian </t></si>
+</sst>'''
+
+STYLES = '''<?xml version="1.0" encoding="UTF-8"?>
+<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">
+<numFmts count="1"><numFmt numFmtId="164" formatCode="yyyy-mm-dd"/></numFmts>
+<cellXfs count="3"><xf numFmtId="0"/><xf numFmtId="164"/><xf numFmtId="46"/></cellXfs>
+</styleSheet>'''
+
+# Cells without references, missing rows, inline strings, booleans, errors and dates
+SHEET = '''<?xml version="1.0" encoding="UTF-8"?>
+<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">
+<dimension ref="A1:E7"/>
+<sheetData>
+<row r="1"><c r="A1" t="s"><v>0</v></c><c r="B1" t="s"><v>1</v></c><c r="C1" t="inlineStr"><is><t>Players Team</t></is></c><c r="E1" t="str"><v>Jersey Number</v></c></row>
+<row r="2"><c r="A2" t="s"><v>3</v></c><c r="B2" t="s"><v>2</v></c><c r="C2" t="inlineStr"><is><t>Bantam</t></is></c><c r="E2"><v>7</v></c></row>
+<row r="4"><c t="inlineStr"><is><t>Evan</t></is></c><c t="b"><v>1</v></c><c t="e"><v>#N/A</v></c><c/><c><v>1.5E1</v></c></row>
+<row><c r="A5" s="1"><v>3650</v></c><c r="B5" s="2"><v>1.25</v></c><c r="E5" t="str"><v>12 &amp; 13</v></c></row>
+<row r="6"/>
+</sheetData>
+</worksheet>'''
+
+
+def write_crafted_workbook(path):
+    with zipfile.ZipFile(path, 'w') as archive:
+        archive.writestr('[Content_Types].xml', CONTENT_TYPES)
+        archive.writestr('_rels/.rels', PACKAGE_RELS)
+        archive.writestr('xl/workbook.xml', WORKBOOK)
+        archive.writestr('xl/_rels/workbook.xml.rels', WORKBOOK_RELS)
+        archive.writestr('xl/sharedStrings.xml', SHARED_STRINGS)
+        archive.writestr('xl/styles.xml', STYLES)
+        archive.writestr('xl/worksheets/sheet1.xml', SHEET)
+
+
+def read_with_openpyxl(path, min_row):
+    wb = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    try:
+        return {sheet.title: [list(row) for row in sheet.iter_rows(min_row=min_row, values_only=True)] for sheet in wb}
+    finally:
+        wb.close()
+
+
+def read_with_xlsx_reader(path, min_row):
+    with XlsxWorkbook(path) as wb:
+        return {title: list(wb.iter_rows(part, range(len(wb.headers(part))), min_row=min_row)) for title, part in wb.sheets}
+
+
+def test_crafted_workbook_matches_openpyxl(tmp_path):
+    path = str(tmp_path / 'crafted.xlsx')
+    write_crafted_workbook(path)
+
+    with XlsxWorkbook(path) as wb:
+        assert wb.sheets == [('Bantam & Midget', 'xl/worksheets/sheet1.xml')]
+        assert wb.headers('xl/worksheets/sheet1.xml') == ['Players First Name', 'Players Last Name', 'Players Team',
+                                                          None, 'Jersey Number']
+        rows = list(wb.iter_rows('xl/worksheets/sheet1.xml', [4, 0, 1], min_row=2))
+
+    assert rows == [
+        [7, ' ian ', 'McCarthy'],
+        [None, None, None],
+        [15.0, 'Evan', True],
+        ['12 & 13', datetime.datetime(1913, 12, 29), datetime.timedelta(hours=30)],
+        [None, None, None],
+    ]
+    assert read_with_xlsx_reader(path, 1) == read_with_openpyxl(path, 1)
+
+
+def test_exported_workbook_matches_openpyxl(tmp_path):
+    path = str(tmp_path / 'test.xlsx')
+    wb = openpyxl.Workbook()
+    sheet = wb.active
+    sheet.title = 'Registrations'
+    sheet.append(['Players First Name', 'Players Last Name', 'Players Team', 'Jersey Number', 'Birth Date'])
+    sheet.append(['ian', 'STONEFIELD', 'Bantam AAA', '#1', datetime.date(2010, 5, 1)])
+    sheet.append(['Scott', None, 'Bantam AAA', 22, datetime.datetime(2011, 1, 2, 3, 4)])
+    sheet.append([])
+    sheet.append(['Dylan', 'Stonefield', 'Squirt A', 9.5, 'n/a'])
+    wb.create_sheet('Empty')
+    wb.save(path)
+
+    assert read_with_xlsx_reader(path, 1) == read_with_openpyxl(path, 1)
+
+
+def test_unsupported_workbooks(tmp_path):
+    path = tmp_path / 'registrations.xls'
+    path.write_bytes(b'\xd0\xcf\x11\xe0 not a zip file')
+    with pytest.raises(xlsx_reader.UnsupportedWorkbook):
+        XlsxWorkbook(str(path))
+
+    with zipfile.ZipFile(str(tmp_path / 'empty.xlsx'), 'w') as archive:
+        archive.writestr('[Content_Types].xml', CONTENT_TYPES)
+    with pytest.raises(xlsx_reader.UnsupportedWorkbook):
+        XlsxWorkbook(str(tmp_path / 'empty.xlsx'))
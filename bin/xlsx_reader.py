@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# File: xlsx_reader.py
+#
+# Fast reader for the registration workbooks. An .xlsx file is a zip of XML
+# parts, the sheets are streamed with iterparse and only the cells of the
+# requested columns are turned into values, where openpyxl builds an object for
+# every cell of the 60 or so registration columns.
+#
+# Values are converted the way openpyxl's read-only, data-only mode converts
+# them (shared and inline strings, numbers, booleans, dates by cell style), and
+# missing rows are filled in the same way, so the exported CSV files are the
+# same with either reader. Workbooks the reader can not handle raise
+# UnsupportedWorkbook when they are opened, the exporter then uses openpyxl.
+#
+import posixpath
+import zipfile
+import xml.etree.ElementTree as ET
+
+from openpyxl.styles.numbers import BUILTIN_FORMATS, is_date_format, is_timedelta_format
+from openpyxl.utils.cell import column_index_from_string, range_boundaries
+from openpyxl.utils.datetime import MAC_EPOCH, WINDOWS_EPOCH, from_excel, from_ISO8601
+
+# Bump when the values read change, the sheet cache is keyed by it
+READER_VERSION = 1
+
+SHEET_NS = 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'
+REL_NS = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships'
+PACKAGE_REL_NS = 'http://schemas.openxmlformats.org/package/2006/relationships'
+
+OFFICE_DOCUMENT_TYPE = REL_NS + '/officeDocument'
+WORKSHEET_TYPE = REL_NS + '/worksheet'
+SHARED_STRINGS_TYPE = REL_NS + '/sharedStrings'
+STYLES_TYPE = REL_NS + '/styles'
+
+ROW_TAG = f'{{{SHEET_NS}}}row'
+CELL_TAG = f'{{{SHEET_NS}}}c'
+VALUE_TAG = f'{{{SHEET_NS}}}v'
+TEXT_TAG = f'{{{SHEET_NS}}}t'
+RUN_TAG = f'{{{SHEET_NS}}}r'
+INLINE_STRING_TAG = f'{{{SHEET_NS}}}is'
+STRING_ITEM_TAG = f'{{{SHEET_NS}}}si'
+DIMENSION_TAG = f'{{{SHEET_NS}}}dimension'
+SHEET_DATA_TAG = f'{{{SHEET_NS}}}sheetData'
+
+DIGITS = '0123456789'
+
+
+class UnsupportedWorkbook(Exception):
+    """Raised for workbooks the fast reader can not read, use openpyxl for them."""
+
+
+def text_content(node):
+    """Text of a string item, without its formatting and phonetic runs."""
+    return ''.join([node.findtext(TEXT_TAG) or ''] + [run.findtext(TEXT_TAG) or '' for run in node.iter(RUN_TAG)])
+
+
+def parse_number(value):
+    if '.' in value or 'E' in value or 'e' in value:
+        return float(value)
+    return int(value)
+
+
+class XlsxWorkbook:
+    """The worksheets of an .xlsx file, read straight from the zip archive.
+
+    sheets is the list of (title, part name) of the worksheets, in workbook order.
+    """
+
+    def __init__(self, filename):
+        try:
+            self.archive = zipfile.ZipFile(filename)
+        except (OSError, zipfile.BadZipFile) as e:
+            raise UnsupportedWorkbook(f'not an xlsx file: {e}') from e
+        try:
+            self.read_workbook()
+        except (KeyError, ValueError, ET.ParseError, zipfile.BadZipFile) as e:
+            self.archive.close()
+            raise UnsupportedWorkbook(f'{type(e).__name__}: {e}') from e
+        except BaseException:
+            self.archive.close()
+            raise
+        self._shared_strings = None
+        self._columns = {}  # column letters -> column number
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self.archive.close()
+
+    def read_relationships(self, part):
+        """Return {id: (type, part name)} of the relationships of a part."""
+        directory, name = posixpath.split(part)
+        root = ET.fromstring(self.archive.read(posixpath.join(directory, '_rels', name + '.rels')))
+        relationships = {}
+        for rel in root.iter(f'{{{PACKAGE_REL_NS}}}Relationship'):
+            if rel.get('TargetMode') == 'External':
+                continue
+            target = rel.get('Target')
+            target = target.lstrip('/') if target.startswith('/') else posixpath.normpath(posixpath.join(directory, target))
+            relationships[rel.get('Id')] = (rel.get('Type'), target)
+        return relationships
+
+    def read_workbook(self):
+        package = self.read_relationships('')
+        workbook_part = next((target for rel_type, target in package.values() if rel_type == OFFICE_DOCUMENT_TYPE), None)
+        if workbook_part is None:
+            raise ValueError('no workbook part')
+
+        root = ET.fromstring(self.archive.read(workbook_part))
+        if root.tag != f'{{{SHEET_NS}}}workbook':
+            raise ValueError(f'unknown workbook type {root.tag}')
+        relationships = self.read_relationships(workbook_part)
+
+        properties = root.find(f'{{{SHEET_NS}}}workbookPr')
+        date1904 = properties is not None and properties.get('date1904') in ('1', 'true')
+        self.epoch = MAC_EPOCH if date1904 else WINDOWS_EPOCH
+
+        self.sheets = []
+        for sheet in root.iter(f'{{{SHEET_NS}}}sheet'):
+            rel_type, part = relationships[sheet.get(f'{{{REL_NS}}}id')]
+            # chart sheets are skipped, like openpyxl's worksheets
+            if rel_type == WORKSHEET_TYPE:
+                self.archive.getinfo(part)
+                self.sheets.append((sheet.get('name'), part))
+
+        parts = {rel_type: part for rel_type, part in relationships.values()}
+        self.shared_strings_part = parts.get(SHARED_STRINGS_TYPE)
+        self.read_styles(parts.get(STYLES_TYPE))
+
+    def read_styles(self, styles_part):
+        """Find the cell styles that make numbers dates or durations."""
+        self.date_styles, self.timedelta_styles = set(), set()
+        if styles_part is None:
+            return
+        root = ET.fromstring(self.archive.read(styles_part))
+        custom_formats = {int(fmt.get('numFmtId')): fmt.get('formatCode')
+                          for fmt in root.iter(f'{{{SHEET_NS}}}numFmt')}
+        cell_xfs = root.find(f'{{{SHEET_NS}}}cellXfs')
+        for index, xf in enumerate(cell_xfs if cell_xfs is not None else []):
+            format_id = int(xf.get('numFmtId', 0))
+            number_format = custom_formats.get(format_id, BUILTIN_FORMATS.get(format_id))
+            if is_date_format(number_format):
+                self.date_styles.add(index)
+            if is_timedelta_format(number_format):
+                self.timedelta_styles.add(index)
+
+    @property
+    def shared_strings(self):
+        """The shared strings table, read the first time it is needed."""
+        if self._shared_strings is None:
+            self._shared_strings = []
+            if self.shared_strings_part is not None:
+                with self.archive.open(self.shared_strings_part) as f:
+                    for _, node in ET.iterparse(f):
+                        if node.tag == STRING_ITEM_TAG:
+                            self._shared_strings.append(text_content(node).replace('x005F_', ''))
+                            node.clear()
+        return self._shared_strings
+
+    def column(self, reference):
+        """Column number of a cell reference like AB12."""
+        letters = reference.rstrip(DIGITS)
+        column = self._columns.get(letters)
+        if column is None:
+            column = self._columns[letters] = column_index_from_string(letters)
+        return column
+
+    def cell_value(self, cell):
+        data_type = cell.get('t', 'n')
+        if data_type == 'inlineStr':
+            node = cell.find(INLINE_STRING_TAG)
+            return text_content(node) if node is not None else None
+
+        value = cell.findtext(VALUE_TAG) or None
+        if value is None:
+            return None
+        if data_type == 'n':
+            value = parse_number(value)
+            style = int(cell.get('s', 0))
+            if style in self.date_styles:
+                try:
+                    return from_excel(value, self.epoch, timedelta=style in self.timedelta_styles)
+                except (OverflowError, ValueError):
+                    return '#VALUE!'
+            return value
+        if data_type == 's':
+            return self.shared_strings[int(value)]
+        if data_type == 'b':
+            return bool(int(value))
+        if data_type == 'd':
+            return from_ISO8601(value)
+        return value
+
+    def dimensions(self, part):
+        """Return the (max column, max row) of the sheet's dimension, None if the sheet has none."""
+        with self.archive.open(part) as f:
+            for event, node in ET.iterparse(f, events=('start',)):
+                if node.tag == DIMENSION_TAG:
+                    boundaries = range_boundaries(node.get('ref'))
+                    if None not in boundaries:
+                        return boundaries[2], boundaries[3]
+                elif node.tag == SHEET_DATA_TAG:
+                    break
+        return None, None
+
+    def iter_row_elements(self, part):
+        """Yield (row number, row element) for every row of a sheet, each row is cleared once used."""
+        with self.archive.open(part) as f:
+            sheet_data = None
+            number = 0
+            for event, node in ET.iterparse(f, events=('start', 'end')):
+                if event == 'start':
+                    if node.tag == SHEET_DATA_TAG:
+                        sheet_data = node
+                elif node.tag == ROW_TAG:
+                    reference = node.get('r')
+                    number = int(reference) if reference else number + 1
+                    yield number, node
+                    node.clear()
+                    if sheet_data is not None:
+                        # drop the cleared rows too, so memory stays flat
+                        del sheet_data[:]
+
+    def project(self, row, columns, last_column):
+        """Values of the given columns (numbers from 1) of a row element, None for missing cells."""
+        values = [None] * len(columns)
+        column = 0
+        for cell in row:
+            reference = cell.get('r')
+            column = self.column(reference) if reference else column + 1
+            if column > last_column:
+                break
+            position = columns.get(column)
+            if position is not None:
+                values[position] = self.cell_value(cell)
+        return values
+
+    def iter_rows(self, part, columns, min_row=1, max_row=None):
+        """Yield the values of the given columns (indexes from 0) of the rows from min_row.
+
+        Rows missing from the sheet are filled in like openpyxl's read-only worksheets do,
+        up to the sheet's dimension.
+        """
+        sheet_max_column, sheet_max_row = self.dimensions(part)
+        max_row = max_row or sheet_max_row
+        positions = {index + 1: position for position, index in enumerate(columns)}
+        last_column = max(positions, default=0)
+        if sheet_max_column is not None:
+            positions = {column: position for column, position in positions.items() if column <= sheet_max_column}
+
+        counter = min_row
+        number = 1
+        for number, row in self.iter_row_elements(part):
+            if max_row is not None and number > max_row:
+                break
+            while counter < number:
+                counter += 1
+                yield [None] * len(columns)
+            if counter <= number:
+                counter += 1
+                yield self.project(row, positions, last_column)
+
+        if max_row is not None and max_row < number:
+            for _ in range(counter, max_row + 1):
+                yield [None] * len(columns)
+
+    def headers(self, part):
+        """The values of the first row of a sheet, padded to the sheet's dimension."""
+        max_column, _ = self.dimensions(part)
+        if max_column is None:
+            for number, row in self.iter_row_elements(part):
+                if number != 1:
+                    return []
+                cells = [cell.get('r') for cell in row]
+                max_column = self.column(cells[-1]) if cells and cells[-1] else len(cells)
+                break
+            else:
+                return []
+        for values in self.iter_rows(part, range(max_column), max_row=1):
+            return values
+        return []